@@ -1,15 +1,19 @@
 import os
 import sys
+from collections import namedtuple
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
-
-sys.path.append(parent_dir)
-
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage, SystemMessage
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
 
 from config import settings
+from agents.llm_client import CircuitBreaker, ResilientLLMClient
+from utils import quota
+from utils.file_cache import cache_path
+from utils.llm_cache import cache_key, get_cached_alert, store_alert
 from utils.logger import setup_logger
 
 logger = setup_logger("LLM")
@@ -45,52 +49,332 @@ English: "---\n⚠️ This is an AI-generated alert based on real-time sensor da
 Sinhala: "---\n⚠️ මෙය AI පද්ධතියක් මගින් සකස් කරන ලද අනතුරු ඇඟවීමකි. මෙය රජයේ නිල දැනුම්දීමක් නොවේ. DMC ශ්‍රී ලංකාවේ උපදෙස් ද අනුගමනය කරන්න."
 """
 
+# ── Template renderer (no LLM) ───────────────────────────────────────
+# Deterministic English + Sinhala alert following the SYSTEM_PROMPT rules.
+# Used when an alert cannot wait for Gemini (CRITICAL, or Gemini too slow).
+ENGLISH_DISCLAIMER = (
+    "---\n⚠️ This is an AI-generated alert based on real-time sensor data. "
+    "This is NOT an official government report. Please also follow instructions "
+    "from the Disaster Management Centre (DMC) of Sri Lanka."
+)
+SINHALA_DISCLAIMER = (
+    "---\n⚠️ මෙය AI පද්ධතියක් මගින් සකස් කරන ලද අනතුරු ඇඟවීමකි. "
+    "මෙය රජයේ නිල දැනුම්දීමක් නොවේ. DMC ශ්‍රී ලංකාවේ උපදෙස් ද අනුගමනය කරන්න."
+)
+
+ENGLISH_ACTION = {
+    "WATCH":    "Stay alert and monitor conditions.",
+    "WARNING":  "Risk is high — be prepared to move to safety.",
+    "CRITICAL": "This is life-threatening. Move to a safe place immediately!",
+}
+
+# Sinhala tone by risk level — WATCH stays advisory (no "නිකුත් කර ඇත")
+SINHALA_FLOOD_TONE = {
+    "WATCH":    "{station} ප්‍රදේශයේ ගංවතුර අවදානමක් ඇති විය හැකි බැවින් අවධානයෙන් සිටින්න.",
+    "WARNING":  "{station} ප්‍රදේශයේ ගංවතුර අවදානම ඉහළ ගොස් ඇත. ඉක්මනින් ආරක්ෂිතව සිටින්න!",
+    "CRITICAL": "{station} ප්‍රදේශයේ භයාණක ගංවතුර අවදානමක්! "
+                "ජීවිත ආරක්ෂාව සඳහා ඉතා ඉක්මනින් ආරක්ෂිත ස්ථානවලට යන්න!",
+}
+SINHALA_LANDSLIDE_TONE = {
+    "WATCH":    "{station} ප්‍රදේශයේ නායයෑම් අවදානමක් ඇති විය හැකිය. ප්‍රවේශම් වන්න.",
+    "WARNING":  "{station} ප්‍රදේශයේ නායයෑම් අවදානම ඉහළ ගොස් ඇත. ඉක්මනින් ආරක්ෂිතව සිටින්න!",
+    "CRITICAL": "{station} ප්‍රදේශයේ භයාණක නායයෑම් අවදානමක්! "
+                "ජීවිත ආරක්ෂාව සඳහා ඉතා ඉක්මනින් ආරක්ෂිත ස්ථානවලට යන්න!",
+}
+
+
+def _next_threshold(w):
+    """(name, hours) of the nearest threshold the station is projected to reach, or None."""
+    upcoming = [(w[f"hours_to_{name}"], name) for name in ("alert", "minor", "major")
+                if w.get(f"hours_to_{name}")]
+    if not upcoming:
+        return None
+    hours, name = min(upcoming)
+    return name, hours
+
+
+def _english_flood(w):
+    text = (f"A {w['risk_level']} level flood alert HAS BEEN ISSUED for {w['station']}"
+            f" ({w.get('river_basin', 'Unknown')}). The water level is {w['level_m']}m")
+    rate = w.get("rate_of_rise")
+    if rate is not None and rate > 0:
+        text += f" and rising at {rate}m/hour"
+    elif rate is not None and rate < 0:
+        text += f" and falling at {abs(rate)}m/hour"
+    text += "."
+    upcoming = _next_threshold(w)
+    if upcoming:
+        text += f" It is projected to reach the {upcoming[0]} flood level in about {upcoming[1]} hours."
+    if w.get("rain_1h_mm"):
+        text += f" Rainfall: {w['rain_1h_mm']}mm/h."
+    return f"{text} {ENGLISH_ACTION[w['risk_level']]}"
+
+
+def _english_landslide(w):
+    return (f"A {w['risk_level']} level landslide alert HAS BEEN ISSUED for {w['station']}."
+            f" Rainfall is {w['rain_1h_mm']}mm/h with {w['humidity']}% humidity"
+            f" and wind at {w['wind_speed_ms']}m/s. {ENGLISH_ACTION[w['risk_level']]}")
+
+
+def _sinhala_flood(w):
+    text = SINHALA_FLOOD_TONE[w["risk_level"]].format(station=w["station"])
+    text += f" ජල මට්ටම {w['level_m']}m"
+    rate = w.get("rate_of_rise")
+    if rate is not None and rate > 0:
+        text += f" වන අතර පැයකට {rate}m ක වේගයකින් ඉහළ යමින් පවතී."
+    elif rate is not None and rate < 0:
+        text += f" වන අතර පැයකට {abs(rate)}m ක වේගයකින් පහළ බසිමින් පවතී."
+    else:
+        text += " වේ."
+    if w.get("rain_1h_mm"):
+        text += f" වර්ෂාපතනය පැයට {w['rain_1h_mm']}mm."
+    return text
+
+
+def _sinhala_landslide(w):
+    return (SINHALA_LANDSLIDE_TONE[w["risk_level"]].format(station=w["station"])
+            + f" වර්ෂාපතනය පැයට {w['rain_1h_mm']}mm, ආර්ද්‍රතාවය {w['humidity']}%.")
+
+
+def render_template_block(flood_warnings, landslide_warnings, language):
+    """Render one language block ("en" or "si") of the template alert, disclaimer included."""
+    if language == "en":
+        if not flood_warnings and not landslide_warnings:
+            lines = ["All monitored flood stations and landslide zones are at NORMAL levels. "
+                     "There are no flood or landslide warnings at this time."]
+        else:
+            lines = [_english_flood(w) for w in flood_warnings] or \
+                ["There are no flood warnings at this time."]
+            lines += [_english_landslide(w) for w in landslide_warnings] or \
+                ["There are no landslide warnings at this time."]
+        disclaimer = ENGLISH_DISCLAIMER
+    else:
+        if not flood_warnings and not landslide_warnings:
+            lines = ["මේ වන විට ගංවතුර හෝ නායයෑම් අනතුරු ඇඟවීම් නොමැත."]
+        else:
+            lines = [_sinhala_flood(w) for w in flood_warnings] or \
+                ["මේ වන විට ගංවතුර අනතුරු ඇඟවීම් නොමැත."]
+            lines += [_sinhala_landslide(w) for w in landslide_warnings] or \
+                ["මේ වන විට නායයෑම් අනතුරු ඇඟවීම් නොමැත."]
+        disclaimer = SINHALA_DISCLAIMER
+
+    return "\n\n".join(lines) + f"\n\n{disclaimer}"
 
-def generate_llm_response(flood_warnings, landslide_warnings):
+
+def render_template_alert(flood_warnings, landslide_warnings):
     """
-    Takes flood and landslide warning zones and generates a bilingual
-    (English + Sinhala) disaster alert message using Gemini.
+    Render a bilingual alert from the warning zones without calling Gemini.
+    Same two-block format, tone and disclaimers as the LLM alerts.
+    """
+    return (f"{render_template_block(flood_warnings, landslide_warnings, 'en')}"
+            f"\n\n{render_template_block(flood_warnings, landslide_warnings, 'si')}")
 
-    Returns:
-        str: The generated alert message, or None on failure.
+
+# Clients reused across calls (and across cycles in daemon mode), one per config
+_llm_clients = {}
+_circuit_breaker = None
+
+# Background Gemini calls for the template-first fast path
+_llm_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="gemini")
+# English and Sinhala blocks generated concurrently (gemini.parallel_languages)
+_language_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="gemini-lang")
+DEFAULT_LATENCY_BUDGET_SECONDS = 20
+DEFAULT_DELTA_MAX_OUTPUT_TOKENS = 1024
+DEFAULT_LANGUAGE_MAX_OUTPUT_TOKENS = 2048
+
+# A follow-up message to send after the alert: the enriched Gemini text
+# ("Update"), or the Sinhala block when the English block went out first
+FollowUp = namedtuple("FollowUp", ["future", "label"])
+UPDATE_LABEL = "Update"
+SINHALA_LABEL = "සිංහල"
+
+# Closing instruction of the human message, per requested output
+FULL_INSTRUCTION = "Please generate a clear public alert in English first, then in Sinhala."
+DELTA_INSTRUCTION = ("Please write a brief update (a few sentences per language) "
+                     "in English first, then in Sinhala.")
+LANGUAGE_INSTRUCTION = {
+    "en": "Write ONLY BLOCK 1 (English): the English alert text, then the English disclaimer. "
+          "Do not write any Sinhala.",
+    "si": "Write ONLY BLOCK 2 (Sinhala): the Sinhala alert text, then the Sinhala disclaimer. "
+          "Do not write any English text.",
+}
+
+
+def _get_circuit_breaker():
+    """One breaker for all Gemini clients — they share the same upstream API."""
+    global _circuit_breaker
+    if _circuit_breaker is None:
+        breaker_config = settings.gemini_config.get("circuit_breaker", {})
+        _circuit_breaker = CircuitBreaker(
+            failure_threshold=breaker_config.get("failure_threshold", 3),
+            reset_seconds=breaker_config.get("reset_seconds", 300),
+            state_file=cache_path("llm_circuit.json"),
+        )
+    return _circuit_breaker
+
+
+def _take_gemini_quota(messages, max_output_tokens, max_wait=None):
     """
-    logger.info("Preparing LLM alert generation request")
-    logger.info("Input: %d flood warnings, %d landslide warnings",
-                len(flood_warnings), len(landslide_warnings))
+    Take Gemini free-tier quota for one request (utils/quota.py): one request
+    against the per-minute and daily budgets, and its tokens (about 4
+    characters each, plus the full output allowance) against the per-minute
+    token budget. Called by ResilientLLMClient before every attempt and hedge.
+    """
+    tokens = sum(len(m.content) for m in messages) // 4 + max_output_tokens
+    return quota.acquire({"gemini": 1, "gemini_daily": 1, "gemini_tokens": tokens},
+                         max_wait=max_wait)
 
-    # Load config from settings
-    api_key = settings.GEMINI_API_KEY
-    model_name = settings.gemini_config["model"]
-    temperature = settings.gemini_config["temperature"]
-    max_output_tokens = settings.gemini_config["max_output_tokens"]
 
+def _get_llm(api_key, model_name, temperature, max_output_tokens):
+    """
+    Return a cached Gemini client for this config, creating it on first use.
+    The client is wrapped with a deadline, retries, optional hedging, the
+    Gemini quota and the shared circuit breaker (see agents/llm_client.py).
+    """
+    key = (api_key, model_name, temperature, max_output_tokens)
+    if key not in _llm_clients:
+        # Imported here: langchain is slow to import and most cycles never call the LLM
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        timeout = settings.gemini_config.get("timeout_seconds", 30)
+
+        logger.info("Connecting to Gemini model: %s (max_output_tokens=%d)",
+                    model_name, max_output_tokens)
+        llm = ChatGoogleGenerativeAI(
+            model=model_name,
+            temperature=temperature,
+            max_output_tokens=max_output_tokens,
+            google_api_key=api_key,
+            timeout=timeout,
+            max_retries=0,      # Retries are handled (and bounded) by ResilientLLMClient
+        )
+        _llm_clients[key] = ResilientLLMClient(
+            llm,
+            timeout_seconds=timeout,
+            max_retries=settings.gemini_config.get("max_retries", 2),
+            retry_backoff_seconds=settings.gemini_config.get("retry_backoff_seconds", 1.0),
+            hedge_after_seconds=settings.gemini_config.get("hedge_after_seconds", 0),
+            circuit_breaker=_get_circuit_breaker(),
+            take_quota=partial(_take_gemini_quota, max_output_tokens=max_output_tokens),
+        )
+    return _llm_clients[key]
+
+
+def _use_delta(delta):
+    """Delta prompts need a previous state and gemini.delta_prompts enabled."""
+    return delta is not None and settings.gemini_config.get("delta_prompts", True)
+
+
+def _parallel_languages():
+    """English and Sinhala blocks as two concurrent requests (gemini.parallel_languages)."""
+    return settings.gemini_config.get("parallel_languages", False)
+
+
+def _max_output_tokens(delta, language=None):
+    if _use_delta(delta):
+        tokens = settings.gemini_config.get("delta_max_output_tokens", DEFAULT_DELTA_MAX_OUTPUT_TOKENS)
+    else:
+        tokens = settings.gemini_config["max_output_tokens"]
+    if language:
+        # One language block needs only part of the bilingual budget
+        tokens = min(tokens, settings.gemini_config.get("language_max_output_tokens",
+                                                        DEFAULT_LANGUAGE_MAX_OUTPUT_TOKENS))
+    return tokens
+
+
+def _round(value, digits):
+    return None if value is None else round(value, digits)
+
+
+def _round_half(value):
+    """Round to the nearest 0.5 (projected hours to a threshold)."""
+    return None if value is None else round(value * 2) / 2
+
+
+def _cache_payload(flood_warnings, landslide_warnings, model_config, delta=None, language=None):
+    """
+    Canonical prompt inputs used as the alert cache key.
+    Readings are rounded so that insignificant sensor noise still hits the cache.
+    """
+    payload = {
+        "system_prompt": SYSTEM_PROMPT,
+        "model": model_config,
+        "flood": sorted(
+            [w["station"], w["risk_level"], w.get("risk_score"), _round(w.get("level_m"), 1),
+             _round(w.get("rate_of_rise"), 2), _round(w.get("rain_1h_mm"), 0)]
+            + [_round_half(w.get(f"hours_to_{name}")) for name in ("alert", "minor", "major")]
+            for w in flood_warnings
+        ),
+        "landslide": sorted(
+            [w["station"], w["risk_level"], _round(w.get("rain_1h_mm"), 0),
+             _round(w.get("humidity"), 0), _round(w.get("wind_speed_ms"), 0),
+             _round(w.get("rain_24h_mm"), -1), _round(w.get("rain_72h_mm"), -1)]
+            for w in landslide_warnings
+        ),
+    }
+    if _use_delta(delta):
+        payload["delta"] = {
+            kind: {change: sorted([z["station"], z.get("previous_level")] for z in zones)
+                   for change, zones in changes.items()}
+            for kind, changes in delta.items()
+        }
+    if language:
+        payload["language"] = language
+    return payload
+
+
+def _alert_cache_key(flood_warnings, landslide_warnings, delta=None, language=None):
+    model_config = [settings.gemini_config["model"],
+                    settings.gemini_config["temperature"],
+                    _max_output_tokens(delta, language)]
+    return cache_key(_cache_payload(flood_warnings, landslide_warnings, model_config,
+                                    delta, language))
+
+
+def _flood_line(w):
+    upcoming = _next_threshold(w)
+    projection = f"| Projected: {upcoming[0]} level in ~{upcoming[1]}h " if upcoming else ""
+    return (
+        f"Station: {w['station']} | Basin: {w['river_basin']} "
+        f"| Level: {w['level_m']}m | Rate of Rise: {w.get('rate_of_rise', 'N/A')}m/hr "
+        f"{projection}"
+        f"| Rain: {w['rain_1h_mm']}mm/h "
+        f"| Risk: {w['risk_level']} (score={w['risk_score']})"
+    )
+
+
+def _landslide_line(w):
+    # The engine sets the antecedent totals to None until the accumulator has data
+    rain_24h = "N/A" if w.get("rain_24h_mm") is None else f"{w['rain_24h_mm']}mm"
+    rain_72h = "N/A" if w.get("rain_72h_mm") is None else f"{w['rain_72h_mm']}mm"
+    return (
+        f"Zone: {w['station']} "
+        f"| Rain: {w['rain_1h_mm']}mm/h "
+        f"| Rain 24h: {rain_24h} | Rain 72h: {rain_72h} "
+        f"| Humidity: {w['humidity']}% "
+        f"| Wind: {w['wind_speed_ms']}m/s "
+        f"| Risk: {w['risk_level']} (score={w['risk_score']})"
+    )
+
+
+def _full_prompt(flood_warnings, landslide_warnings, instruction=FULL_INSTRUCTION):
+    """Human message describing every active zone (full bulletin)."""
     # Build the human message with actual warning data
     flood_summary = ""
     if flood_warnings:
         for w in flood_warnings:
-            flood_summary += (
-                f"- Station: {w['station']} | Basin: {w['river_basin']} "
-                f"| Level: {w['level_m']}m | Rate of Rise: {w.get('rate_of_rise', 'N/A')}m/hr "
-                f"| Rain: {w['rain_1h_mm']}mm/h "
-                f"| Risk: {w['risk_level']} (score={w['risk_score']})\n"
-            )
+            flood_summary += f"- {_flood_line(w)}\n"
     else:
         flood_summary = "No flood warnings at this time.\n"
 
     landslide_summary = ""
     if landslide_warnings:
         for w in landslide_warnings:
-            landslide_summary += (
-                f"- Zone: {w['station']} "
-                f"| Rain: {w['rain_1h_mm']}mm/h "
-                f"| Humidity: {w['humidity']}% "
-                f"| Wind: {w['wind_speed_ms']}m/s "
-                f"| Risk: {w['risk_level']} (score={w['risk_score']})\n"
-            )
+            landslide_summary += f"- {_landslide_line(w)}\n"
     else:
         landslide_summary = "No landslide warnings at this time.\n"
 
-    human_message = f"""
+    return f"""
 Generate a disaster alert based on the following real-time sensor data from Sri Lanka:
 
 FLOOD MONITORING STATIONS:
@@ -98,18 +382,70 @@ FLOOD MONITORING STATIONS:
 LANDSLIDE MONITORING ZONES:
 {landslide_summary}
 
-Please generate a clear public alert in English first, then in Sinhala.
+{instruction}
 """
 
+
+def _delta_summary(changes, format_line):
+    """List only the zones that changed, tagged with the kind of change."""
+    lines = []
+    for w in changes["added"]:
+        lines.append(f"- NEW: {format_line(w)}")
+    for w in changes["escalated"]:
+        lines.append(f"- ESCALATED ({w['previous_level']} -> {w['risk_level']}): {format_line(w)}")
+    for w in changes["de_escalated"]:
+        lines.append(f"- DE-ESCALATED ({w['previous_level']} -> {w['risk_level']}): {format_line(w)}")
+    for w in changes["cleared"]:
+        lines.append(f"- CLEARED: {w['station']} (was {w['previous_level']}, now back to normal)")
+    return "\n".join(lines) + "\n" if lines else "No changes.\n"
+
+
+def _delta_prompt(flood_warnings, landslide_warnings, delta, instruction=DELTA_INSTRUCTION):
+    """Human message describing only what changed since the last alert."""
+    unchanged = sum(
+        len(warnings) - len(delta[kind]["added"]) - len(delta[kind]["escalated"])
+        - len(delta[kind]["de_escalated"])
+        for kind, warnings in (("flood", flood_warnings), ("landslide", landslide_warnings))
+    )
+
+    return f"""
+Generate a SHORT UPDATE to the previous disaster alert. Only the zones below changed since
+the last alert — do not repeat zones that are not listed.
+
+FLOOD STATION CHANGES:
+{_delta_summary(delta["flood"], _flood_line)}
+LANDSLIDE ZONE CHANGES:
+{_delta_summary(delta["landslide"], _landslide_line)}
+Other zones still active and unchanged: {unchanged}
+
+{instruction}
+"""
+
+
+def _human_message(flood_warnings, landslide_warnings, delta, language=None):
+    """Full bulletin or delta prompt, for both languages or just one."""
+    if _use_delta(delta):
+        logger.info("Using delta prompt — only changed zones are sent")
+        instruction = DELTA_INSTRUCTION
+        if language:
+            instruction = f"Please write a brief update. {LANGUAGE_INSTRUCTION[language]}"
+        return _delta_prompt(flood_warnings, landslide_warnings, delta, instruction)
+
+    instruction = LANGUAGE_INSTRUCTION[language] if language else FULL_INSTRUCTION
+    return _full_prompt(flood_warnings, landslide_warnings, instruction)
+
+
+def _invoke_gemini(key, human_message, max_output_tokens):
+    """Cached Gemini call: returns the stored text for key, else generates and stores it."""
+    cached_alert = get_cached_alert(key)
+    if cached_alert:
+        return cached_alert
+
     try:
-        logger.info("Connecting to Gemini model: %s", model_name)
+        from langchain_core.messages import HumanMessage, SystemMessage
 
-        llm = ChatGoogleGenerativeAI(
-            model=model_name,
-            temperature=temperature,
-            max_output_tokens=max_output_tokens,
-            google_api_key=api_key,
-        )
+        llm = _get_llm(settings.GEMINI_API_KEY, settings.gemini_config["model"],
+                       settings.gemini_config["temperature"], max_output_tokens)
 
         messages = [
             SystemMessage(content=SYSTEM_PROMPT.strip()),
@@ -121,6 +457,7 @@ Please generate a clear public alert in English first, then in Sinhala.
         alert_text = response.content
 
         logger.info("Alert generated successfully (%d characters)", len(alert_text))
+        store_alert(key, alert_text)
         return alert_text
 
     except Exception as e:
@@ -128,6 +465,191 @@ Please generate a clear public alert in English first, then in Sinhala.
         return None
 
 
+def generate_language_block(flood_warnings, landslide_warnings, language, delta=None):
+    """
+    Generate only the English ("en") or Sinhala ("si") block of the alert,
+    with the smaller gemini.language_max_output_tokens limit.
+
+    Returns:
+        str: The block, disclaimer included, or None on failure.
+    """
+    key = _alert_cache_key(flood_warnings, landslide_warnings, delta, language)
+    human_message = _human_message(flood_warnings, landslide_warnings, delta, language)
+    return _invoke_gemini(key, human_message, _max_output_tokens(delta, language))
+
+
+def _submit_language_blocks(flood_warnings, landslide_warnings, delta):
+    """Start the English and Sinhala requests concurrently; returns both futures."""
+    logger.info("Generating English and Sinhala blocks in parallel")
+    return tuple(
+        _language_executor.submit(generate_language_block, flood_warnings,
+                                  landslide_warnings, language, delta)
+        for language in ("en", "si")
+    )
+
+
+def _assemble_blocks(key, english_future, sinhala_future):
+    """Join both language blocks into the two-block alert and cache it (None if either failed)."""
+    english, sinhala = english_future.result(), sinhala_future.result()
+    if english is None or sinhala is None:
+        return None
+
+    alert_text = f"{english.strip()}\n\n{sinhala.strip()}"
+    store_alert(key, alert_text)
+    return alert_text
+
+
+def _sinhala_or_template(sinhala_future, flood_warnings, landslide_warnings):
+    """Sinhala block from Gemini, or from the template if Gemini failed."""
+    sinhala = sinhala_future.result()
+    if sinhala is None:
+        logger.warning("Gemini Sinhala block unavailable — using the template block")
+        return render_template_block(flood_warnings, landslide_warnings, "si")
+    return sinhala
+
+
+def generate_llm_response(flood_warnings, landslide_warnings, delta=None):
+    """
+    Takes flood and landslide warning zones and generates a bilingual
+    (English + Sinhala) disaster alert message using Gemini.
+    Identical inputs are served from the on-disk alert cache (utils/llm_cache.py).
+    With gemini.parallel_languages the two blocks are generated as concurrent
+    requests and joined in the usual two-block format.
+
+    Args:
+        delta: Changes since the last alert (utils.alert_state.get_delta).
+            When given (and gemini.delta_prompts is on), Gemini only sees the
+            added / escalated / de-escalated / cleared zones and writes a
+            short update instead of a full bulletin.
+
+    Returns:
+        str: The generated alert message, or None on failure.
+    """
+    logger.info("Preparing LLM alert generation request")
+    logger.info("Input: %d flood warnings, %d landslide warnings",
+                len(flood_warnings), len(landslide_warnings))
+
+    # Reuse a previously generated alert for the exact same inputs
+    key = _alert_cache_key(flood_warnings, landslide_warnings, delta)
+
+    if _parallel_languages():
+        cached_alert = get_cached_alert(key)
+        if cached_alert:
+            return cached_alert
+        return _assemble_blocks(key, *_submit_language_blocks(flood_warnings, landslide_warnings, delta))
+
+    human_message = _human_message(flood_warnings, landslide_warnings, delta)
+    return _invoke_gemini(key, human_message, _max_output_tokens(delta))
+
+
+def generate_alert(flood_warnings, landslide_warnings, delta=None):
+    """
+    Produce the alert to send now, without letting Gemini's latency hold it up.
+
+    - Cached LLM text for these exact inputs is returned immediately.
+    - CRITICAL alerts (gemini.template_for_critical) go out from the template
+      straight away; the Gemini text follows as an enriched update.
+    - Otherwise Gemini gets gemini.latency_budget_seconds. If it is slower,
+      the template is sent and the Gemini text follows; if it fails, the
+      template is sent on its own.
+    - With gemini.parallel_languages the budget applies to the English block
+      only: it is sent as soon as it is ready and the Sinhala block follows.
+
+    Args:
+        delta: Changes since the last alert, passed on to generate_llm_response.
+            The template always renders the full bulletin.
+
+    Returns:
+        (alert_text, follow_up): follow_up is a FollowUp whose future resolves
+        to the text to send next (or None on failure), or None if there is none.
+    """
+    key = _alert_cache_key(flood_warnings, landslide_warnings, delta)
+    cached_alert = get_cached_alert(key)
+    if cached_alert:
+        return cached_alert, None
+
+    budget = settings.gemini_config.get("latency_budget_seconds", DEFAULT_LATENCY_BUDGET_SECONDS)
+    critical = any(w["risk_level"] == "CRITICAL" for w in flood_warnings + landslide_warnings)
+
+    if _parallel_languages():
+        english_future, sinhala_future = _submit_language_blocks(flood_warnings, landslide_warnings, delta)
+        future = _llm_executor.submit(_assemble_blocks, key, english_future, sinhala_future)
+        first_future = english_future
+    else:
+        future = _llm_executor.submit(generate_llm_response, flood_warnings, landslide_warnings, delta)
+        first_future = future
+
+    if critical and settings.gemini_config.get("template_for_critical", True):
+        logger.info("CRITICAL zone present — sending template alert now, Gemini text to follow")
+        return render_template_alert(flood_warnings, landslide_warnings), FollowUp(future, UPDATE_LABEL)
+
+    try:
+        alert_text = first_future.result(timeout=budget)
+    except FuturesTimeout:
+        logger.warning("Gemini missed the %ss latency budget — sending template alert now, "
+                       "Gemini text to follow", budget)
+        return render_template_alert(flood_warnings, landslide_warnings), FollowUp(future, UPDATE_LABEL)
+
+    if alert_text is None:
+        logger.warning("Gemini unavailable — sending template alert")
+        return render_template_alert(flood_warnings, landslide_warnings), None
+
+    if _parallel_languages():
+        logger.info("English block ready — sending it now, Sinhala block to follow")
+        sinhala = _llm_executor.submit(_sinhala_or_template, sinhala_future,
+                                       flood_warnings, landslide_warnings)
+        return alert_text, FollowUp(sinhala, SINHALA_LABEL)
+    return alert_text, None
+
+
+def stream_alert(flood_warnings, landslide_warnings, delta=None):
+    """
+    Yield the alert text progressively as Gemini writes it (gemini.streaming),
+    so the first part can be posted while the rest is still being generated.
+    Always generates the two blocks in one request (parallel_languages does
+    not apply).
+
+    - Cached LLM text for these exact inputs is yielded in one piece.
+    - If Gemini fails before producing any text, the template alert is yielded.
+    - If it fails part-way, the template alert is appended so the message
+      still carries every zone and both disclaimers.
+    """
+    key = _alert_cache_key(flood_warnings, landslide_warnings, delta)
+    cached_alert = get_cached_alert(key)
+    if cached_alert:
+        yield cached_alert
+        return
+
+    parts = []
+    try:
+        from langchain_core.messages import HumanMessage, SystemMessage
+
+        max_output_tokens = _max_output_tokens(delta)
+        human_message = _human_message(flood_warnings, landslide_warnings, delta)
+        llm = _get_llm(settings.GEMINI_API_KEY, settings.gemini_config["model"],
+                       settings.gemini_config["temperature"], max_output_tokens)
+        messages = [
+            SystemMessage(content=SYSTEM_PROMPT.strip()),
+            HumanMessage(content=human_message.strip()),
+        ]
+
+        logger.info("Streaming request to Gemini...")
+        for chunk in llm.stream(messages):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield chunk.content
+
+    except Exception as e:
+        logger.error("Gemini LLM stream failed after %d chunks: %s", len(parts), e)
+        template = render_template_alert(flood_warnings, landslide_warnings)
+        yield f"\n\n{template}" if parts else template
+        return
+
+    alert_text = "".join(parts)
+    logger.info("Alert streamed successfully (%d characters)", len(alert_text))
+    store_alert(key, alert_text)
+
+
 # ── Quick test ───────────────────────────────────────────────────────
 if __name__ == "__main__":
     # Simulate warning zones for testing
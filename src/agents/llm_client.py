@@ -0,0 +1,194 @@
+"""
+Resilient LLM client — wraps a chat model with latency and failure controls.
+
+- Deadline: each invoke() returns or raises within timeout_seconds,
+  retries included, no matter how slow the API is.
+- Retries: failed attempts are retried with jittered exponential backoff
+  while the deadline allows.
+- Hedging (optional): if an attempt is still running after
+  hedge_after_seconds, a second identical request is fired and the first
+  answer wins.
+- Quota (optional): every request sent — first try, retry or hedge — first
+  takes its API quota. A retry waits for it; a hedge is skipped when no
+  quota is left right now.
+- Streaming: stream() yields chunks as they arrive. It is retried only
+  before the first chunk, because a partial answer cannot be replayed.
+- Circuit breaker: after failure_threshold failed calls in a row, calls
+  fail immediately with CircuitOpenError for reset_seconds, so callers go
+  straight to their fallback while the API is degraded. The breaker state
+  is kept in data/llm_circuit.json so one-shot runs share it.
+"""
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from utils.file_cache import load_json, save_json
+from utils.logger import setup_logger
+from utils.quota import QuotaExhaustedError
+
+logger = setup_logger("LLMClient")
+
+# Attempts run here so that the caller can stop waiting at the deadline
+_attempt_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="llm-attempt")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=3, reset_seconds=300, state_file=None):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state_file = state_file
+        self._lock = threading.Lock()
+
+        state = (load_json(state_file) if state_file else None) or {}
+        self.failures = state.get("failures", 0)
+        self.opened_at = state.get("opened_at")
+
+    def _save(self):
+        if self.state_file:
+            save_json(self.state_file, {"failures": self.failures, "opened_at": self.opened_at})
+
+    def allow(self) -> bool:
+        """True if a call may go through (closed, or half-open after reset_seconds)."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.time() - self.opened_at >= self.reset_seconds:
+                logger.info("Circuit half-open — letting one trial call through")
+                # Re-arm the timer so only this call probes the API
+                self.opened_at = time.time()
+                self._save()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None or self.failures:
+                logger.info("LLM call succeeded — circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self._save()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning("Circuit OPEN after %d failed calls — failing fast for %ds",
+                                   self.failures, self.reset_seconds)
+                self.opened_at = time.time()
+            self._save()
+
+
+class ResilientLLMClient:
+    """Drop-in wrapper exposing invoke(messages) like a langchain chat model."""
+
+    def __init__(self, llm, timeout_seconds=30, max_retries=2, retry_backoff_seconds=1.0,
+                 hedge_after_seconds=0, circuit_breaker=None, take_quota=None):
+        """
+        Args:
+            take_quota: Optional take_quota(messages, max_wait=None) -> bool,
+                called before every request (e.g. utils.quota.acquire for the
+                request's costs). False means no quota within max_wait.
+        """
+        self.llm = llm
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.hedge_after_seconds = hedge_after_seconds
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.take_quota = take_quota
+
+    def _quota(self, messages, max_wait=None) -> bool:
+        return self.take_quota is None or self.take_quota(messages, max_wait=max_wait)
+
+    def _attempt(self, messages, deadline):
+        """One attempt (plus an optional hedge), bounded by the deadline."""
+        if not self._quota(messages):
+            raise QuotaExhaustedError("LLM quota exhausted")
+        pending = {_attempt_executor.submit(self.llm.invoke, messages)}
+
+        if self.hedge_after_seconds and time.monotonic() + self.hedge_after_seconds < deadline:
+            done, _ = wait(pending, timeout=self.hedge_after_seconds)
+            if not done:
+                if self._quota(messages, max_wait=0):
+                    logger.info("No response after %ss — sending hedged request",
+                                self.hedge_after_seconds)
+                    pending.add(_attempt_executor.submit(self.llm.invoke, messages))
+                else:
+                    logger.info("No response after %ss — no quota left for a hedged request",
+                                self.hedge_after_seconds)
+
+        last_error = None
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                last_error = future.exception()
+
+        raise last_error or TimeoutError(f"no response within {self.timeout_seconds}s deadline")
+
+    def invoke(self, messages):
+        if not self.circuit_breaker.allow():
+            raise CircuitOpenError("LLM circuit breaker is open — skipping call")
+
+        deadline = time.monotonic() + self.timeout_seconds
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = self._attempt(messages, deadline)
+                self.circuit_breaker.record_success()
+                return result
+            except QuotaExhaustedError:
+                # Not an API failure: leave the breaker alone, retrying cannot help
+                raise
+            except Exception as e:
+                last_error = e
+                logger.warning("LLM attempt %d/%d failed: %s", attempt + 1,
+                               self.max_retries + 1, str(e) or type(e).__name__)
+
+            if attempt == self.max_retries:
+                break
+            # Exponential backoff with full jitter, never past the deadline
+            delay = random.uniform(0, self.retry_backoff_seconds * 2 ** attempt)
+            if time.monotonic() + delay >= deadline:
+                break
+            time.sleep(delay)
+
+        self.circuit_breaker.record_failure()
+        raise last_error
+
+    def stream(self, messages):
+        """Yield response chunks as the model produces them (like langchain's stream())."""
+        if not self.circuit_breaker.allow():
+            raise CircuitOpenError("LLM circuit breaker is open — skipping call")
+
+        deadline = time.monotonic() + self.timeout_seconds
+
+        for attempt in range(self.max_retries + 1):
+            if not self._quota(messages):
+                raise QuotaExhaustedError("LLM quota exhausted")
+            received = False
+            try:
+                for chunk in self.llm.stream(messages):
+                    received = True
+                    yield chunk
+                self.circuit_breaker.record_success()
+                return
+            except Exception as e:
+                logger.warning("LLM stream attempt %d/%d failed: %s", attempt + 1,
+                               self.max_retries + 1, str(e) or type(e).__name__)
+                delay = random.uniform(0, self.retry_backoff_seconds * 2 ** attempt)
+                if received or attempt == self.max_retries or time.monotonic() + delay >= deadline:
+                    self.circuit_breaker.record_failure()
+                    raise
+            time.sleep(delay)
@@ -3,48 +3,136 @@ import sys
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
 
-sys.path.append(parent_dir)
-
+from collectors.weather_provider import create_weather_provider
 from engine.flood_engine import FloodEngine
 from engine.landslide_engine import LandslideEngine
+from engine.scoring import RISK_LEVEL_INDEX
 from utils.logger import setup_logger
-from utils.alert_state import has_changed
-from agents.llm import generate_llm_response
+from utils.alert_state import get_delta, has_changed, snapshot, touch_zones, zone_levels
+from utils.outbox import enqueue, idempotency_key, latest_id, pending_state
+from agents.llm import generate_alert, stream_alert
+from notifiers.dispatcher import affected_areas
 
 logger = setup_logger("MonitorAgent")
 
 class MonitorAgent:
     def __init__(self):
-        self.flood_engine = FloodEngine()
-        self.landslide_engine = LandslideEngine()
+        # One weather provider (weather.provider in config.yaml) shared by both engines
+        self.rainfall_collector = create_weather_provider()
+        self.flood_engine = FloodEngine(rainfall_collector=self.rainfall_collector)
+        self.landslide_engine = LandslideEngine(rainfall_collector=self.rainfall_collector)
+        # Gemini text still being generated after a template alert went out
+        self.pending_update = None
+        # Districts / basins the last alert is about (for Telegram routing)
+        self.alert_areas = None
+        # State the last alert represents, saved once it is delivered
+        self.alert_state = None
+        self.alert_key = None
 
     def monitor_disasters(self):
         """
         Monitor both flood and landslide conditions and return warnings.
+        Weather is fetched once per cycle and the snapshot is fed to both engines,
+        together with the last alerted levels so zones near an edge do not flap.
+        Zones already at a raised level are fetched first when the weather API
+        quota is tight.
         """
-        flood_warnings = self.flood_engine.custom_logic_for_flood_engine()
-        landslide_warnings = self.landslide_engine.custom_logic_for_landslide()
+        flood_levels, landslide_levels = zone_levels("flood"), zone_levels("landslide")
+        priorities = {station: RISK_LEVEL_INDEX.get(state["risk_level"], 0)
+                      for levels in (flood_levels, landslide_levels)
+                      for station, state in levels.items()}
+        snapshot = self.rainfall_collector.collect_all(priorities=priorities)
+
+        flood_warnings = self.flood_engine.custom_logic_for_flood_engine(
+            rainfall_flood_data=snapshot["flood"], previous_levels=flood_levels)
+        landslide_warnings = self.landslide_engine.custom_logic_for_landslide(
+            landslide_data=snapshot["landslide"], previous_levels=landslide_levels)
 
         return flood_warnings, landslide_warnings
 
-    def generate_report(self):
+    def _changed_warnings(self):
         """
-        Run a monitoring cycle. Generates and returns an LLM alert only if
-        the warning zones have changed since the last sent alert.
-        Returns None if nothing has changed (no alert to send).
+        Run a monitoring cycle and return (flood_warnings, landslide_warnings, delta),
+        or None if the warning zones have not changed since the last sent alert.
         """
         flood_warnings, landslide_warnings = self.monitor_disasters()
+        # Zones still at their alerted level stay remembered for another TTL
+        touch_zones(flood_warnings, landslide_warnings)
+
+        # Compare against the newest queued alert if one is still undelivered,
+        # otherwise against the last delivered state
+        base_id = latest_id()
+        state = pending_state()
+
+        # What changed vs that state
+        delta = get_delta(flood_warnings, landslide_warnings, state)
 
-        # Check if anything changed vs the last saved state
-        if not has_changed(flood_warnings, landslide_warnings):
+        # Check if anything changed vs that state
+        if not has_changed(flood_warnings, landslide_warnings, state):
             logger.info("Alert suppressed — no change since last cycle")
             return None
 
         logger.info("State changed — generating new alert")
-        alert = generate_llm_response(flood_warnings, landslide_warnings)
+        self.alert_areas = affected_areas(flood_warnings, landslide_warnings, delta)
+        self.alert_state = snapshot(flood_warnings, landslide_warnings)
+        # Overlapping runs that see the same change get the same key
+        self.alert_key = idempotency_key(base_id, self.alert_state)
+        return flood_warnings, landslide_warnings, delta
+
+    def generate_report(self):
+        """
+        Run a monitoring cycle. Generates and returns an LLM alert only if
+        the warning zones have changed since the last sent alert.
+        Returns None if nothing has changed (no alert to send).
+        """
+        changed = self._changed_warnings()
+        if changed is None:
+            return None
+
+        alert, self.pending_update = generate_alert(*changed)
         return alert
 
+    def stream_report(self):
+        """
+        Like generate_report(), but returns an iterator of text chunks that
+        yields the alert as Gemini writes it (gemini.streaming).
+        Returns None if nothing has changed (no alert to send).
+        """
+        changed = self._changed_warnings()
+        if changed is None:
+            return None
+        return stream_alert(*changed)
+
+    def queue_alert(self, message, label=None, delivered_chats=()):
+        """
+        Queue a message of the current alert in the outbox (utils/outbox.py).
+        The alert itself carries its state; follow-up messages (label) do not.
+        Returns False if this exact message was already queued.
+        """
+        key = self.alert_key if label is None else idempotency_key(self.alert_key, label)
+        state = self.alert_state if label is None else None
+        return enqueue(key, message, self.alert_areas, state, delivered_chats)
+
+    def wait_for_update(self, timeout=None):
+        """
+        Wait for the follow-up message of the last alert: the enriched Gemini
+        text after a template alert, or the Sinhala block after an English-first
+        alert. Returns (text, label); text is None if there is no pending
+        follow-up, Gemini failed, or it did not finish within timeout seconds.
+        """
+        follow_up, self.pending_update = self.pending_update, None
+        if follow_up is None:
+            return None, None
+
+        try:
+            return follow_up.future.result(timeout=timeout), follow_up.label
+        except Exception as e:
+            logger.warning("Follow-up alert message not available: %s", str(e) or type(e).__name__)
+            return None, None
+
 
 # ── Quick test ──────────────────────────────────────────────────────
 if __name__ == "__main__":
@@ -1,23 +1,54 @@
 import requests
-from datetime import datetime
+import ijson
+from datetime import datetime, timedelta, timezone
+import heapq
+import sqlite3
+import numpy as np
+import threading
+import time
 import os
 import sys
 import json
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
-
-sys.path.append(parent_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
 
 from config import settings
 from utils.logger import setup_logger
+from engine.trend import pad_readings, theil_sen_rates
+from utils import http
+from utils.file_cache import cache_path, load_json, save_json
+from utils import timeseries
 
 logger = setup_logger("IrrigationCollector")
 
+# Last known ArcGIS gauge thresholds, reused across runs
+METADATA_CACHE_FILE = cache_path("arcgis_metadata.json")
+DEFAULT_METADATA_TTL_HOURS = 24
+
+# Newest readings per station from the last feed ingest + HTTP validators
+FEED_STATE_FILE = cache_path("irrigation_feed.json")
+DEFAULT_HISTORY_READINGS = 6
+# Only readings this close to a station's newest one go into its rate of rise
+DEFAULT_RATE_WINDOW_HOURS = 6
+
+# Feed timestamps are Sri Lanka local time (UTC+05:30)
+FEED_TIMEZONE = timezone(timedelta(hours=5, minutes=30))
+
+
 class IrrigationCollector:
     def __init__(self):
         self.github_url = settings.IRRIGATION_DATA_URL
         self.arcgis_url = settings.ARCGIS_URL
+        ttl_hours = settings.irrigation_config.get("metadata_ttl_hours", DEFAULT_METADATA_TTL_HOURS)
+        self.metadata_ttl = ttl_hours * 3600
+        self.history_readings = max(2, settings.irrigation_config.get(
+            "history_readings", DEFAULT_HISTORY_READINGS))
+        self.rate_window_hours = settings.irrigation_config.get(
+            "rate_window_hours", DEFAULT_RATE_WINDOW_HOURS)
+        self._refresh_thread = None
 
     def fetch_arcgis_metadata(self):
         logger.info("Fetching ArcGIS metadata from: %s", self.arcgis_url)
@@ -29,7 +60,7 @@ class IrrigationCollector:
             "f":                 "json"
         }
         try:
-            response = requests.get(self.arcgis_url, params=params, timeout=15)
+            response = http.get(self.arcgis_url, "arcgis", params=params)
             response.raise_for_status()
         except requests.RequestException as e:
             logger.error("Failed to fetch ArcGIS metadata: %s", e)
@@ -49,46 +80,240 @@ class IrrigationCollector:
             }
         return metadata
 
+    def _refresh_metadata_cache(self):
+        """Download fresh ArcGIS metadata and store it in the on-disk cache."""
+        metadata = self.fetch_arcgis_metadata()
+        if not metadata:
+            # ArcGIS reports some errors as HTTP 200 with no features — never cache that
+            raise ValueError("ArcGIS returned no gauge metadata")
+        save_json(METADATA_CACHE_FILE, {"fetched_at": time.time(), "metadata": metadata})
+        logger.info("ArcGIS metadata cache updated (%d gauges)", len(metadata))
+        return metadata
+
+    def _background_refresh(self, age_hours):
+        """Refresh the cache; on failure keep serving the last known thresholds."""
+        try:
+            self._refresh_metadata_cache()
+        except Exception as e:
+            logger.warning("ArcGIS refresh failed (%s) — still serving cached thresholds "
+                           "from %.1f hours ago", e, age_hours)
+
+    def get_arcgis_metadata(self):
+        """
+        Return gauge thresholds, served from the on-disk cache when possible.
+
+        - Fresh cache (younger than metadata_ttl_hours): returned directly.
+        - Stale cache: returned directly while a background thread refreshes it.
+        - No cache: fetched synchronously (raises if ArcGIS is unreachable).
+        """
+        cached = load_json(METADATA_CACHE_FILE)
+        if cached is None:
+            logger.info("No ArcGIS metadata cache — fetching synchronously")
+            return self._refresh_metadata_cache()
+
+        age_hours = (time.time() - cached.get("fetched_at", 0)) / 3600.0
+        if age_hours * 3600 < self.metadata_ttl:
+            logger.info("Using cached ArcGIS metadata (%.1f hours old)", age_hours)
+            return cached["metadata"]
+
+        logger.info("ArcGIS metadata cache is stale (%.1f hours old) — "
+                    "serving it and refreshing in the background", age_hours)
+        if self._refresh_thread is None or not self._refresh_thread.is_alive():
+            # Non-daemon: a one-shot run still finishes the refresh before exiting
+            self._refresh_thread = threading.Thread(
+                target=self._background_refresh, args=(age_hours,),
+                name="arcgis-metadata-refresh",
+            )
+            self._refresh_thread.start()
+        return cached["metadata"]
+
     def parse_datetime(self,date_str, time_str):
         try:
             return datetime.strptime(date_str + time_str[:6], "%Y%m%d%H%M%S")
         except ValueError:
             return None
 
-    def fetch_irrigation_data(self):
-        logger.info("Fetching irrigation data from GitHub: %s", self.github_url)
+    def _load_feed_state(self):
+        """Load the last ingest. Ignored if it was kept with a different history size."""
+        feed_state = load_json(FEED_STATE_FILE) or {}
+        if feed_state.get("history_readings") != self.history_readings:
+            return {}
+        return feed_state
+
+    def _newest_readings(self, dates, kept, stored_key=None):
+        """
+        Merge a station's feed readings into the readings kept from earlier
+        ingests. Returns (newest N, unstored), oldest first, as (key, level) pairs.
+
+        Keys are "YYYYMMDDHHMMSS" strings, so they order chronologically
+        without building a datetime for every reading. Times or dates with
+        unpadded fields ("93000") are parsed and rewritten in that form.
+        Only readings newer than the watermark (newest kept key) are considered.
+
+        unstored: readings newer than stored_key (newest key in the
+        time-series store), so the store gets every reading the feed has —
+        the whole history on the first ingest. Empty if stored_key is None.
+        """
+        watermark = kept[-1][0] if kept else ""
+        floor = watermark if stored_key is None else min(watermark, stored_key)
+        candidates = dict(kept)
+        unstored = []
+        for date_str, times in dates.items():
+            for time_str, level in times.items():
+                key = date_str + time_str[:6]
+                if len(key) != 14 or not key.isdigit():
+                    dt = self.parse_datetime(date_str, time_str)
+                    if dt is None:
+                        continue
+                    key = dt.strftime("%Y%m%d%H%M%S")
+                if key <= floor:
+                    continue
+                try:
+                    level = float(level)
+                except (TypeError, ValueError):
+                    continue
+                candidates[key] = level
+                if stored_key is not None and key > stored_key:
+                    unstored.append((key, level))
+
+        valid = lambda r: self.parse_datetime(r[0][:8], r[0][8:]) is not None
+        while True:
+            # Only the selected keys are parsed; an impossible one ("250000")
+            # is dropped and its slot goes to the next newest reading
+            newest = heapq.nlargest(self.history_readings, candidates.items())
+            invalid = [key for key, level in newest if not valid((key, level))]
+            if not invalid:
+                break
+            for key in invalid:
+                del candidates[key]
+        return sorted(newest), sorted(filter(valid, unstored))
+
+    @staticmethod
+    def _key_to_epoch(key):
+        """Feed key "YYYYMMDDHHMMSS" (Sri Lanka time) -> epoch seconds."""
+        return int(datetime.strptime(key, "%Y%m%d%H%M%S").replace(tzinfo=FEED_TIMEZONE).timestamp())
+
+    @staticmethod
+    def _epoch_to_key(ts):
+        return datetime.fromtimestamp(ts, FEED_TIMEZONE).strftime("%Y%m%d%H%M%S")
+
+    def _stored_keys(self):
+        """Newest stored feed key per station, or None if the store is off or unreadable."""
+        if not settings.timeseries_config.get("enabled", True):
+            return None
+        try:
+            return {station: self._epoch_to_key(ts)
+                    for station, ts in timeseries.latest_times("level_m").items()}
+        except sqlite3.Error as e:
+            logger.warning("Time-series store unavailable (%s) — not recording water levels", e)
+            return None
+
+    def _record_readings(self, unstored):
+        """Append new feed readings to the time-series store."""
         try:
-            github_raw = requests.get(self.github_url, timeout=15).json()
+            added = timeseries.append(
+                (station, "level_m", self._key_to_epoch(key), level)
+                for station, readings in unstored.items()
+                for key, level in readings
+            )
+            logger.info("Stored %d water level readings in the time-series store", added)
+        except sqlite3.Error as e:
+            logger.warning("Failed to store water level readings: %s", e)
+
+    def _fetch_feed_readings(self):
+        """
+        Fetch the GitHub history feed and return {station: [(key, level), ...]}.
+
+        The request is conditional (ETag / Last-Modified from the last ingest),
+        so an unchanged feed costs a 304 and no parsing at all. A changed feed
+        is parsed as a stream, one station at a time, keeping only the newest
+        N readings per station.
+        """
+        feed_state = self._load_feed_state()
+        stored = {station: [tuple(r) for r in readings]
+                  for station, readings in feed_state.get("readings", {}).items()}
+
+        headers = {}
+        if feed_state.get("etag"):
+            headers["If-None-Match"] = feed_state["etag"]
+        if feed_state.get("last_modified"):
+            headers["If-Modified-Since"] = feed_state["last_modified"]
+
+        try:
+            response = http.get(self.github_url, "github", headers=headers, stream=True)
+            response.raise_for_status()
         except requests.RequestException as e:
             logger.error("Failed to fetch GitHub data: %s", e)
             raise
 
-        arcgis_meta = self.fetch_arcgis_metadata()
+        with response:
+            if response.status_code == 304:
+                logger.info("Irrigation feed unchanged since last ingest — reusing %d stations",
+                            len(stored))
+                return stored
+
+            response.raw.decode_content = True
+            stored_keys = self._stored_keys()
+            readings = {}
+            unstored = {}
+            new_count = 0
+            try:
+                for station, dates in ijson.kvitems(response.raw, "event_data", use_float=True):
+                    kept = stored.get(station, [])
+                    watermark = kept[-1][0] if kept else ""
+                    stored_key = None if stored_keys is None else stored_keys.get(station, "")
+                    readings[station], unstored[station] = self._newest_readings(
+                        dates, kept, stored_key)
+                    new_count += sum(1 for key, _ in readings[station] if key > watermark)
+            except ijson.JSONError as e:
+                logger.error("Failed to parse GitHub data: %s", e)
+                raise
+
+        logger.info("Ingested %d new readings across %d stations", new_count, len(readings))
+        if stored_keys is not None:
+            self._record_readings(unstored)
+
+        save_json(FEED_STATE_FILE, {
+            "etag":             response.headers.get("ETag"),
+            "last_modified":    response.headers.get("Last-Modified"),
+            "history_readings": self.history_readings,
+            "readings":         readings,
+        })
+        return readings
+
+    def fetch_irrigation_data(self):
+        logger.info("Fetching irrigation data from GitHub: %s", self.github_url)
+        feed_readings = self._fetch_feed_readings()
+
+        arcgis_meta = self.get_arcgis_metadata()
 
         results = []
+        latest = []
+        series = []
 
-        for station, dates in github_raw["event_data"].items():
-            readings = []
-            for date_str, times in dates.items():
-                for time_str, level in times.items():
-                    dt = self.parse_datetime(date_str, time_str)
-                    if dt is not None:
-                        readings.append((dt, float(level)))
+        for station, kept in feed_readings.items():
+            readings = [(self.parse_datetime(key[:8], key[8:]), level) for key, level in kept]
 
             if not readings:
                 logger.debug("No valid readings for station: %s, skipping", station)
                 continue
 
-            readings.sort(key=lambda x: x[0])
             latest_dt, latest_level = readings[-1]
+            latest.append((station, latest_dt, latest_level))
+
+            # Recent readings as (hours relative to the newest, level)
+            recent = []
+            for dt, level in readings:
+                hours = (dt - latest_dt).total_seconds() / 3600.0
+                if hours >= -self.rate_window_hours:
+                    recent.append((hours, level))
+            series.append(recent)
+
+        # Rate of rise (m/hr) of every station in one vectorized pass
+        rates = theil_sen_rates(*pad_readings(series, self.history_readings))
 
-            # Rate of rise (m/hr)
-            rate = None
-            if len(readings) >= 2:
-                prev_dt, prev_level = readings[-2]
-                hours = (latest_dt - prev_dt).total_seconds() / 3600.0
-                if hours > 0:
-                    rate = round((latest_level - prev_level) / hours, 3)
+        for (station, latest_dt, latest_level), rate in zip(latest, rates):
+            rate = None if np.isnan(rate) else round(float(rate), 3)
 
             # Merge with ArcGIS metadata
             meta = arcgis_meta.get(station, {})
@@ -1,15 +1,25 @@
 import requests
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import threading
+import time
 import os
 import sys
 import json
 
+import numpy as np
+
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
-
-sys.path.append(parent_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
 
 from config import settings
+from collectors.weather_provider import NUMERIC_FIELDS, PERCENT_FIELDS, WeatherProvider
+from collectors.weather_sampler import WeatherSampler
+from utils import http, quota, weather_cache
 from utils.logger import setup_logger
 
 logger = setup_logger("RainfallCollector")
@@ -17,12 +27,25 @@ logger = setup_logger("RainfallCollector")
 # OpenWeatherMap Current Weather API
 OWM_URL = "https://api.openweathermap.org/data/2.5/weather"
 
+# Defaults when the `weather` section is missing from config.yaml
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_REQUEST_TIMEOUT = 15
+
+# Background refreshes of stale cache entries (utils/weather_cache.py); they
+# finish before the interpreter exits, so one-shot runs still save them
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="weather-refresh")
+
 
-class RainfallCollector:
+class RainfallCollector(WeatherProvider):
     def __init__(self):
+        super().__init__()
         self.api_key = settings.OPENWEATHERMAP_API_KEY
-        self.flood_stations = settings.flood_stations
-        self.landslide_zones = settings.landslide_zones
+        self.max_concurrency = settings.weather_config.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)
+        self.request_timeout = settings.weather_config.get("request_timeout", DEFAULT_REQUEST_TIMEOUT)
+        self.sampler = WeatherSampler()
+        # Cells with a background refresh still running
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
 
     def _fetch_weather(self, lat, lon):
         """Call OWM API for a single lat/lon and return raw JSON."""
@@ -33,7 +56,7 @@ class RainfallCollector:
             "units": "metric",
         }
         try:
-            response = requests.get(OWM_URL, params=params, timeout=15)
+            response = http.get(OWM_URL, "owm", params=params, timeout=self.request_timeout)
             response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
@@ -57,47 +80,161 @@ class RainfallCollector:
             "description":   data.get("weather", [{}])[0].get("description", ""),
         }
 
-    def _collect_stations(self, stations, station_type):
-        """Fetch weather for a dict of stations and return a list of results."""
-        results = []
-        for name, coords in stations.items():
-            lat, lon = coords["lat"], coords["lon"]
-            logger.info("Fetching weather for %s [%s]", name, station_type)
+    def _refresh(self, cells):
+        """Re-fetch stale cached cells in the background, after this cycle's requests."""
+        with self._refreshing_lock:
+            cells = [cell for cell in cells if cell not in self._refreshing]
+            self._refreshing.update(cells)
+        if cells:
+            logger.info("Refreshing %d stale weather cells in the background", len(cells))
+            _refresh_executor.submit(self._refresh_cells, cells)
 
-            raw = self._fetch_weather(lat, lon)
-            if raw is None:
+    def _refresh_cells(self, cells):
+        try:
+            responses = {}
+            for lat, lon in cells:
+                # Lowest priority: never ahead of a cycle's own requests
+                if not quota.acquire({"owm": 1}, priority=-1):
+                    break
+                raw = self._fetch_weather(lat, lon)
+                if raw is not None:
+                    responses[weather_cache.cell_key(lat, lon)] = raw
+            weather_cache.store(responses)
+        except Exception as e:
+            logger.warning("Background weather refresh failed: %s", e)
+        finally:
+            with self._refreshing_lock:
+                self._refreshing.difference_update(cells)
+
+    async def _fetch_weather_async(self, executor, semaphore, names, lat, lon, priority=0):
+        """
+        Run _fetch_weather in a worker thread.
+        The semaphore bounds requests in flight; wait_for enforces a hard
+        per-request deadline (requests' own timeout is per socket operation).
+        The OWM quota (utils/quota.py) is taken first; the deadline starts
+        once it is granted. One token covers one HTTP attempt: "owm" is in
+        http.METERED_ENDPOINTS, so a 429 / 5xx is not retried by the
+        transport and the station falls back to the cache instead.
+        """
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            granted = await loop.run_in_executor(
+                executor, partial(quota.acquire, {"owm": 1}, priority=priority))
+            if not granted:
+                logger.warning("OWM quota exhausted — %s deferred to the next cycle", ", ".join(names))
+                return None
+
+            logger.info("Fetching weather for %s", ", ".join(names))
+            try:
+                return await asyncio.wait_for(
+                    loop.run_in_executor(executor, self._fetch_weather, lat, lon),
+                    timeout=self.request_timeout,
+                )
+            except asyncio.TimeoutError:
+                logger.error("OWM request timed out for %s after %ss",
+                             ", ".join(names), self.request_timeout)
+                return None
+
+    async def _collect_async(self, groups, priorities=None):
+        """
+        Fetch weather for several station groups concurrently.
+        Stations are snapped to grid cells (collectors/weather_sampler.py):
+        each occupied cell is requested once, even if it appears in more than
+        one group or holds several stations, and each station's values are
+        interpolated from its nearest cells. Cells are requested in order of
+        their stations' highest priority, so they get the OWM quota first.
+
+        Responses are cached per cell (utils/weather_cache.py): fresh ones
+        are reused without a request, stale ones are reused and refreshed in
+        the background, and a failed request falls back to a recent one.
+
+        Args:
+            groups: list of (stations_dict, station_type) tuples.
+            priorities: Optional {station: priority}, higher first.
+
+        Returns:
+            dict: station_type -> list of per-station results (config order,
+                  stations with no fetched cell in reach are left out).
+        """
+        jobs = [
+            (name, coords, station_type)
+            for stations, station_type in groups
+            for name, coords in stations.items()
+        ]
+        coords = [c for _, c, _ in jobs]
+        cells = self.sampler.plan(coords)
+
+        logger.info("%d grid cells for %d stations", len(cells), len(jobs))
+
+        priorities = priorities or {}
+        cell_list = list(cells.items())
+        cell_priority = [max(priorities.get(jobs[i][0], 0) for i in members)
+                         for _, members in cell_list]
+        cached = weather_cache.load()
+        now = time.time()
+        entries = [cached.get(weather_cache.cell_key(*cell)) for cell, _ in cell_list]
+        states = [weather_cache.classify(entry, now) for entry in entries]
+        logger.info("Weather cache: %d fresh, %d stale, %d to fetch",
+                    states.count(weather_cache.FRESH), states.count(weather_cache.STALE),
+                    states.count(weather_cache.EXPIRED))
+
+        # Tasks take the semaphore in creation order: highest priority first
+        order = sorted((j for j, state in enumerate(states) if state == weather_cache.EXPIRED),
+                       key=lambda j: -cell_priority[j])
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        try:
+            fetched = await asyncio.gather(*(
+                self._fetch_weather_async(executor, semaphore,
+                                          [jobs[i][0] for i in cell_list[j][1]],
+                                          *cell_list[j][0], priority=cell_priority[j])
+                for j in order
+            ))
+        finally:
+            # Don't wait on threads whose request already missed its deadline
+            executor.shutdown(wait=False, cancel_futures=True)
+        weather_cache.store({weather_cache.cell_key(*cell_list[j][0]): raw
+                             for j, raw in zip(order, fetched) if raw is not None})
+
+        raws = [entry["data"] if entry else None for entry in entries]
+        for j, raw in zip(order, fetched):
+            if raw is None and weather_cache.usable_on_error(entries[j], now):
+                logger.warning("Serving cached weather for %s (%.0f min old)",
+                               ", ".join(jobs[i][0] for i in cell_list[j][1]),
+                               (now - entries[j]["fetched_at"]) / 60)
+            else:
+                raws[j] = raw
+        self._refresh([cell for (cell, _), state in zip(cell_list, states)
+                       if state == weather_cache.STALE])
+
+        fields = [self._extract_fields(raw) if raw is not None else None for raw in raws]
+        values = [[f[name] for name in NUMERIC_FIELDS] if f else [np.nan] * len(NUMERIC_FIELDS)
+                  for f in fields]
+        interpolated, nearest = self.sampler.interpolate(coords, list(cells), values)
+
+        results = {station_type: [] for _, station_type in groups}
+        readings = []
+        for i, (name, station_coords, station_type) in enumerate(jobs):
+            if nearest[i] < 0:
                 continue
-
-            weather = self._extract_fields(raw)
-            weather["station"] = name
-            weather["type"] = station_type
-            weather["lat"] = lat
-            weather["lon"] = lon
-
-            results.append(weather)
-            logger.info("%s -> rain=%.1fmm/h, humidity=%d%%, wind=%.1fm/s",
-                        name, weather["rain_1h_mm"], weather["humidity"],
-                        weather["wind_speed_ms"])
+            # Text fields come from the nearest cell, numbers are interpolated
+            weather = dict(fields[nearest[i]])
+            for field, value in zip(NUMERIC_FIELDS, interpolated[i]):
+                weather[field] = round(value) if field in PERCENT_FIELDS else round(value, 2)
+            # OWM "dt" is the observation time; repeats of it are not stored twice
+            weather["observed_at"] = raws[nearest[i]].get("dt") or now
+            weather = self._build_result(name, station_coords, weather, station_type)
+            results[station_type].append(weather)
+            readings += [(name, field, weather["observed_at"], weather[field])
+                         for field in NUMERIC_FIELDS]
+
+        self._record_readings(readings)
         return results
 
-    def collect_flood_data(self):
-        """Fetch weather for flood stations only."""
-        logger.info("Collecting weather for %d flood stations", len(self.flood_stations))
-        return self._collect_stations(self.flood_stations, "flood")
-
-    def collect_landslide_data(self):
-        """Fetch weather for landslide zones only."""
-        logger.info("Collecting weather for %d landslide zones", len(self.landslide_zones))
-        return self._collect_stations(self.landslide_zones, "landslide")
-
-    def collect_all(self):
-        """Fetch weather for both (convenience method)."""
-        flood_data = self.collect_flood_data()
-        landslide_data = self.collect_landslide_data()
-        logger.info("Done - %d flood + %d landslide = %d total",
-                    len(flood_data), len(landslide_data),
-                    len(flood_data) + len(landslide_data))
-        return {"flood": flood_data, "landslide": landslide_data}
+    def collect(self, groups, priorities=None):
+        """Fetch weather for several station groups (see WeatherProvider.collect)."""
+        return asyncio.run(self._collect_async(groups, priorities))
 
 
 # ── Quick test ──────────────────────────────────────────────────────
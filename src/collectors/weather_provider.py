@@ -0,0 +1,142 @@
+"""
+Weather Provider — the interface the engines get weather through.
+
+A provider turns station groups (flood stations, landslide zones) into
+per-station weather dicts. Two providers exist, picked by weather.provider
+in config.yaml:
+
+- "owm":     RainfallCollector (collectors/weather_api.py), OpenWeatherMap
+             current weather over HTTP.
+- "gridded": GriddedRainfallProvider (collectors/gridded_rainfall.py), a local
+             gridded rainfall file (radar / satellite nowcast), memory-mapped.
+
+Subclasses implement collect(groups) (abstract: a provider without it cannot
+be created); the per-group helpers, result dicts and time-series recording
+are shared.
+"""
+import os
+import sys
+import time
+import sqlite3
+from abc import ABC, abstractmethod
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from config import settings
+from utils.logger import setup_logger
+from utils import timeseries
+
+logger = setup_logger("WeatherProvider")
+
+# Numeric fields every provider returns: interpolated between grid cells and
+# kept in the time-series store (utils/timeseries.py)
+NUMERIC_FIELDS = ["rain_1h_mm", "rain_3h_mm", "humidity", "wind_speed_ms",
+                  "wind_gust_ms", "temp_celsius", "cloud_cover"]
+PERCENT_FIELDS = {"humidity", "cloud_cover"}
+
+DEFAULT_PROVIDER = "owm"
+
+
+class WeatherProvider(ABC):
+    def __init__(self):
+        self.flood_stations = settings.flood_stations
+        self.landslide_zones = settings.landslide_zones
+
+    @abstractmethod
+    def collect(self, groups, priorities=None):
+        """
+        Weather for several station groups in one batch.
+
+        Args:
+            groups: list of (stations_dict, station_type) tuples.
+            priorities: Optional {station: priority}; providers with a request
+                budget fetch higher-priority stations first.
+
+        Returns:
+            dict: station_type -> list of per-station results (config order,
+                  stations without data are left out).
+        """
+
+    def _build_result(self, name, coords, weather, station_type):
+        """
+        Turn extracted weather fields into the per-station result dict.
+        With an "observed_at" time (epoch seconds) the result also carries
+        its "age_seconds", so the engines can tell cached data from new.
+        """
+        weather = dict(weather)
+        if weather.get("observed_at") is not None:
+            weather["age_seconds"] = max(0, round(time.time() - weather["observed_at"]))
+        weather["station"] = name
+        weather["type"] = station_type
+        weather["lat"] = coords["lat"]
+        weather["lon"] = coords["lon"]
+        if "district" in coords:
+            weather["district"] = coords["district"]
+
+        logger.info("%s -> rain=%.1fmm/h, humidity=%d%%, wind=%.1fm/s",
+                    name, weather["rain_1h_mm"], weather["humidity"],
+                    weather["wind_speed_ms"])
+        return weather
+
+    def _record_readings(self, readings):
+        """Append this snapshot's readings to the time-series store."""
+        if not settings.timeseries_config.get("enabled", True):
+            return
+        try:
+            timeseries.append(readings)
+        except sqlite3.Error as e:
+            logger.warning("Failed to store weather readings: %s", e)
+
+    def _collect_stations(self, stations, station_type):
+        """Weather for a dict of stations as a list of results."""
+        return self.collect([(stations, station_type)])[station_type]
+
+    def collect_flood_data(self):
+        """Weather for flood stations only."""
+        logger.info("Collecting weather for %d flood stations", len(self.flood_stations))
+        return self._collect_stations(self.flood_stations, "flood")
+
+    def collect_landslide_data(self):
+        """Weather for landslide zones only."""
+        logger.info("Collecting weather for %d landslide zones", len(self.landslide_zones))
+        return self._collect_stations(self.landslide_zones, "landslide")
+
+    def collect_all(self, priorities=None):
+        """
+        Weather snapshot for both station groups in a single batch. This is
+        the per-cycle snapshot shared by the flood and landslide engines.
+        """
+        logger.info("Collecting weather for %d flood stations + %d landslide zones",
+                    len(self.flood_stations), len(self.landslide_zones))
+        data = self.collect([
+            (self.flood_stations, "flood"),
+            (self.landslide_zones, "landslide"),
+        ], priorities)
+        flood_data, landslide_data = data["flood"], data["landslide"]
+        logger.info("Done - %d flood + %d landslide = %d total",
+                    len(flood_data), len(landslide_data),
+                    len(flood_data) + len(landslide_data))
+        return {"flood": flood_data, "landslide": landslide_data}
+
+
+def create_weather_provider():
+    """The provider selected by weather.provider in config.yaml."""
+    provider = settings.weather_config.get("provider", DEFAULT_PROVIDER)
+    if provider == "gridded":
+        from collectors.gridded_rainfall import GriddedRainfallProvider
+        return GriddedRainfallProvider()
+    if provider != "owm":
+        raise ValueError(f"Unknown weather provider: {provider!r} (expected 'owm' or 'gridded')")
+    from collectors.weather_api import RainfallCollector
+    return RainfallCollector()
+
+
+# ── Quick test ───────────────────────────────────────────────────────
+if __name__ == "__main__":
+    provider = create_weather_provider()
+    print(f"Provider: {type(provider).__name__}")
+    data = provider.collect_all()
+    print(f"Flood stations: {len(data['flood'])}, landslide zones: {len(data['landslide'])}")
@@ -0,0 +1,135 @@
+"""
+Weather Sampler — fetch weather per grid cell, interpolate it per station.
+
+Stations are snapped to a grid of weather.grid_degrees (0.1° is ~11 km, about
+the OpenWeatherMap model resolution), and every occupied cell is fetched
+once at its centre. Each station then gets its values by inverse-distance
+weighting (IDW) of its nearest fetched cells, vectorized over all stations:
+
+    value = Σ w_i · v_i / Σ w_i,   w_i = 1 / d_i ** idw_power
+
+using up to idw_neighbors cells within idw_radius_km (the nearest cell is
+always used). Adding stations inside already-occupied cells costs no extra
+API calls. grid_degrees: 0 samples every distinct point, as before.
+"""
+import os
+import sys
+import math
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from config import settings
+
+EARTH_RADIUS_KM = 6371.0
+
+# Defaults when the `weather` section is missing from config.yaml
+DEFAULT_GRID_DEGREES = 0.1
+DEFAULT_IDW_POWER = 2
+DEFAULT_IDW_NEIGHBORS = 4
+DEFAULT_IDW_RADIUS_KM = 15
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distances (km), broadcasting over array inputs."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def idw_weights(distances, power, neighbors, radius_km):
+    """
+    Normalised IDW weights (stations x cells) from a distance matrix.
+    A station on top of a cell takes that cell's values exactly.
+    """
+    n_cells = distances.shape[1]
+    k = min(neighbors, n_cells)
+    nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    near_d = np.take_along_axis(distances, nearest, axis=1)
+
+    with np.errstate(divide="ignore"):
+        weights = 1.0 / near_d ** power
+    closest = near_d == near_d.min(axis=1, keepdims=True)
+    weights = np.where((near_d > radius_km) & ~closest, 0.0, weights)
+    # Exact hit (distance 0): infinite weight -> that cell alone
+    exact = np.isinf(weights)
+    weights = np.where(exact.any(axis=1, keepdims=True), exact.astype(float), weights)
+
+    full = np.zeros_like(distances)
+    np.put_along_axis(full, nearest, weights, axis=1)
+    return full / full.sum(axis=1, keepdims=True)
+
+
+class WeatherSampler:
+    def __init__(self):
+        config = settings.weather_config
+        self.grid = config.get("grid_degrees", DEFAULT_GRID_DEGREES) or 0
+        self.power = config.get("idw_power", DEFAULT_IDW_POWER)
+        self.neighbors = config.get("idw_neighbors", DEFAULT_IDW_NEIGHBORS)
+        self.radius_km = config.get("idw_radius_km", DEFAULT_IDW_RADIUS_KM)
+
+    def cell(self, coords):
+        """Centre (lat, lon) of the grid cell a station falls in."""
+        if not self.grid:
+            return round(coords["lat"], 4), round(coords["lon"], 4)
+        return (round((math.floor(coords["lat"] / self.grid) + 0.5) * self.grid, 4),
+                round((math.floor(coords["lon"] / self.grid) + 0.5) * self.grid, 4))
+
+    def plan(self, stations):
+        """
+        Cells to fetch for a list of station coords: {(lat, lon): [station indexes]}.
+        """
+        cells = {}
+        for i, coords in enumerate(stations):
+            cells.setdefault(self.cell(coords), []).append(i)
+        return cells
+
+    def interpolate(self, stations, cells, cell_values):
+        """
+        IDW-interpolate cell values to stations.
+
+        Args:
+            stations: Station coords ({"lat", "lon"}), n of them.
+            cells: Fetched cell centres [(lat, lon)], m of them.
+            cell_values: (m x fields) float array, NaN rows for failed cells.
+
+        Returns:
+            (values, nearest): (n x fields) array and the index of each
+            station's nearest good cell, for fields that cannot be averaged.
+            Stations with no good cell within idw_radius_km get NaN / -1.
+        """
+        cell_values = np.asarray(cell_values, dtype=float)
+        n_fields = cell_values.shape[1] if cell_values.ndim == 2 else 0
+        good = ~np.isnan(cell_values).all(axis=1) if len(cells) else np.zeros(0, bool)
+        if not good.any():
+            return np.full((len(stations), n_fields), np.nan), np.full(len(stations), -1)
+
+        lat = np.array([s["lat"] for s in stations], dtype=float)[:, None]
+        lon = np.array([s["lon"] for s in stations], dtype=float)[:, None]
+        good_index = np.flatnonzero(good)
+        centres = np.asarray(cells, dtype=float)[good_index]
+        distances = haversine_km(lat, lon, centres[:, 0][None, :], centres[:, 1][None, :])
+
+        weights = idw_weights(distances, self.power, self.neighbors, self.radius_km)
+        values = weights @ np.nan_to_num(cell_values[good_index])
+        nearest = good_index[np.argmin(distances, axis=1)]
+
+        # No fetched cell within reach: no data for that station
+        out_of_reach = distances.min(axis=1) > self.radius_km
+        values[out_of_reach] = np.nan
+        nearest[out_of_reach] = -1
+        return values, nearest
+
+
+# ── Quick test ───────────────────────────────────────────────────────
+if __name__ == "__main__":
+    sampler = WeatherSampler()
+    stations = list(settings.flood_stations.values()) + list(settings.landslide_zones.values())
+    points = {(round(s["lat"], 4), round(s["lon"], 4)) for s in stations}
+    print(f"{len(stations)} stations, {len(points)} distinct points, "
+          f"{len(sampler.plan(stations))} cells at {sampler.grid}°")
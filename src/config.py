@@ -1,20 +1,21 @@
 import os
+from functools import cached_property
 from dotenv import load_dotenv
-import yaml
 
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-os.chdir(project_root)
+CONFIG_FILE = os.path.join(project_root, "config.yaml")
 
 
-load_dotenv()
+load_dotenv(os.path.join(project_root, ".env"))
 
 class Config:
 
     """
-    Central configuration class. 
+    Central configuration class.
     Loads secrets from .env and constants for the system.
+    config.yaml is only parsed the first time one of its sections is used.
     """
-    
+
     # --- SECRETS (from .env) ---
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     OPENWEATHERMAP_API_KEY = os.getenv("OPENWEATHERMAP_API_KEY")
@@ -27,16 +28,79 @@ class Config:
     ARCGIS_URL = os.getenv("ARCGIS_URL")
 
     # --- YAML CONFIGURATION ---
-    # Load YAML configuration
-    with open("config.yaml", "r") as f:
-        yaml_config = yaml.safe_load(f)
+    # Loaded lazily (and only once) on first access
+    @cached_property
+    def yaml_config(self):
+        import yaml
+
+        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+            return yaml.safe_load(f) or {}
 
     # Extract data from YAML
-    flood_stations = yaml_config.get("flood_stations", {})
-    landslide_zones = yaml_config.get("landslide_zones", {})
-    gemini_config = yaml_config.get('gemini', {})
+    @property
+    def flood_stations(self):
+        return self.yaml_config.get("flood_stations", {})
 
+    @property
+    def landslide_zones(self):
+        return self.yaml_config.get("landslide_zones", {})
 
+    @property
+    def gemini_config(self):
+        return self.yaml_config.get("gemini", {})
 
-settings = Config()
+    @property
+    def weather_config(self):
+        return self.yaml_config.get("weather", {})
+
+    @property
+    def irrigation_config(self):
+        return self.yaml_config.get("irrigation", {})
+
+    @property
+    def scheduler_config(self):
+        return self.yaml_config.get("scheduler", {})
+
+    @property
+    def llm_cache_config(self):
+        return self.yaml_config.get("llm_cache", {})
+
+    @property
+    def telegram_config(self):
+        return self.yaml_config.get("telegram", {})
+
+    @property
+    def alert_state_config(self):
+        return self.yaml_config.get("alert_state", {})
+
+    @property
+    def outbox_config(self):
+        return self.yaml_config.get("outbox", {})
 
+    @property
+    def antecedent_rain_config(self):
+        return self.yaml_config.get("antecedent_rain", {})
+
+    @property
+    def http_config(self):
+        return self.yaml_config.get("http", {})
+
+    @property
+    def timeseries_config(self):
+        return self.yaml_config.get("timeseries", {})
+
+    @property
+    def gridded_rainfall_config(self):
+        return self.yaml_config.get("gridded_rainfall", {})
+
+    @property
+    def quota_config(self):
+        return self.yaml_config.get("quota", {})
+
+    @property
+    def weather_cache_config(self):
+        return self.yaml_config.get("weather_cache", {})
+
+
+
+settings = Config()
@@ -4,122 +4,130 @@ import os
 import sys
 import json
 
+import numpy as np
+
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
 
-sys.path.append(parent_dir)
-
+from config import settings
 from collectors.irrigation_api import IrrigationCollector
-from collectors.weather_api import RainfallCollector
+from collectors.weather_provider import create_weather_provider
+from engine.scoring import age_minutes, score_flood_batch, stabilize
+from engine.trend import hours_to_level
 from utils.logger import setup_logger
 
 logger = setup_logger("FloodEngine")
 
 
+def _hours(value):
+    """Projected hours for the zone dict (None when never reached on this trend)."""
+    return None if np.isnan(value) else round(float(value), 1)
+
+
 class FloodEngine:
-    def __init__(self):
-        self.irrigation_collector = IrrigationCollector()
-        self.rainfall_collector = RainfallCollector()
+    def __init__(self, irrigation_collector=None, rainfall_collector=None):
+        self.irrigation_collector = irrigation_collector or IrrigationCollector()
+        self.rainfall_collector = rainfall_collector or create_weather_provider()
 
-    def custom_logic_for_flood_engine(self):
+    def custom_logic_for_flood_engine(self, irrigation_data=None, rainfall_flood_data=None, previous_levels=None):
         """
         Merge irrigation water-level data with rainfall data to identify flood warning zones.
-        Risk is scored from water level ratio, rate of rise, and current rainfall.
+        Risk is scored from water level ratio (0-40), rate of rise (0-30),
+        current rainfall (0-30) and the projected time to the next threshold
+        (0-20), vectorized across all stations.
+
+        Args:
+            irrigation_data: Pre-fetched irrigation readings. Fetched if None.
+            rainfall_flood_data: Pre-fetched weather for flood stations (e.g. the
+                "flood" part of a shared RainfallCollector.collect_all() snapshot).
+                Fetched if None.
+            previous_levels: Last alerted level per station
+                (utils.alert_state.zone_levels("flood")). Scores near a level
+                edge keep that level — see alert_state in config.yaml.
         """
         warning_zones = []
 
-        # 1. Fetch data from both collectors
-        irrigation_data = self.irrigation_collector.fetch_irrigation_data()
-        rainfall_flood_data = self.rainfall_collector.collect_flood_data()
+        # 1. Fetch whatever was not injected by the caller
+        if irrigation_data is None:
+            irrigation_data = self.irrigation_collector.fetch_irrigation_data()
+        if rainfall_flood_data is None:
+            rainfall_flood_data = self.rainfall_collector.collect_flood_data()
 
         # 2. Index rainfall by station name for fast lookup
         rainfall_map = {r["station"]: r for r in rainfall_flood_data}
 
-        # 3. Evaluate each irrigation station
+        # 3. Skip stations without threshold data
+        stations = []
         for station in irrigation_data:
-            name = station["station"]
-            level = station["level_m"]
-            rate = station["rate_of_rise"]
-            alert_level = station.get("alert_level")
-            minor_level = station.get("minor_level")
-            major_level = station.get("major_level")
-
-            # Skip stations without threshold data
-            if not alert_level or alert_level == 0:
-                logger.debug("Skipping %s - no alert thresholds", name)
+            if not station.get("alert_level"):
+                logger.debug("Skipping %s - no alert thresholds", station["station"])
+                continue
+            stations.append(station)
+
+        # 4. Score all stations in one vectorized pass (see engine/scoring.py)
+        weather = [rainfall_map.get(s["station"], {}) for s in stations]
+        rain_1h = [w.get("rain_1h_mm", 0) for w in weather]
+        rain_3h = [w.get("rain_3h_mm", 0) for w in weather]
+
+        level = [s["level_m"] for s in stations]
+        rate = np.array([s["rate_of_rise"] for s in stations], dtype=float)
+        thresholds = {name: np.array([s.get(f"{name}_level") for s in stations], dtype=float)
+                      for name in ("alert", "minor", "major")}
+        # Hours until each threshold is reached on the current trend
+        eta = {name: hours_to_level(level, rate, target) for name, target in thresholds.items()}
+
+        scores, levels = score_flood_batch(
+            level=level,
+            alert_level=thresholds["alert"],
+            minor_level=thresholds["minor"],
+            major_level=thresholds["major"],
+            rate_of_rise=rate,
+            rain_1h=rain_1h,
+            rain_3h=rain_3h,
+            hours_to_alert=eta["alert"],
+            hours_to_minor=eta["minor"],
+            hours_to_major=eta["major"],
+        )
+
+        # 5. Keep the last alerted level while a score hovers near an edge
+        if previous_levels:
+            levels = stabilize(scores, [s["station"] for s in stations], previous_levels,
+                               settings.alert_state_config)
+
+        # 6. Keep only stations with some risk
+        for i, station in enumerate(stations):
+            risk_level = str(levels[i])
+            if risk_level == "NORMAL":
                 continue
 
-            # --- Risk Score Calculation (0 - 100) ---
-            risk_score = 0
-
-            # Factor 1: Water level ratio vs alert level (0 - 40 points)
-            level_ratio = level / alert_level if alert_level else 0
-            if major_level and level >= major_level:
-                risk_score += 40
-            elif minor_level and level >= minor_level:
-                risk_score += 30
-            elif level >= alert_level:
-                risk_score += 20
-            elif level_ratio >= 0.8:
-                risk_score += 10
-
-            # Factor 2: Rate of rise (0 - 30 points)
-            if rate is not None:
-                if rate >= 0.5:
-                    risk_score += 30     # Rapid rise
-                elif rate >= 0.2:
-                    risk_score += 20     # Moderate rise
-                elif rate >= 0.1:
-                    risk_score += 10     # Slow rise
-                elif rate < 0:
-                    risk_score -= 5      # Water is receding
-
-            # Factor 3: Current rainfall (0 - 30 points)
-            weather = rainfall_map.get(name, {})
-            rain_1h = weather.get("rain_1h_mm", 0)
-            rain_3h = weather.get("rain_3h_mm", 0)
-
-            if rain_1h >= 50:
-                risk_score += 30         # Extreme rainfall
-            elif rain_1h >= 20:
-                risk_score += 20         # Heavy rainfall
-            elif rain_1h >= 7:
-                risk_score += 10         # Moderate rainfall
-            elif rain_3h >= 15:
-                risk_score += 10         # Sustained rain over 3h
-
-            # Clamp score to 0-100
-            risk_score = max(0, min(100, risk_score))
-
-            # --- Classify risk level ---
-            if risk_score >= 70:
-                risk_level = "CRITICAL"
-            elif risk_score >= 45:
-                risk_level = "WARNING"
-            elif risk_score >= 20:
-                risk_level = "WATCH"
-            else:
-                risk_level = "NORMAL"
-
-            # Only append if there is some risk
-            if risk_level != "NORMAL":
-                zone = {
-                    "station":      name,
-                    "river_basin":  station["river_basin"],
-                    "level_m":      level,
-                    "alert_level":  alert_level,
-                    "minor_level":  minor_level,
-                    "major_level":  major_level,
-                    "rate_of_rise": rate,
-                    "rain_1h_mm":   rain_1h,
-                    "rain_3h_mm":   rain_3h,
-                    "risk_score":   risk_score,
-                    "risk_level":   risk_level,
-                    "measured_at":  station["measured_at"],
-                }
-                warning_zones.append(zone)
-                logger.warning("FLOOD %s: %s - score=%d, level=%.2fm, rate=%s, rain_1h=%.1fmm",
-                               risk_level, name, risk_score, level, rate, rain_1h)
+            name = station["station"]
+            risk_score = int(scores[i])
+            zone = {
+                "station":      name,
+                "river_basin":  station["river_basin"],
+                "level_m":      station["level_m"],
+                "alert_level":  station["alert_level"],
+                "minor_level":  station.get("minor_level"),
+                "major_level":  station.get("major_level"),
+                "rate_of_rise": station["rate_of_rise"],
+                "hours_to_alert": _hours(eta["alert"][i]),
+                "hours_to_minor": _hours(eta["minor"][i]),
+                "hours_to_major": _hours(eta["major"][i]),
+                "rain_1h_mm":   rain_1h[i],
+                "rain_3h_mm":   rain_3h[i],
+                "risk_score":   risk_score,
+                "risk_level":   risk_level,
+                "measured_at":  station["measured_at"],
+                # How old the rainfall behind this score is (cached / stale data)
+                "weather_observed_at": weather[i].get("observed_at"),
+                "weather_age_minutes": age_minutes(weather[i]),
+            }
+            warning_zones.append(zone)
+            logger.warning("FLOOD %s: %s - score=%d, level=%.2fm, rate=%s, rain_1h=%.1fmm",
+                           risk_level, name, risk_score, zone["level_m"],
+                           zone["rate_of_rise"], zone["rain_1h_mm"])
 
         # Sort by risk score descending (most dangerous first)
         warning_zones.sort(key=lambda x: x["risk_score"], reverse=True)
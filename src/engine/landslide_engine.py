@@ -1,118 +1,130 @@
 import os
 import sys
 
+import numpy as np
+
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
 
-sys.path.append(parent_dir)
-
-from collectors.weather_api import RainfallCollector
+from config import settings
+from collectors.weather_provider import create_weather_provider
+from engine.scoring import age_minutes, score_landslide_batch, stabilize
 from utils.logger import setup_logger
+from utils.rain_accumulator import RainAccumulator
 
 logger = setup_logger("LandslideEngine")
 
 
+def _total(value):
+    """Antecedent total for the zone dict (None when unknown)."""
+    return None if np.isnan(value) else round(float(value), 1)
+
+
 class LandslideEngine:
-    def __init__(self):
-        self.rainfall_collector = RainfallCollector()
+    def __init__(self, rainfall_collector=None, rain_accumulator=None):
+        self.rainfall_collector = rainfall_collector or create_weather_provider()
+        # Opened on first use (data/rain_accumulators.npy)
+        self.rain_accumulator = rain_accumulator
 
-    def custom_logic_for_landslide(self):
+    def antecedent_rainfall(self, landslide_data):
+        """
+        Record this cycle's rain_1h per zone and return the 6h / 24h / 72h
+        totals (zones x 3 array), or None if the accumulator is disabled or
+        unavailable.
+        """
+        if not settings.antecedent_rain_config.get("enabled", True):
+            return None
+        try:
+            if self.rain_accumulator is None:
+                self.rain_accumulator = RainAccumulator()
+            return self.rain_accumulator.update(
+                [z["station"] for z in landslide_data],
+                [z.get("rain_1h_mm", 0) for z in landslide_data],
+                [z.get("observed_at") for z in landslide_data],
+            )
+        except (OSError, ValueError) as e:
+            logger.warning("Antecedent rainfall unavailable (%s) — scoring without it", e)
+            return None
+
+    def custom_logic_for_landslide(self, landslide_data=None, previous_levels=None):
         """
         Analyse weather data for landslide-prone zones and identify warning areas.
-        Risk is scored from rainfall intensity, humidity (soil saturation), and wind.
+        Risk is scored from rainfall intensity (0-50), humidity / soil saturation
+        (0-25), wind (0-15), cloud cover (0-10) and antecedent 6h / 24h / 72h
+        rainfall (0-20), vectorized across all zones.
+
+        Args:
+            landslide_data: Pre-fetched weather for landslide zones (e.g. the
+                "landslide" part of a shared RainfallCollector.collect_all()
+                snapshot). Fetched if None.
+            previous_levels: Last alerted level per zone
+                (utils.alert_state.zone_levels("landslide")). Scores near a level
+                edge keep that level — see alert_state in config.yaml.
         """
         warning_zones = []
 
-        # 1. Fetch weather for all landslide zones
-        landslide_data = self.rainfall_collector.collect_landslide_data()
+        # 1. Fetch weather for all landslide zones unless injected
+        if landslide_data is None:
+            landslide_data = self.rainfall_collector.collect_landslide_data()
+
+        # 2. Rain of the previous hours / days (rolling accumulators)
+        antecedent = self.antecedent_rainfall(landslide_data)
+        if antecedent is None:
+            antecedent = np.full((len(landslide_data), 3), np.nan)
+
+        # 3. Score all zones in one vectorized pass (see engine/scoring.py)
+        scores, levels = score_landslide_batch(
+            rain_1h=[z.get("rain_1h_mm", 0) for z in landslide_data],
+            rain_3h=[z.get("rain_3h_mm", 0) for z in landslide_data],
+            humidity=[z.get("humidity", 0) for z in landslide_data],
+            wind_speed=[z.get("wind_speed_ms", 0) for z in landslide_data],
+            wind_gust=[z.get("wind_gust_ms", 0) for z in landslide_data],
+            cloud_cover=[z.get("cloud_cover", 0) for z in landslide_data],
+            rain_6h=antecedent[:, 0],
+            rain_24h=antecedent[:, 1],
+            rain_72h=antecedent[:, 2],
+        )
+
+        # 4. Keep the last alerted level while a score hovers near an edge
+        if previous_levels:
+            levels = stabilize(scores, [z["station"] for z in landslide_data], previous_levels,
+                               settings.alert_state_config)
+
+        # 5. Keep only zones with some risk
+        for i, zone in enumerate(landslide_data):
+            risk_level = str(levels[i])
+            if risk_level == "NORMAL":
+                continue
 
-        # 2. Evaluate each zone
-        for zone in landslide_data:
             name = zone["station"]
-            rain_1h = zone.get("rain_1h_mm", 0)
-            rain_3h = zone.get("rain_3h_mm", 0)
-            humidity = zone.get("humidity", 0)
+            risk_score = int(scores[i])
             wind_speed = zone.get("wind_speed_ms", 0)
             wind_gust = zone.get("wind_gust_ms", 0)
-            cloud_cover = zone.get("cloud_cover", 0)
-
-            # --- Risk Score Calculation (0 - 100) ---
-            risk_score = 0
-
-            # Factor 1: Rainfall intensity (0 - 40 points)
-            # Rainfall is the NUMBER ONE trigger for landslides
-            if rain_1h >= 50:
-                risk_score += 40         # Extreme - very high landslide risk
-            elif rain_1h >= 30:
-                risk_score += 30         # Heavy
-            elif rain_1h >= 15:
-                risk_score += 20         # Moderate-heavy
-            elif rain_1h >= 5:
-                risk_score += 10         # Light-moderate
-
-            # Bonus for sustained rain over 3h (saturates soil)
-            if rain_3h >= 40:
-                risk_score += 10
-            elif rain_3h >= 20:
-                risk_score += 5
-
-            # Factor 2: Humidity / soil saturation (0 - 25 points)
-            # High humidity = soil already holds moisture = easier to slide
-            if humidity >= 95:
-                risk_score += 25
-            elif humidity >= 85:
-                risk_score += 15
-            elif humidity >= 75:
-                risk_score += 10
-            elif humidity >= 60:
-                risk_score += 5
-
-            # Factor 3: Wind (0 - 15 points)
-            # Strong wind destabilizes slopes, uproots trees on hillsides
-            gust = max(wind_speed, wind_gust)
-            if gust >= 20:
-                risk_score += 15         # Storm-force
-            elif gust >= 12:
-                risk_score += 10         # Strong wind
-            elif gust >= 7:
-                risk_score += 5          # Moderate wind
-
-            # Factor 4: Cloud cover as storm indicator (0 - 10 points)
-            if cloud_cover >= 90 and rain_1h >= 5:
-                risk_score += 10         # Overcast + raining = sustained threat
-            elif cloud_cover >= 80:
-                risk_score += 5
-
-            # Clamp score to 0-100
-            risk_score = max(0, min(100, risk_score))
-
-            # --- Classify risk level ---
-            if risk_score >= 70:
-                risk_level = "CRITICAL"
-            elif risk_score >= 45:
-                risk_level = "WARNING"
-            elif risk_score >= 20:
-                risk_level = "WATCH"
-            else:
-                risk_level = "NORMAL"
-
-            # Only append if there is some risk
-            if risk_level != "NORMAL":
-                warning_zones.append({
-                    "station":       name,
-                    "rain_1h_mm":    rain_1h,
-                    "rain_3h_mm":    rain_3h,
-                    "humidity":      humidity,
-                    "wind_speed_ms": wind_speed,
-                    "wind_gust_ms":  wind_gust,
-                    "cloud_cover":   cloud_cover,
-                    "risk_score":    risk_score,
-                    "risk_level":    risk_level,
-                    "lat":           zone["lat"],
-                    "lon":           zone["lon"],
-                })
-                logger.warning("LANDSLIDE %s: %s - score=%d, rain=%.1fmm/h, humidity=%d%%, wind=%.1fm/s",
-                               risk_level, name, risk_score, rain_1h, humidity, gust)
+            warning_zones.append({
+                "station":       name,
+                "rain_1h_mm":    zone.get("rain_1h_mm", 0),
+                "rain_3h_mm":    zone.get("rain_3h_mm", 0),
+                "humidity":      zone.get("humidity", 0),
+                "wind_speed_ms": wind_speed,
+                "wind_gust_ms":  wind_gust,
+                "cloud_cover":   zone.get("cloud_cover", 0),
+                "rain_6h_mm":    _total(antecedent[i, 0]),
+                "rain_24h_mm":   _total(antecedent[i, 1]),
+                "rain_72h_mm":   _total(antecedent[i, 2]),
+                "risk_score":    risk_score,
+                "risk_level":    risk_level,
+                "lat":           zone["lat"],
+                "lon":           zone["lon"],
+                "district":      zone.get("district"),
+                # How old the weather behind this score is (cached / stale data)
+                "weather_observed_at": zone.get("observed_at"),
+                "weather_age_minutes": age_minutes(zone),
+            })
+            logger.warning("LANDSLIDE %s: %s - score=%d, rain=%.1fmm/h, humidity=%d%%, wind=%.1fm/s",
+                           risk_level, name, risk_score, zone.get("rain_1h_mm", 0),
+                           zone.get("humidity", 0), max(wind_speed, wind_gust))
 
         # Sort by risk score descending (most dangerous first)
         warning_zones.sort(key=lambda x: x["risk_score"], reverse=True)
@@ -0,0 +1,272 @@
+"""
+Vectorized risk scoring for the flood and landslide engines.
+
+Every scoring factor is a bin lookup: np.digitize maps a column of readings
+to a bin index and the index picks the points from a small table. Scoring
+a batch of stations is a fixed number of array operations, so the cost per
+station is independent of Python interpreter overhead.
+
+All inputs are array-likes (lists, tuples or NumPy arrays) of equal length.
+Missing values (None / NaN) score like the engines always treated them:
+no rate of rise and no threshold mean no points, missing weather means 0.
+"""
+import time
+
+import numpy as np
+
+# --- Classification (score >= bin edge) ──────────────────────────────
+RISK_LEVELS = np.array(["NORMAL", "WATCH", "WARNING", "CRITICAL"])
+RISK_LEVEL_BINS = [20, 45, 70]
+RISK_LEVEL_INDEX = {level: i for i, level in enumerate(RISK_LEVELS)}
+
+# --- Hysteresis (alert_state in config.yaml) ─────────────────────────
+DEFAULT_HYSTERESIS_POINTS = 5
+DEFAULT_MIN_DWELL_MINUTES = 60
+
+# --- Flood factors ───────────────────────────────────────────────────
+# Factor 1: water level vs thresholds (0 - 40 points)
+FLOOD_NEAR_ALERT_RATIO = 0.8
+
+# Factor 2: rate of rise in m/hr (0 - 30 points, -5 if receding)
+FLOOD_RATE_BINS = [0, 0.1, 0.2, 0.5]
+FLOOD_RATE_POINTS = np.array([-5, 0, 10, 20, 30])
+
+# Factor 3: current rainfall in mm/hr (0 - 30 points)
+FLOOD_RAIN_1H_BINS = [7, 20, 50]
+FLOOD_RAIN_1H_POINTS = np.array([0, 10, 20, 30])
+FLOOD_RAIN_3H_MIN = 15           # Sustained rain over 3h, only if 1h rain is light
+FLOOD_RAIN_3H_POINTS = 10
+
+# Factor 4: projected threshold crossing within the horizon (0 - 20 points)
+FLOOD_PROJECTION_HORIZON_HOURS = 3
+FLOOD_PROJECTION_POINTS = {"alert": 10, "minor": 15, "major": 20}
+
+# --- Landslide factors ───────────────────────────────────────────────
+# Factor 1: rainfall intensity (0 - 40 points) + sustained 3h bonus (0 - 10)
+LANDSLIDE_RAIN_1H_BINS = [5, 15, 30, 50]
+LANDSLIDE_RAIN_1H_POINTS = np.array([0, 10, 20, 30, 40])
+LANDSLIDE_RAIN_3H_BINS = [20, 40]
+LANDSLIDE_RAIN_3H_POINTS = np.array([0, 5, 10])
+
+# Factor 2: humidity / soil saturation (0 - 25 points)
+LANDSLIDE_HUMIDITY_BINS = [60, 75, 85, 95]
+LANDSLIDE_HUMIDITY_POINTS = np.array([0, 5, 10, 15, 25])
+
+# Factor 3: wind, max of speed and gust (0 - 15 points)
+LANDSLIDE_WIND_BINS = [7, 12, 20]
+LANDSLIDE_WIND_POINTS = np.array([0, 5, 10, 15])
+
+# Factor 4: cloud cover as storm indicator (0 - 10 points)
+LANDSLIDE_OVERCAST_MIN = 90      # + raining (rain_1h >= 5) -> 10 points
+LANDSLIDE_CLOUDY_MIN = 80        # -> 5 points
+
+# Factor 5: antecedent rainfall, best of the 6h / 24h / 72h totals (0 - 20 points).
+# 24h edges follow the NBRO landslide early-warning levels (75 / 100 / 150 mm).
+LANDSLIDE_RAIN_6H_BINS = [40, 75]
+LANDSLIDE_RAIN_6H_POINTS = np.array([0, 10, 15])
+LANDSLIDE_RAIN_24H_BINS = [75, 100, 150]
+LANDSLIDE_RAIN_24H_POINTS = np.array([0, 10, 15, 20])
+LANDSLIDE_RAIN_72H_BINS = [150, 200, 300]
+LANDSLIDE_RAIN_72H_POINTS = np.array([0, 10, 15, 20])
+
+
+def _column(values, fill=None):
+    """Convert a column to a float array (None -> NaN), optionally filling NaNs."""
+    column = np.asarray(values, dtype=float)
+    if fill is not None:
+        column = np.where(np.isnan(column), fill, column)
+    return column
+
+
+def _lookup(values, bins, points):
+    """Points for each value: bins are lower edges, value >= edge moves up a bin."""
+    return points[np.digitize(values, bins)]
+
+
+def classify(scores):
+    """Map risk scores (0 - 100) to NORMAL / WATCH / WARNING / CRITICAL."""
+    return RISK_LEVELS[np.digitize(scores, RISK_LEVEL_BINS)]
+
+
+def stabilize_levels(scores, previous_levels, held_seconds, hysteresis_points, min_dwell_seconds):
+    """
+    Damp level flapping around the 20 / 45 / 70 edges, given each zone's
+    last alerted level.
+
+    - Escalations always apply immediately.
+    - A zone only drops below its previous level once its score is
+      hysteresis_points under that level's lower edge (exit band), and only
+      after it has held the previous level for min_dwell_seconds.
+
+    Args:
+        previous_levels: Last alerted level per zone (None if not alerted).
+        held_seconds: Seconds each zone has been at that level (None if unknown).
+
+    Returns:
+        str array of risk levels, in input order.
+    """
+    scores = _column(scores)
+    current = np.digitize(scores, RISK_LEVEL_BINS)
+    previous = np.array([RISK_LEVEL_INDEX[level or "NORMAL"] for level in previous_levels], dtype=int)
+    held = _column(held_seconds, fill=0)
+
+    # Highest level a falling score may keep: the one it would reach with the band
+    exit_level = np.minimum(previous, np.digitize(scores + hysteresis_points, RISK_LEVEL_BINS))
+    dwell_done = held >= min_dwell_seconds
+
+    stable = np.where(
+        current >= previous,
+        current,
+        np.where(dwell_done, exit_level, previous),
+    )
+    return RISK_LEVELS[stable]
+
+
+def held_levels(stations, previous_levels, now):
+    """
+    Previous levels and seconds held, in station order, for stabilize_levels().
+
+    Args:
+        stations: Station names.
+        previous_levels: station -> {"risk_level", "since"} (utils.alert_state.zone_levels).
+        now: Current epoch time.
+    """
+    previous = [previous_levels.get(name) or {} for name in stations]
+    return ([p.get("risk_level") for p in previous],
+            [now - p["since"] if "since" in p else None for p in previous])
+
+
+def stabilize(scores, stations, previous_levels, config):
+    """
+    stabilize_levels() for a batch of stations, with the hysteresis band and
+    minimum dwell from the alert_state section of config.yaml.
+    """
+    previous, held = held_levels(stations, previous_levels, time.time())
+    return stabilize_levels(
+        scores, previous, held,
+        hysteresis_points=config.get("hysteresis_points", DEFAULT_HYSTERESIS_POINTS),
+        min_dwell_seconds=config.get("min_dwell_minutes", DEFAULT_MIN_DWELL_MINUTES) * 60,
+    )
+
+
+def age_minutes(weather):
+    """Age of a station's weather in minutes (None when unknown)."""
+    age = weather.get("age_seconds")
+    return None if age is None else round(age / 60)
+
+
+def score_flood_batch(level, alert_level, minor_level, major_level,
+                      rate_of_rise, rain_1h, rain_3h,
+                      hours_to_alert=None, hours_to_minor=None, hours_to_major=None):
+    """
+    Score a batch of flood stations.
+
+    Stations with no alert threshold (missing or 0) cannot be scored and
+    get 0 / NORMAL — the engine skips them before calling this.
+
+    hours_to_alert / minor / major are projected crossing times
+    (engine/trend.py); a threshold not yet reached but projected within
+    FLOOD_PROJECTION_HORIZON_HOURS adds points. Without them it scores 0.
+
+    Returns:
+        (scores, levels): int array of risk scores (0 - 100) and str array
+        of risk levels, in input order.
+    """
+    level = _column(level)
+    alert = _column(alert_level)
+    minor = _column(minor_level)
+    major = _column(major_level)
+    rate = _column(rate_of_rise)
+    rain_1h = _column(rain_1h, fill=0)
+    rain_3h = _column(rain_3h, fill=0)
+
+    scorable = ~np.isnan(alert) & (alert != 0)
+    safe_alert = np.where(scorable, alert, 1)
+
+    # Factor 1: Water level ratio vs alert level (0 - 40 points).
+    # NaN thresholds never compare >=, so missing ones simply don't trigger.
+    with np.errstate(invalid="ignore"):
+        level_points = np.select(
+            [
+                (major != 0) & (level >= major),
+                (minor != 0) & (level >= minor),
+                level >= alert,
+                level / safe_alert >= FLOOD_NEAR_ALERT_RATIO,
+            ],
+            [40, 30, 20, 10],
+            default=0,
+        )
+
+    # Factor 2: Rate of rise (0 - 30 points, -5 if receding, 0 if unknown)
+    rate_points = np.where(
+        np.isnan(rate), 0, _lookup(np.nan_to_num(rate), FLOOD_RATE_BINS, FLOOD_RATE_POINTS))
+
+    # Factor 3: Current rainfall (0 - 30 points)
+    rain_points = _lookup(rain_1h, FLOOD_RAIN_1H_BINS, FLOOD_RAIN_1H_POINTS)
+    sustained = (rain_1h < FLOOD_RAIN_1H_BINS[0]) & (rain_3h >= FLOOD_RAIN_3H_MIN)
+    rain_points = np.where(sustained, FLOOD_RAIN_3H_POINTS, rain_points)
+
+    # Factor 4: Projected threshold crossing (0 - 20 points)
+    projection_points = np.zeros(len(level), dtype=int)
+    for hours, points in [(hours_to_alert, FLOOD_PROJECTION_POINTS["alert"]),
+                          (hours_to_minor, FLOOD_PROJECTION_POINTS["minor"]),
+                          (hours_to_major, FLOOD_PROJECTION_POINTS["major"])]:
+        if hours is None:
+            continue
+        hours = _column(hours)
+        with np.errstate(invalid="ignore"):
+            soon = (hours > 0) & (hours <= FLOOD_PROJECTION_HORIZON_HOURS)
+        projection_points = np.where(soon, np.maximum(projection_points, points), projection_points)
+
+    scores = np.clip(level_points + rate_points + rain_points + projection_points, 0, 100)
+    scores = np.where(scorable, scores, 0).astype(int)
+    return scores, classify(scores)
+
+
+def score_landslide_batch(rain_1h, rain_3h, humidity, wind_speed, wind_gust, cloud_cover,
+                          rain_6h=None, rain_24h=None, rain_72h=None):
+    """
+    Score a batch of landslide zones.
+
+    rain_6h / rain_24h / rain_72h are antecedent rainfall totals
+    (utils/rain_accumulator.py); without them that factor scores 0.
+
+    Returns:
+        (scores, levels): int array of risk scores (0 - 100) and str array
+        of risk levels, in input order.
+    """
+    rain_1h = _column(rain_1h, fill=0)
+    rain_3h = _column(rain_3h, fill=0)
+    humidity = _column(humidity, fill=0)
+    gust = np.maximum(_column(wind_speed, fill=0), _column(wind_gust, fill=0))
+    cloud_cover = _column(cloud_cover, fill=0)
+
+    scores = (
+        _lookup(rain_1h, LANDSLIDE_RAIN_1H_BINS, LANDSLIDE_RAIN_1H_POINTS)
+        + _lookup(rain_3h, LANDSLIDE_RAIN_3H_BINS, LANDSLIDE_RAIN_3H_POINTS)
+        + _lookup(humidity, LANDSLIDE_HUMIDITY_BINS, LANDSLIDE_HUMIDITY_POINTS)
+        + _lookup(gust, LANDSLIDE_WIND_BINS, LANDSLIDE_WIND_POINTS)
+        + np.select(
+            [
+                (cloud_cover >= LANDSLIDE_OVERCAST_MIN) & (rain_1h >= LANDSLIDE_RAIN_1H_BINS[0]),
+                cloud_cover >= LANDSLIDE_CLOUDY_MIN,
+            ],
+            [10, 5],
+            default=0,
+        )
+    )
+
+    # Factor 5: antecedent rainfall (0 - 20 points)
+    n = len(rain_1h)
+    antecedent = [
+        _lookup(_column(totals if totals is not None else np.zeros(n), fill=0), bins, points)
+        for totals, bins, points in [
+            (rain_6h, LANDSLIDE_RAIN_6H_BINS, LANDSLIDE_RAIN_6H_POINTS),
+            (rain_24h, LANDSLIDE_RAIN_24H_BINS, LANDSLIDE_RAIN_24H_POINTS),
+            (rain_72h, LANDSLIDE_RAIN_72H_BINS, LANDSLIDE_RAIN_72H_POINTS),
+        ]
+    ]
+    scores = scores + np.maximum.reduce(antecedent)
+
+    scores = np.clip(scores, 0, 100).astype(int)
+    return scores, classify(scores)
@@ -1,41 +1,176 @@
 import sys
 import os
+import signal
+import argparse
 from datetime import datetime, timezone, timedelta
 
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Run as a script (python src/main.py), so src/ is not on sys.path yet. The
+# modules with a quick-test block add it the same way; the rest are only imported.
+src_dir = os.path.dirname(os.path.abspath(__file__))
+if src_dir not in sys.path:
+    sys.path.insert(0, src_dir)
 
 from agents.monitor_agent import MonitorAgent
-from notifiers.telegram_bot import send_alert
+from notifiers.dispatcher import get_dispatcher
+from notifiers.telegram_bot import send_alert_streaming
+from config import settings
+from utils import http
+from utils.alert_state import save_state
+from utils.outbox import drain
 from utils.logger import setup_logger
 
 logger = setup_logger("Main")
 
-# Create the agent
-agent = MonitorAgent()
+SL_TZ = timezone(timedelta(hours=5, minutes=30))
+
+# Created on first use, then kept warm for later cycles
+_agent = None
+
+
+def get_agent():
+    """Return the shared MonitorAgent, creating it on first use."""
+    global _agent
+    if _agent is None:
+        _agent = MonitorAgent()
+    return _agent
+
+
+def _header(label=None):
+    timestamp = datetime.now(SL_TZ).strftime("🕐 %Y-%m-%d %H:%M:%S")
+    return f"{timestamp} — {label}" if label else timestamp
+
+
+def deliver_outbox():
+    """
+    Send every queued alert (utils/outbox.py) to the main chat and the chats
+    routed to its districts / basins. An alert's state is saved once it is delivered.
+    """
+    delivered = drain(get_dispatcher().send, on_delivered=save_state)
+    if delivered:
+        logger.info("Delivered %d queued message(s)", delivered)
+
+
+def _send_with_timestamp(agent, text, label=None):
+    """Print a message prefixed with the Sri Lanka time, queue it and deliver it."""
+    sys.stdout.reconfigure(encoding="utf-8")
+    message = f"{_header(label)}\n\n{text}"
+    print("\n" + "=" * 60)
+    print(message)
+    print("=" * 60 + "\n")
+    agent.queue_alert(message, label)
+    deliver_outbox()
+
+
+def _stream_with_timestamp(agent, chunks):
+    """
+    Post a streamed alert to the main chat as it is generated, then print it.
+    The finished text is queued so routed district / basin chats get it, and
+    the main chat too if nothing could be posted there. Once part of it is
+    posted, the main chat is only ever completed by editing that message,
+    never sent a second copy.
+    """
+    sys.stdout.reconfigure(encoding="utf-8")
+    header = _header()
+    parts = []
+
+    def _tee():
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+
+    message_ids = []
+    ok = send_alert_streaming(_tee(), prefix=f"{header}\n\n", message_ids=message_ids)
+    message = f"{header}\n\n{''.join(parts)}"
+    print("\n" + "=" * 60)
+    print(message)
+    print("=" * 60 + "\n")
+    posted = ok or bool(message_ids)
+    agent.queue_alert(message, delivered_chats=[settings.TELEGRAM_CHAT_ID] if posted else ())
+    deliver_outbox()
+    return ok
 
 
 def run_cycle():
     """Run one full monitoring cycle: collect → analyse → generate alert → send."""
     logger.info("Starting monitoring cycle...")
     try:
+        # Retry anything a previous cycle could not deliver
+        deliver_outbox()
+
+        agent = get_agent()
+        if settings.gemini_config.get("streaming", False):
+            chunks = agent.stream_report()
+            if chunks is None:
+                logger.info("No change detected — alert suppressed this cycle")
+            elif not _stream_with_timestamp(agent, chunks):
+                logger.error("Streaming to the main chat did not complete — alert queued in the outbox")
+            return
+
         alert = agent.generate_report()
         if alert:
             logger.info("Alert generated successfully (%d characters)", len(alert))
-            sys.stdout.reconfigure(encoding="utf-8")
-            SL_TZ = timezone(timedelta(hours=5, minutes=30))
-            timestamp = datetime.now(SL_TZ).strftime("🕐 %Y-%m-%d %H:%M:%S")
-            alert_with_time = f"{timestamp}\n\n{alert}"
-            print("\n" + "=" * 60)
-            print(alert_with_time)
-            print("=" * 60 + "\n")
-            send_alert(alert_with_time)
+            _send_with_timestamp(agent, alert)
+
+            # Template alerts are followed by the richer Gemini text, English-first
+            # alerts by the Sinhala block, when it is ready
+            update_timeout = settings.gemini_config.get("update_timeout_seconds", 120)
+            update, label = agent.wait_for_update(timeout=update_timeout)
+            if update:
+                logger.info("Sending alert follow-up '%s' (%d characters)", label, len(update))
+                _send_with_timestamp(agent, update, label=label)
         else:
             logger.info("No change detected — alert suppressed this cycle")
     except Exception as e:
         logger.error("Monitoring cycle failed: %s", e)
+    finally:
+        http.log_stats()
+
+
+def run_daemon():
+    """
+    Run run_cycle on a fixed schedule in one long-lived process.
+    The agent, its collectors, caches and the LLM client stay warm between
+    cycles. A cycle that is still running when the next one is due causes
+    that run to be skipped, never overlapped.
+    """
+    from apscheduler.schedulers.blocking import BlockingScheduler
+
+    interval = settings.scheduler_config.get("interval_minutes", 5)
+    grace = settings.scheduler_config.get("misfire_grace_seconds", 60)
+
+    scheduler = BlockingScheduler()
+    scheduler.add_job(
+        run_cycle,
+        trigger="interval",
+        minutes=interval,
+        id="monitoring_cycle",
+        max_instances=1,                 # Skip a run while the previous one is going
+        coalesce=True,                   # Collapse missed runs into one
+        misfire_grace_time=grace,
+        next_run_time=datetime.now(SL_TZ),
+    )
+
+    def _shutdown(signum, frame):
+        logger.info("Received signal %d — finishing current cycle and shutting down", signum)
+        scheduler.shutdown(wait=True)
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+
+    logger.info("Disaster Alert System — daemon mode, cycle every %d minutes", interval)
+    scheduler.start()
+    logger.info("Scheduler stopped — exiting")
 
 
 if __name__ == "__main__":
-    logger.info("Disaster Alert System — running single cycle")
-    run_cycle()
-    logger.info("Cycle complete — exiting")
+    parser = argparse.ArgumentParser(description="Sri Lanka disaster alert monitor")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Keep running and repeat the cycle on the configured schedule")
+    args = parser.parse_args()
+
+    if args.daemon:
+        run_daemon()
+    else:
+        logger.info("Disaster Alert System — running single cycle")
+        run_cycle()
+        logger.info("Cycle complete — exiting")
@@ -0,0 +1,222 @@
+"""
+Telegram Dispatcher — fans an alert out to many chats at once.
+
+Recipients: the main TELEGRAM_CHAT_ID always gets every alert. Chats listed
+under telegram.routes in config.yaml also get it when one of their
+districts (landslide zones) or river basins (flood stations) is affected.
+
+Throughput: chats are sent to concurrently over the shared HTTP pool (utils/http.py).
+Token buckets keep the bot within Telegram's limits, globally
+(telegram.messages_per_second) and per chat
+(telegram.chat_messages_per_second). A 429 response pauses that chat
+for its retry_after before the message is retried.
+"""
+import os
+import sys
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from config import settings
+from notifiers.telegram_bot import TELEGRAM_API_URL, _split_message
+from utils import http
+from utils.logger import setup_logger
+
+logger = setup_logger("TelegramDispatcher")
+
+# Telegram Bot API limits (https://core.telegram.org/bots/faq)
+DEFAULT_MESSAGES_PER_SECOND = 30
+DEFAULT_CHAT_MESSAGES_PER_SECOND = 1
+DEFAULT_MAX_CONCURRENCY = 32
+DEFAULT_MAX_RETRIES = 3
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def pause(self, seconds):
+        """Hand out no tokens for the next `seconds` (Telegram retry_after)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    def restart(self):
+        """Refill from now on: the last token's request finished later than it was taken."""
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def affected_areas(flood_warnings, landslide_warnings, delta=None) -> dict:
+    """
+    Districts and river basins that an alert is about: those of the current
+    warning zones, plus those of zones that just cleared (utils.alert_state.get_delta).
+    """
+    flood = list(flood_warnings)
+    landslide = list(landslide_warnings)
+    if delta:
+        flood += delta["flood"]["cleared"]
+        landslide += delta["landslide"]["cleared"]
+
+    return {
+        "districts": sorted({z["district"] for z in landslide if z.get("district")}),
+        "basins": sorted({z["river_basin"] for z in flood if z.get("river_basin")}),
+    }
+
+
+class TelegramDispatcher:
+    def __init__(self):
+        config = settings.telegram_config
+        self.token = settings.TELEGRAM_TOKEN
+        self.main_chat_id = settings.TELEGRAM_CHAT_ID
+        self.routes = config.get("routes") or {}
+        self.chat_rate = config.get("chat_messages_per_second", DEFAULT_CHAT_MESSAGES_PER_SECOND)
+        self.max_concurrency = config.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)
+        self.max_retries = config.get("max_retries", DEFAULT_MAX_RETRIES)
+
+        global_rate = config.get("messages_per_second", DEFAULT_MESSAGES_PER_SECOND)
+        self.global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        # Kept across dispatches so back-to-back messages respect per-chat limits
+        self.chat_buckets = {}
+
+    def recipients(self, areas=None, include_main=True) -> list:
+        """Chat ids that should receive an alert about the given areas."""
+        areas = areas or {}
+        districts = set(areas.get("districts", []))
+        basins = set(areas.get("basins", []))
+
+        chats = [self.main_chat_id] if include_main and self.main_chat_id else []
+        for district in districts:
+            chats += (self.routes.get("districts") or {}).get(district) or []
+        for basin in basins:
+            chats += (self.routes.get("basins") or {}).get(basin) or []
+        for subscriber in self.routes.get("subscribers") or []:
+            if districts & set(subscriber.get("districts", [])) or \
+                    basins & set(subscriber.get("basins", [])):
+                chats.append(subscriber["chat_id"])
+
+        # De-duplicate, keeping the main chat first
+        return list(dict.fromkeys(str(chat) for chat in chats))
+
+    def _post(self, chat_id, text):
+        """Send one message (blocking). Returns (ok, retry_after)."""
+        url = TELEGRAM_API_URL.format(token=self.token)
+        try:
+            response = http.post(url, "telegram", json={"chat_id": chat_id, "text": text})
+            if response.status_code == 429:
+                return False, response.json().get("parameters", {}).get("retry_after", 1)
+            response.raise_for_status()
+            return True, None
+        except (requests.RequestException, ValueError) as e:
+            logger.error("Failed to send Telegram message to %s: %s", chat_id, e)
+            return False, None
+
+    async def _send_chat(self, executor, semaphore, chat_id, chunks):
+        """Send all chunks to one chat in order, within the rate limits."""
+        bucket = self.chat_buckets.setdefault(chat_id, TokenBucket(self.chat_rate))
+        loop = asyncio.get_running_loop()
+
+        for chunk in chunks:
+            for attempt in range(self.max_retries + 1):
+                # A chat waiting on its own limit (or a 429 pause) holds no slot;
+                # its refill restarts once the send returns, so a message that
+                # waited for a slot or a worker thread is never sent closer than
+                # the rate allows to the next
+                await bucket.acquire()
+                async with semaphore:
+                    await self.global_bucket.acquire()
+                    ok, retry_after = await loop.run_in_executor(executor, self._post, chat_id, chunk)
+                bucket.restart()
+                if ok:
+                    break
+                if retry_after is None or attempt == self.max_retries:
+                    return False
+                logger.warning("Telegram rate limit for %s — retrying in %ss", chat_id, retry_after)
+                bucket.pause(retry_after)
+        return True
+
+    async def _dispatch_async(self, chat_ids, chunks):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        try:
+            results = await asyncio.gather(*(
+                self._send_chat(executor, semaphore, chat_id, chunks) for chat_id in chat_ids
+            ))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return dict(zip(chat_ids, results))
+
+    def send(self, message, areas=None, include_main=True, exclude=()) -> dict:
+        """
+        Send a message to every chat routed to the given areas.
+
+        Args:
+            message: The alert text (split at 4096 characters like send_alert).
+            areas: {"districts": [...], "basins": [...]} — see affected_areas().
+            include_main: Also send to the main TELEGRAM_CHAT_ID.
+            exclude: Chats that already have the message (outbox retries).
+
+        Returns:
+            dict: chat_id -> True if every part was delivered.
+        """
+        if not self.token or (include_main and not self.main_chat_id):
+            logger.error("TELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_ID not set in .env")
+            return {"TELEGRAM_CHAT_ID": False}
+
+        excluded = {str(chat) for chat in exclude}
+        chat_ids = [chat for chat in self.recipients(areas, include_main) if chat not in excluded]
+        if not chat_ids:
+            return {}
+
+        start = time.perf_counter()
+        results = asyncio.run(self._dispatch_async(chat_ids, _split_message(message, limit=4096)))
+        delivered = sum(results.values())
+        logger.info("Alert delivered to %d/%d chats in %.1fs",
+                    delivered, len(chat_ids), time.perf_counter() - start)
+        return results
+
+
+# Created on first use, then reused so the per-chat rate limits carry over
+# between cycles in daemon mode
+_dispatcher = None
+
+
+def get_dispatcher() -> TelegramDispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = TelegramDispatcher()
+    return _dispatcher
+
+
+# ── Quick test ───────────────────────────────────────────────────────
+if __name__ == "__main__":
+    # Who would receive an alert covering every monitored district
+    dispatcher = get_dispatcher()
+    districts = sorted({z.get("district") for z in settings.landslide_zones.values() if z.get("district")})
+    for district in districts:
+        print(f"{district}: {dispatcher.recipients({'districts': [district]})}")
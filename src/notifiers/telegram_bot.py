@@ -1,17 +1,27 @@
 import os
 import sys
+import time
 import requests
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
-sys.path.insert(0, parent_dir)
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
 
 from config import settings
+from utils import http
 from utils.logger import setup_logger
 
 logger = setup_logger("TelegramBot")
 
 TELEGRAM_API_URL = "https://api.telegram.org/bot{token}/sendMessage"
+TELEGRAM_EDIT_URL = "https://api.telegram.org/bot{token}/editMessageText"
+
+# Telegram allows roughly one edit per second per chat (20/min in groups and channels)
+DEFAULT_STREAM_EDIT_INTERVAL_SECONDS = 3.0
+# Tries of the closing edit that completes a streamed message
+DEFAULT_STREAM_FINAL_ATTEMPTS = 3
+STREAM_FINAL_RETRY_SECONDS = 1.0
 
 
 def send_alert(message: str) -> bool:
@@ -43,7 +53,7 @@ def send_alert(message: str) -> bool:
             "text": chunk,
         }
         try:
-            response = requests.post(url, json=payload, timeout=15)
+            response = http.post(url, "telegram", json=payload)
             response.raise_for_status()
             logger.info("Telegram message sent (part %d/%d)", i + 1, len(chunks))
         except requests.RequestException as e:
@@ -53,6 +63,105 @@ def send_alert(message: str) -> bool:
     return success
 
 
+def _telegram_call(url: str, payload: dict):
+    """
+    POST one Bot API call, waiting out a single 429 (retry_after) if throttled.
+    Returns the "result" object, or None on failure.
+    """
+    for attempt in range(2):
+        try:
+            response = http.post(url, "telegram", json=payload)
+            if response.status_code == 429 and attempt == 0:
+                retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+                logger.warning("Telegram rate limit hit — retrying in %ss", retry_after)
+                time.sleep(retry_after)
+                continue
+            response.raise_for_status()
+            return response.json().get("result")
+        except (requests.RequestException, ValueError) as e:
+            logger.error("Telegram API call failed: %s", e)
+            return None
+    return None
+
+
+def send_alert_streaming(chunks, prefix: str = "", message_ids: list = None) -> bool:
+    """
+    Send a message whose text is still being generated.
+    The first chunk is posted straight away; the message is then edited in
+    place (editMessageText) at most once every
+    telegram.stream_edit_interval_seconds until the text is complete. Text
+    past the 4096 character limit continues in a new message, split the
+    same way as send_alert(). Once the text is complete, the closing edit
+    is tried up to telegram.stream_final_attempts times, so a message
+    already posted is finished in place rather than sent again.
+
+    Args:
+        chunks: Iterable of text pieces (e.g. agents.llm.stream_alert).
+        prefix: Text placed before the first chunk (e.g. a timestamp header).
+        message_ids: Optional list the ids of the posted messages are
+            appended to, so a caller can tell a partial post from none.
+
+    Returns:
+        True if the complete text was delivered, False otherwise. The chunks
+        are consumed either way, so a caller collecting them has the full text.
+    """
+    token = settings.TELEGRAM_TOKEN
+    chat_id = settings.TELEGRAM_CHAT_ID
+
+    if not token or not chat_id:
+        logger.error("TELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_ID not set in .env")
+        for _ in chunks:
+            pass
+        return False
+
+    interval = settings.telegram_config.get("stream_edit_interval_seconds",
+                                            DEFAULT_STREAM_EDIT_INTERVAL_SECONDS)
+    attempts = settings.telegram_config.get("stream_final_attempts", DEFAULT_STREAM_FINAL_ATTEMPTS)
+    text = prefix
+    message_ids = [] if message_ids is None else message_ids   # one per posted part
+    posted = []         # text currently shown in each message
+
+    def flush() -> bool:
+        parts = _split_message(text, limit=4096)
+        for i, part in enumerate(parts):
+            if i < len(message_ids):
+                # Telegram trims whitespace and rejects edits that change nothing
+                if posted[i].strip() == part.strip():
+                    continue
+                result = _telegram_call(TELEGRAM_EDIT_URL.format(token=token),
+                                        {"chat_id": chat_id, "message_id": message_ids[i], "text": part})
+            else:
+                result = _telegram_call(TELEGRAM_API_URL.format(token=token),
+                                        {"chat_id": chat_id, "text": part})
+                if result:
+                    message_ids.append(result["message_id"])
+            if not result:
+                return False
+            posted[i:i + 1] = [part]
+        return True
+
+    last_flush = None
+    for chunk in chunks:
+        text += chunk
+        if not text.strip():
+            continue
+        now = time.monotonic()
+        if last_flush is None or now - last_flush >= interval:
+            flush()         # a failed update is caught up by the next one
+            last_flush = now
+
+    # Final edit with the complete text, whatever the throttle says
+    for attempt in range(max(1, attempts)):
+        if attempt:
+            time.sleep(STREAM_FINAL_RETRY_SECONDS)
+        if flush():
+            logger.info("Streamed Telegram message delivered in %d part(s)", len(message_ids))
+            return True
+    logger.error("Streamed Telegram message incomplete after %d attempt(s) (%d part(s) posted)",
+                 max(1, attempts), len(message_ids))
+    return False
+
+
 def _split_message(text: str, limit: int = 4000) -> list:
     """
     Split long messages into readable chunks.
@@ -1,70 +1,315 @@
 """
-Alert State Manager — tracks the last sent warning zones in a JSON file.
+Alert State Manager — tracks the last sent warning zones in SQLite.
 Prevents duplicate hourly alerts when nothing has changed.
 
-State file: data/alert_state.json
-Valid for: current calendar day only (auto-wiped at midnight)
+Database: data/alerts.db (WAL mode, shared with the delivery outbox)
+- zone_state: one record per active zone, upserted atomically, so overlapping
+  runs (cron jitter, manual runs, the daemon) can share it safely. Each
+  record remembers since when the zone is at its level (for the minimum
+  dwell before de-escalating) and expires alert_state.ttl_hours after the
+  zone was last seen at that level — a sliding TTL instead of a midnight wipe.
+- transitions: every level change ever saved, as an audit trail.
+
+The state is saved only once an alert has been delivered (see
+utils/outbox.py), so a failed send is detected again on the next cycle.
+An existing data/alert_state.json from today is imported once (older JSON
+state had already expired at midnight); the import is recorded in meta.
 """
 import os
-import sys
-import json
+import time
 from datetime import date
 
-current_dir = os.path.dirname(os.path.abspath(__file__))
-parent_dir = os.path.dirname(current_dir)
-sys.path.insert(0, parent_dir)
-
+from config import settings
+from utils.db import connect, ensure_schema, transaction
+from utils.file_cache import cache_path, load_json
 from utils.logger import setup_logger
 
 logger = setup_logger("AlertState")
 
-# State file lives in data/ at the project root
-STATE_FILE = os.path.join(parent_dir, "..", "data", "alert_state.json")
+DB_FILE = cache_path("alerts.db")
+# Previous JSON state file, imported once if it is from today (see _migrate_json)
+LEGACY_STATE_FILE = cache_path("alert_state.json")
 
+# Zone field holding the area used for routing, per disaster type
+AREA_FIELD = {"flood": "river_basin", "landslide": "district"}
 
-def _load_state() -> dict:
-    """Load state from JSON. Returns empty state if file missing or outdated."""
-    if not os.path.exists(STATE_FILE):
-        return {}
+DEFAULT_TTL_HOURS = 24
 
-    try:
-        with open(STATE_FILE, "r", encoding="utf-8") as f:
-            state = json.load(f)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS zone_state (
+    kind       TEXT NOT NULL,
+    station    TEXT NOT NULL,
+    risk_level TEXT NOT NULL,
+    area       TEXT,
+    since      REAL NOT NULL,
+    last_seen  REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (kind, station)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_zone_state_expiry ON zone_state (expires_at);
+
+CREATE TABLE IF NOT EXISTS transitions (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    at         REAL NOT NULL,
+    kind       TEXT NOT NULL,
+    station    TEXT NOT NULL,
+    from_level TEXT,
+    to_level   TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transitions_station ON transitions (station, at);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+) WITHOUT ROWID
+"""
+
+LEGACY_MIGRATED_KEY = "legacy_json_migrated"
+
+
+def _ttl_seconds() -> float:
+    return settings.alert_state_config.get("ttl_hours", DEFAULT_TTL_HOURS) * 3600
+
+
+def _connect():
+    conn = connect(DB_FILE, SCHEMA)
+    if os.path.exists(LEGACY_STATE_FILE):
+        _migrate_json(conn)
+    return conn
+
+
+def _migrate_json(conn):
+    """
+    Import data/alert_state.json into an empty database, once. The JSON state
+    was only valid on its own date, so a file from an earlier day is skipped.
+    """
+    migrated = "SELECT 1 FROM meta WHERE key = ?"
+    if conn.execute(migrated, (LEGACY_MIGRATED_KEY,)).fetchone():
+        return
+
+    legacy = load_json(LEGACY_STATE_FILE)
+    with transaction(conn):
+        # Re-check under the write lock: another process may have imported it
+        if conn.execute(migrated, (LEGACY_MIGRATED_KEY,)).fetchone():
+            return
+        empty = conn.execute("SELECT COUNT(*) FROM zone_state").fetchone()[0] == 0
+        if legacy and empty and legacy.get("date") == str(date.today()):
+            _apply_state(conn, legacy)
+            logger.info("Migrated alert_state.json into %s", os.path.basename(DB_FILE))
+        elif legacy:
+            logger.info("Skipping alert_state.json from %s — expired", legacy.get("date"))
+        conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)",
+                     (LEGACY_MIGRATED_KEY, str(time.time())))
 
-        # Wipe if it's from a previous day
-        stored_date = state.get("date")
-        if stored_date != str(date.today()):
-            logger.info("New day detected — clearing previous alert state (%s)", stored_date)
-            return {}
 
-        return state
+def _load_state() -> dict:
+    """Load the unexpired zone records. Returns empty state if there are none."""
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT kind, station, risk_level, area FROM zone_state WHERE expires_at > ? "
+            "ORDER BY kind, station", (time.time(),)
+        ).fetchall()
+    finally:
+        conn.close()
 
-    except (json.JSONDecodeError, OSError) as e:
-        logger.warning("Failed to read alert state file: %s — starting fresh", e)
+    if not rows:
         return {}
 
+    state = {"flood": [], "landslide": []}
+    for row in rows:
+        state[row["kind"]].append({"station": row["station"], "risk_level": row["risk_level"],
+                                   AREA_FIELD[row["kind"]]: row["area"]})
+    return state
 
-def _save_state(flood_zones: list, landslide_zones: list):
-    """Persist current warning zones to JSON."""
-    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
 
-    state = {
-        "date": str(date.today()),
+def snapshot(flood_zones: list, landslide_zones: list) -> dict:
+    """The state that an alert for these warning zones represents."""
+    return {
         "flood": [
-            {"station": z["station"], "risk_level": z["risk_level"]}
+            {"station": z["station"], "risk_level": z["risk_level"],
+             "river_basin": z.get("river_basin")}
             for z in flood_zones
         ],
         "landslide": [
-            {"station": z["station"], "risk_level": z["risk_level"]}
+            {"station": z["station"], "risk_level": z["risk_level"],
+             "district": z.get("district")}
             for z in landslide_zones
         ],
     }
 
-    with open(STATE_FILE, "w", encoding="utf-8") as f:
-        json.dump(state, f, indent=2, ensure_ascii=False)
+
+def _apply_state(conn, state: dict):
+    """Upsert every zone of state, drop the others, and log the transitions."""
+    now = time.time()
+    expires_at = now + _ttl_seconds()
+
+    for kind in ("flood", "landslide"):
+        zones = state.get(kind, [])
+        previous = {
+            row["station"]: row["risk_level"]
+            for row in conn.execute(
+                "SELECT station, risk_level FROM zone_state WHERE kind = ? AND expires_at > ?",
+                (kind, now))
+        }
+
+        transitions = []
+        for z in zones:
+            # "since" only moves when the level changes (or the record had expired)
+            conn.execute(
+                "INSERT INTO zone_state (kind, station, risk_level, area, since, last_seen, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (kind, station) DO UPDATE SET "
+                "since = CASE WHEN risk_level = excluded.risk_level AND expires_at > excluded.last_seen "
+                "THEN since ELSE excluded.since END, "
+                "risk_level = excluded.risk_level, area = excluded.area, "
+                "last_seen = excluded.last_seen, expires_at = excluded.expires_at",
+                (kind, z["station"], z["risk_level"], z.get(AREA_FIELD[kind]), now, now, expires_at),
+            )
+            if previous.get(z["station"]) != z["risk_level"]:
+                transitions.append((now, kind, z["station"], previous.get(z["station"]), z["risk_level"]))
+
+        current = {z["station"] for z in zones}
+        for station, level in previous.items():
+            if station not in current:
+                transitions.append((now, kind, station, level, "NORMAL"))
+
+        # Cleared zones
+        conn.execute(
+            f"DELETE FROM zone_state WHERE kind = ? AND station NOT IN "
+            f"({', '.join('?' * len(current))})",
+            (kind, *current),
+        )
+        conn.executemany(
+            "INSERT INTO transitions (at, kind, station, from_level, to_level) VALUES (?, ?, ?, ?, ?)",
+            transitions,
+        )
+
+
+def save_state(state: dict, conn=None):
+    """
+    Persist a delivered alert's state (from snapshot()).
+
+    Args:
+        conn: Connection with an open transaction to join (e.g. the outbox
+            marking the alert delivered), so both commit together.
+    """
+    if conn is not None:
+        ensure_schema(conn, SCHEMA)
+        _apply_state(conn, state)
+    else:
+        conn = _connect()
+        try:
+            with transaction(conn):
+                _apply_state(conn, state)
+        finally:
+            conn.close()
 
     logger.info("Alert state saved — %d flood, %d landslide zones",
-                len(flood_zones), len(landslide_zones))
+                len(state["flood"]), len(state["landslide"]))
+
+
+def touch_zones(flood_zones: list, landslide_zones: list):
+    """
+    Slide the TTL of every stored zone still seen at its stored level.
+    Called each cycle, so only zones that stop being reported expire.
+    """
+    now = time.time()
+    rows = [(now, now + _ttl_seconds(), kind, z["station"], z["risk_level"], now)
+            for kind, zones in (("flood", flood_zones), ("landslide", landslide_zones))
+            for z in zones]
+    conn = _connect()
+    try:
+        with transaction(conn):
+            conn.executemany(
+                "UPDATE zone_state SET last_seen = ?, expires_at = ? WHERE kind = ? AND station = ? "
+                "AND risk_level = ? AND expires_at > ?", rows)
+            conn.execute("DELETE FROM zone_state WHERE expires_at <= ?", (now,))
+    finally:
+        conn.close()
+
+
+def zone_levels(kind: str) -> dict:
+    """
+    Last alerted level of each unexpired zone of one kind ("flood" / "landslide"),
+    for the engines' hysteresis: station -> {"risk_level", "since"}.
+    """
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT station, risk_level, since FROM zone_state WHERE kind = ? AND expires_at > ?",
+            (kind, time.time())
+        ).fetchall()
+    finally:
+        conn.close()
+    return {row["station"]: {"risk_level": row["risk_level"], "since": row["since"]} for row in rows}
+
+
+def get_transitions(station: str = None, limit: int = 100) -> list:
+    """Most recent saved level changes (newest first), optionally for one station."""
+    conn = _connect()
+    try:
+        if station:
+            rows = conn.execute("SELECT * FROM transitions WHERE station = ? "
+                                "ORDER BY at DESC, id DESC LIMIT ?", (station, limit))
+        else:
+            rows = conn.execute("SELECT * FROM transitions ORDER BY id DESC LIMIT ?", (limit,))
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+
+# Severity order used to tell escalations from de-escalations
+RISK_ORDER = {"NORMAL": 0, "WATCH": 1, "WARNING": 2, "CRITICAL": 3}
+
+
+def _diff_zones(current: list, previous: list) -> dict:
+    """
+    Split the change between two zone lists into added, escalated,
+    de-escalated and cleared zones. Changed zones carry "previous_level".
+    """
+    prev_levels = {z["station"]: z["risk_level"] for z in previous}
+    current_stations = {z["station"] for z in current}
+
+    delta = {"added": [], "escalated": [], "de_escalated": [], "cleared": []}
+    for zone in current:
+        prev_level = prev_levels.get(zone["station"])
+        if prev_level is None:
+            delta["added"].append(zone)
+        elif RISK_ORDER[zone["risk_level"]] > RISK_ORDER[prev_level]:
+            delta["escalated"].append(dict(zone, previous_level=prev_level))
+        elif RISK_ORDER[zone["risk_level"]] < RISK_ORDER[prev_level]:
+            delta["de_escalated"].append(dict(zone, previous_level=prev_level))
+
+    # Cleared zones keep their saved area (river_basin / district) for routing
+    delta["cleared"] = [
+        dict({k: v for k, v in z.items() if k != "risk_level"}, previous_level=z["risk_level"])
+        for z in previous if z["station"] not in current_stations
+    ]
+    return delta
+
+
+def get_delta(flood_zones: list, landslide_zones: list, state: dict = None):
+    """
+    Describe what changed since the last saved state, per disaster type.
+
+    Args:
+        state: State to compare against (e.g. a queued alert's); defaults to
+            the last delivered state.
+
+    Returns:
+        dict: {"flood": {...}, "landslide": {...}} with added / escalated /
+              de_escalated / cleared zone lists, or None if there is no
+              unexpired previous state (the next alert should be a full bulletin).
+    """
+    if state is None:
+        state = _load_state()
+    if not state:
+        return None
+
+    return {
+        "flood": _diff_zones(flood_zones, state.get("flood", [])),
+        "landslide": _diff_zones(landslide_zones, state.get("landslide", [])),
+    }
 
 
 def _to_signature(zones: list) -> set:
@@ -72,47 +317,72 @@ def _to_signature(zones: list) -> set:
     return {(z["station"], z["risk_level"]) for z in zones}
 
 
-def has_changed(flood_zones: list, landslide_zones: list) -> bool:
+def _stored_changes(flood_zones: list, landslide_zones: list) -> dict:
     """
-    Compare current warning zones against the last saved state.
-    Returns True if anything changed (new zone, removed zone, or risk level upgrade/downgrade).
-    Also saves the new state if changed.
+    Diff the current zones against zone_state in SQL: new / changed zones
+    and cleared zones are found with primary-key lookups, without loading
+    the stored state. Returns kind -> (added, removed) signature sets.
     """
-    state = _load_state()
-
-    prev_flood = state.get("flood", [])
-    prev_landslide = state.get("landslide", [])
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS current_zones ("
+                     "kind TEXT, station TEXT, risk_level TEXT, PRIMARY KEY (kind, station))")
+        conn.execute("DELETE FROM current_zones")
+        conn.executemany(
+            "INSERT OR REPLACE INTO current_zones VALUES (?, ?, ?)",
+            [("flood", z["station"], z["risk_level"]) for z in flood_zones]
+            + [("landslide", z["station"], z["risk_level"]) for z in landslide_zones],
+        )
 
-    current_flood_sig = _to_signature(flood_zones)
-    prev_flood_sig = _to_signature(prev_flood)
+        changed = conn.execute(
+            "SELECT c.kind, c.station, c.risk_level, s.risk_level AS previous "
+            "FROM current_zones c LEFT JOIN zone_state s "
+            "ON s.kind = c.kind AND s.station = c.station AND s.expires_at > ? "
+            "WHERE s.risk_level IS NOT c.risk_level", (now,)
+        ).fetchall()
+        cleared = conn.execute(
+            "SELECT s.kind, s.station, s.risk_level FROM zone_state s "
+            "WHERE s.expires_at > ? AND NOT EXISTS (SELECT 1 FROM current_zones c "
+            "WHERE c.kind = s.kind AND c.station = s.station)", (now,)
+        ).fetchall()
+    finally:
+        conn.close()
 
-    current_landslide_sig = _to_signature(landslide_zones)
-    prev_landslide_sig = _to_signature(prev_landslide)
+    changes = {"flood": (set(), set()), "landslide": (set(), set())}
+    for row in changed:
+        added, removed = changes[row["kind"]]
+        added.add((row["station"], row["risk_level"]))
+        if row["previous"] is not None:
+            removed.add((row["station"], row["previous"]))
+    for row in cleared:
+        changes[row["kind"]][1].add((row["station"], row["risk_level"]))
+    return changes
 
-    flood_changed = current_flood_sig != prev_flood_sig
-    landslide_changed = current_landslide_sig != prev_landslide_sig
 
-    if flood_changed:
-        added = current_flood_sig - prev_flood_sig
-        removed = prev_flood_sig - current_flood_sig
-        if added:
-            logger.info("Flood state CHANGED — new/updated: %s", added)
-        if removed:
-            logger.info("Flood state CHANGED — cleared: %s", removed)
+def has_changed(flood_zones: list, landslide_zones: list, state: dict = None) -> bool:
+    """
+    Compare current warning zones against the last saved state (or `state`).
+    Returns True if anything changed (new zone, removed zone, or risk level upgrade/downgrade).
+    Does not save anything: the state is saved once the alert is delivered.
+    """
+    if state is None:
+        changes = _stored_changes(flood_zones, landslide_zones)
+    else:
+        changes = {}
+        for kind, zones in (("flood", flood_zones), ("landslide", landslide_zones)):
+            current_sig, prev_sig = _to_signature(zones), _to_signature(state.get(kind, []))
+            changes[kind] = (current_sig - prev_sig, prev_sig - current_sig)
 
-    if landslide_changed:
-        added = current_landslide_sig - prev_landslide_sig
-        removed = prev_landslide_sig - current_landslide_sig
+    changed = False
+    for kind, (added, removed) in changes.items():
         if added:
-            logger.info("Landslide state CHANGED — new/updated: %s", added)
+            logger.info("%s state CHANGED — new/updated: %s", kind.capitalize(), added)
         if removed:
-            logger.info("Landslide state CHANGED — cleared: %s", removed)
+            logger.info("%s state CHANGED — cleared: %s", kind.capitalize(), removed)
+        changed = changed or bool(added or removed)
 
-    changed = flood_changed or landslide_changed
-
-    if changed:
-        _save_state(flood_zones, landslide_zones)
-    else:
+    if not changed:
         logger.info("No alert state change — skipping Telegram send")
 
     return changed
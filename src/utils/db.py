@@ -0,0 +1,55 @@
+"""
+SQLite helpers — small databases stored in data/ next to the JSON caches.
+
+Connections use WAL mode, so readers never block the writer. A busy
+timeout lets several processes (cron runs, the daemon, manual runs) share
+one database without "database is locked" errors. Writes go through
+transaction(), which takes the write lock up front (BEGIN IMMEDIATE) so
+two writers never deadlock half-way through.
+"""
+import os
+import sqlite3
+from contextlib import contextmanager
+
+DEFAULT_BUSY_TIMEOUT_SECONDS = 30
+
+
+def connect(path: str, schema: str = None) -> sqlite3.Connection:
+    """
+    Open a SQLite database in WAL mode (autocommit; use transaction() to write).
+
+    Args:
+        path: Database file, created if missing.
+        schema: Optional CREATE ... IF NOT EXISTS script run on every connect.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    conn = sqlite3.connect(path, timeout=DEFAULT_BUSY_TIMEOUT_SECONDS, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if schema:
+        ensure_schema(conn, schema)
+    return conn
+
+
+def ensure_schema(conn: sqlite3.Connection, schema: str):
+    """
+    Run a CREATE ... IF NOT EXISTS script one statement at a time.
+    Unlike executescript() this never commits, so it is safe inside transaction().
+    """
+    for statement in schema.split(";"):
+        if statement.strip():
+            conn.execute(statement)
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection):
+    """Run a block of writes atomically: committed on success, rolled back on error."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
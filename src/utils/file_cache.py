@@ -0,0 +1,50 @@
+"""
+File Cache helpers — small JSON caches stored in data/ at the project root.
+
+Writes go to a temp file first and are swapped in with os.replace, so a
+crash mid-write or a concurrent reader never sees a half-written file.
+"""
+import os
+import json
+import tempfile
+
+from utils.logger import setup_logger
+
+logger = setup_logger("FileCache")
+
+# Cache files live in data/ at the project root (next to alerts.db)
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data")
+
+
+def cache_path(filename: str) -> str:
+    """Return the absolute path of a cache file inside data/."""
+    return os.path.join(DATA_DIR, filename)
+
+
+def load_json(path: str):
+    """Load a JSON cache file. Returns None if it is missing or unreadable."""
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        logger.warning("Failed to read cache file %s: %s — ignoring it", path, e)
+        return None
+
+
+def save_json(path: str, data):
+    """Atomically write data as JSON to path."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,171 @@
+"""
+HTTP transport — one pooled session shared by every collector and notifier.
+
+- Keep-alive: one connection pool per host (OpenWeatherMap, GitHub, ArcGIS,
+  Telegram), so each API costs one TLS handshake per process, not per request.
+- Compression: responses are requested gzip / deflate encoded.
+- Retries: connection errors, and 429 / 5xx answers to GET requests, are
+  retried with exponential backoff (honouring Retry-After). POSTs are not
+  retried once sent, so a Telegram message is never delivered twice.
+  Endpoints metered by utils/quota.py (OpenWeatherMap) only retry connection
+  errors, which never reach the API: one quota token buys one request.
+- Timeouts: per endpoint, from http.timeouts in config.yaml.
+- Counters: requests, errors, seconds and bytes per endpoint (stats()).
+"""
+import os
+import sys
+import time
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from config import settings
+from utils.logger import setup_logger
+
+logger = setup_logger("HTTP")
+
+DEFAULT_TIMEOUT_SECONDS = 15
+DEFAULT_POOL_MAXSIZE = 32
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+METERED_ENDPOINTS = frozenset({"owm"})
+
+_session = None
+_metered_session = None
+_session_lock = threading.Lock()
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _new_session(retry: Retry) -> requests.Session:
+    adapter = HTTPAdapter(
+        pool_connections=8,      # hosts kept in the pool cache
+        pool_maxsize=settings.http_config.get("pool_maxsize", DEFAULT_POOL_MAXSIZE),
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(metered: bool = False) -> requests.Session:
+    """
+    The shared session, created on first use.
+
+    Args:
+        metered: The session for METERED_ENDPOINTS, which retries connection
+            errors only. A read timeout or a 429 / 5xx answer was already
+            counted by the API, so it is returned to the caller instead.
+    """
+    global _session, _metered_session
+    with _session_lock:
+        config = settings.http_config
+        max_retries = config.get("max_retries", DEFAULT_MAX_RETRIES)
+        backoff_factor = config.get("backoff_factor", DEFAULT_BACKOFF_FACTOR)
+        if metered and _metered_session is None:
+            _metered_session = _new_session(Retry(
+                total=max_retries, connect=max_retries, read=0, status=0, other=0,
+                backoff_factor=backoff_factor,
+                respect_retry_after_header=False,
+                raise_on_status=False,
+            ))
+        if not metered and _session is None:
+            _session = _new_session(Retry(
+                total=max_retries,
+                backoff_factor=backoff_factor,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=frozenset(["GET", "HEAD"]),
+                respect_retry_after_header=True,
+                raise_on_status=False,   # callers see the last response and raise_for_status()
+            ))
+    return _metered_session if metered else _session
+
+
+def timeout(endpoint: str) -> float:
+    """Timeout (seconds) configured for an endpoint."""
+    return (settings.http_config.get("timeouts") or {}).get(endpoint, DEFAULT_TIMEOUT_SECONDS)
+
+
+def _record(endpoint, seconds, size=0, error=False):
+    with _stats_lock:
+        counters = _stats.setdefault(
+            endpoint, {"requests": 0, "errors": 0, "seconds": 0.0, "bytes": 0})
+        counters["requests"] += 1
+        counters["errors"] += int(error)
+        counters["seconds"] += seconds
+        counters["bytes"] += size
+
+
+def request(method: str, url: str, endpoint: str, **kwargs) -> requests.Response:
+    """
+    Send a request over the shared session.
+
+    Args:
+        endpoint: Name used for the timeout and the counters
+            ("owm", "arcgis", "github", "telegram").
+        **kwargs: Passed to requests (params, json, headers, stream, timeout...).
+
+    Raises:
+        requests.RequestException: On connection errors after retries
+            (HTTP error statuses are returned; use raise_for_status()).
+    """
+    kwargs.setdefault("timeout", timeout(endpoint))
+    start = time.perf_counter()
+    try:
+        response = get_session(endpoint in METERED_ENDPOINTS).request(method, url, **kwargs)
+    except requests.RequestException:
+        _record(endpoint, time.perf_counter() - start, error=True)
+        raise
+
+    # Bytes on the wire (compressed); streamed bodies without a length count 0
+    size = response.headers.get("Content-Length")
+    if size is None and not kwargs.get("stream"):
+        size = len(response.content)
+    size = int(size or 0)
+    _record(endpoint, time.perf_counter() - start, size, error=response.status_code >= 400)
+    return response
+
+
+def get(url: str, endpoint: str, **kwargs) -> requests.Response:
+    return request("GET", url, endpoint, **kwargs)
+
+
+def post(url: str, endpoint: str, **kwargs) -> requests.Response:
+    return request("POST", url, endpoint, **kwargs)
+
+
+def stats(reset: bool = False) -> dict:
+    """Counters per endpoint since the last reset."""
+    with _stats_lock:
+        snapshot = {endpoint: dict(counters) for endpoint, counters in _stats.items()}
+        if reset:
+            _stats.clear()
+    return snapshot
+
+
+def log_stats(reset: bool = True):
+    """Log one line of counters per endpoint (by default once per cycle)."""
+    for endpoint, c in sorted(stats(reset).items()):
+        logger.info("HTTP %s: %d requests, %d errors, %.0f ms avg, %.1f KB",
+                    endpoint, c["requests"], c["errors"],
+                    1000 * c["seconds"] / c["requests"], c["bytes"] / 1024)
+
+
+# ── Quick test ───────────────────────────────────────────────────────
+if __name__ == "__main__":
+    # Two requests to one host: the second reuses the pooled connection
+    for _ in range(2):
+        start = time.perf_counter()
+        get("https://api.telegram.org", "telegram")
+        print(f"GET api.telegram.org: {(time.perf_counter() - start) * 1000:.0f} ms")
+    log_stats()
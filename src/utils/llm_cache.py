@@ -0,0 +1,84 @@
+"""
+LLM Alert Cache — disk-backed cache of generated alert texts.
+Entries are keyed by a hash of the canonical prompt inputs, so an identical
+set of warnings (e.g. a zone flapping back, or the same zones after the
+midnight state reset) reuses the stored bilingual text instead of calling
+Gemini again.
+
+Cache file: data/llm_cache.json
+Eviction: entries older than ttl_hours are dropped; beyond max_entries the
+least recently used entries are dropped.
+"""
+import json
+import time
+import hashlib
+import threading
+
+from config import settings
+from utils.file_cache import cache_path, load_json, save_json
+from utils.logger import setup_logger
+
+logger = setup_logger("LLMCache")
+
+CACHE_FILE = cache_path("llm_cache.json")
+
+DEFAULT_TTL_HOURS = 48
+DEFAULT_MAX_ENTRIES = 200
+
+# Parallel language blocks and the follow-up thread read and write the same file
+_lock = threading.Lock()
+
+
+def is_enabled() -> bool:
+    return settings.llm_cache_config.get("enabled", True)
+
+
+def cache_key(payload) -> str:
+    """Content hash of a JSON-serialisable payload (key order independent)."""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _evict(entries: dict, now: float) -> dict:
+    """Drop expired entries, then the least recently used beyond max_entries."""
+    ttl = settings.llm_cache_config.get("ttl_hours", DEFAULT_TTL_HOURS) * 3600
+    max_entries = settings.llm_cache_config.get("max_entries", DEFAULT_MAX_ENTRIES)
+
+    live = {k: e for k, e in entries.items() if now - e["created_at"] < ttl}
+    if len(live) > max_entries:
+        newest = sorted(live.items(), key=lambda kv: kv[1]["last_used"], reverse=True)
+        live = dict(newest[:max_entries])
+    return live
+
+
+def get_cached_alert(key: str):
+    """Return the stored alert text for key, or None on a miss."""
+    if not is_enabled():
+        return None
+
+    now = time.time()
+    with _lock:
+        entries = _evict(load_json(CACHE_FILE) or {}, now)
+        entry = entries.get(key)
+        if entry is None:
+            logger.info("LLM cache miss (%s)", key[:12])
+            return None
+
+        entry["last_used"] = now
+        save_json(CACHE_FILE, entries)
+    logger.info("LLM cache hit (%s) — reusing alert generated %.1f hours ago",
+                key[:12], (now - entry["created_at"]) / 3600.0)
+    return entry["text"]
+
+
+def store_alert(key: str, text: str):
+    """Store a generated alert text under key."""
+    if not is_enabled():
+        return
+
+    now = time.time()
+    with _lock:
+        entries = load_json(CACHE_FILE) or {}
+        entries[key] = {"text": text, "created_at": now, "last_used": now}
+        save_json(CACHE_FILE, _evict(entries, now))
+    logger.info("LLM alert cached (%s)", key[:12])
@@ -0,0 +1,224 @@
+"""
+Alert Outbox — durable queue of alert messages waiting for delivery.
+
+A cycle that detects a change writes the finished message, together with
+the alert state it represents, to the outbox in one transaction. Delivery
+then drains the outbox in order:
+
+- Each chat that received a message is recorded under the message's
+  idempotency key, so a retry only goes to the chats that still miss it.
+- The alert state is only saved once every recipient got the message. If
+  Gemini or Telegram fails, the next cycle still sees the change, and the
+  queued text is retried without re-running collectors or Gemini.
+- Failed messages back off exponentially (outbox.retry_backoff_seconds)
+  and are given up after outbox.max_attempts, after which the next cycle
+  re-detects the change and queues the alert again, behind any newer ones.
+
+Database: data/alerts.db (tables outbox, outbox_deliveries)
+"""
+import json
+import time
+import hashlib
+
+from config import settings
+from utils.db import connect, transaction
+from utils.file_cache import cache_path
+from utils.logger import setup_logger
+
+logger = setup_logger("Outbox")
+
+DB_FILE = cache_path("alerts.db")
+
+DEFAULT_MAX_ATTEMPTS = 10
+DEFAULT_RETRY_BACKOFF_SECONDS = 60
+DEFAULT_MAX_BACKOFF_SECONDS = 3600
+# A message being sent is hidden from other workers for this long
+CLAIM_SECONDS = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    created_at      REAL NOT NULL,
+    message         TEXT NOT NULL,
+    areas           TEXT,
+    state           TEXT,
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error      TEXT,
+    delivered_at    REAL,
+    failed_at       REAL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox (delivered_at, failed_at, id);
+
+CREATE TABLE IF NOT EXISTS outbox_deliveries (
+    idempotency_key TEXT NOT NULL,
+    chat_id         TEXT NOT NULL,
+    delivered_at    REAL NOT NULL,
+    PRIMARY KEY (idempotency_key, chat_id)
+) WITHOUT ROWID;
+"""
+
+
+def _connect():
+    return connect(DB_FILE, SCHEMA)
+
+
+def idempotency_key(*parts) -> str:
+    """Stable key for a message, from any JSON-serialisable parts."""
+    canonical = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def enqueue(key: str, message: str, areas=None, state=None, delivered_chats=()) -> bool:
+    """
+    Queue a message for delivery.
+
+    Args:
+        key: Idempotency key — queuing the same key twice is a no-op, unless
+            the earlier message was given up: then it is queued afresh.
+        message: The full text to send.
+        areas: Routing areas for notifiers.dispatcher (districts / basins).
+        state: Alert state to save once the message is delivered (None for
+            follow-up messages that do not change the state).
+        delivered_chats: Chats that already have the message (e.g. streamed).
+
+    Returns:
+        True if the message was queued, False if the key was already known.
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        with transaction(conn):
+            # A given-up message is replaced by a new row at the end of the queue
+            requeued = conn.execute(
+                "DELETE FROM outbox WHERE idempotency_key = ? AND failed_at IS NOT NULL", (key,)
+            ).rowcount
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO outbox (idempotency_key, created_at, message, areas, "
+                "state, next_attempt_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, now, message, json.dumps(areas, ensure_ascii=False),
+                 None if state is None else json.dumps(state, ensure_ascii=False), now),
+            )
+            if cursor.rowcount == 0:
+                logger.info("Alert %s already queued — skipping duplicate", key[:12])
+                return False
+            conn.executemany(
+                "INSERT OR IGNORE INTO outbox_deliveries VALUES (?, ?, ?)",
+                [(key, str(chat_id), now) for chat_id in delivered_chats],
+            )
+    finally:
+        conn.close()
+
+    logger.info("Alert %s %s for delivery (%d characters)", key[:12],
+                "requeued" if requeued else "queued", len(message))
+    return True
+
+
+def pending_state():
+    """State of the newest queued (not yet delivered) alert, or None."""
+    conn = _connect()
+    try:
+        row = conn.execute(
+            "SELECT state FROM outbox WHERE delivered_at IS NULL AND failed_at IS NULL "
+            "AND state IS NOT NULL ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+    finally:
+        conn.close()
+    return json.loads(row["state"]) if row else None
+
+
+def latest_id() -> int:
+    """Id of the newest queued or delivered message (0 if none)."""
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT MAX(id) AS id FROM outbox WHERE failed_at IS NULL").fetchone()
+    finally:
+        conn.close()
+    return row["id"] or 0
+
+
+def _backoff(attempts: int) -> float:
+    base = settings.outbox_config.get("retry_backoff_seconds", DEFAULT_RETRY_BACKOFF_SECONDS)
+    cap = settings.outbox_config.get("max_backoff_seconds", DEFAULT_MAX_BACKOFF_SECONDS)
+    return min(cap, base * 2 ** (attempts - 1))
+
+
+def drain(send, on_delivered=None) -> int:
+    """
+    Deliver queued messages, oldest first. Stops at the first message that
+    cannot be delivered yet, so alerts never arrive out of order.
+
+    Args:
+        send: send(message, areas, exclude) -> {chat_id: ok}, e.g.
+            TelegramDispatcher.send. exclude lists chats that already have it.
+        on_delivered: Called as on_delivered(state, conn) for each fully
+            delivered alert that carries a state (e.g. utils.alert_state.save_state).
+            It runs inside the transaction that marks the alert delivered,
+            so the state and the delivery are committed together.
+
+    Returns:
+        int: Number of messages fully delivered.
+    """
+    max_attempts = settings.outbox_config.get("max_attempts", DEFAULT_MAX_ATTEMPTS)
+    delivered = 0
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT * FROM outbox WHERE delivered_at IS NULL AND failed_at IS NULL ORDER BY id"
+        ).fetchall()
+
+        for row in rows:
+            now = time.time()
+            # Claim the message so an overlapping run does not send it too
+            with transaction(conn):
+                claimed = conn.execute(
+                    "UPDATE outbox SET next_attempt_at = ? WHERE id = ? AND next_attempt_at <= ? "
+                    "AND delivered_at IS NULL",
+                    (now + CLAIM_SECONDS, row["id"], now),
+                ).rowcount
+            if not claimed:
+                logger.info("Alert %s not due yet — waiting", row["idempotency_key"][:12])
+                break
+
+            key = row["idempotency_key"]
+            done = {r["chat_id"] for r in conn.execute(
+                "SELECT chat_id FROM outbox_deliveries WHERE idempotency_key = ?", (key,))}
+            results = send(row["message"], json.loads(row["areas"]), exclude=done)
+
+            now = time.time()
+            with transaction(conn):
+                conn.executemany(
+                    "INSERT OR IGNORE INTO outbox_deliveries VALUES (?, ?, ?)",
+                    [(key, chat_id, now) for chat_id, ok in results.items() if ok],
+                )
+                failed = [chat_id for chat_id, ok in results.items() if not ok]
+                if not failed:
+                    conn.execute("UPDATE outbox SET delivered_at = ?, attempts = attempts + 1 "
+                                 "WHERE id = ?", (now, row["id"]))
+                    if row["state"] is not None and on_delivered:
+                        on_delivered(json.loads(row["state"]), conn)
+                else:
+                    attempts = row["attempts"] + 1
+                    error = f"{len(failed)} chat(s) not reached: {', '.join(failed[:5])}"
+                    gave_up = attempts >= max_attempts
+                    conn.execute(
+                        "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ?, "
+                        "failed_at = ? WHERE id = ?",
+                        (attempts, now + _backoff(attempts), error, now if gave_up else None, row["id"]),
+                    )
+
+            if failed and gave_up:
+                logger.error("Alert %s given up after %d attempts (%s)", key[:12], attempts, error)
+                continue
+            if failed:
+                logger.warning("Alert %s delivery failed (attempt %d) — retrying in %.0fs: %s",
+                               key[:12], attempts, _backoff(attempts), error)
+                break
+
+            delivered += 1
+            logger.info("Alert %s delivered", key[:12])
+    finally:
+        conn.close()
+
+    return delivered
@@ -0,0 +1,203 @@
+"""
+API Quota — token buckets for the free-tier limits of OpenWeatherMap and Gemini.
+
+Database: data/quota.db (WAL mode), one row per bucket: tokens left and when
+they were counted. Buckets refill continuously at their configured rate up
+to their burst size. A take is one BEGIN IMMEDIATE transaction, so cron
+runs, the daemon and manual runs all draw from the same budget.
+
+Callers acquire() before each request. When a bucket is empty the caller
+waits until the tokens are due instead of hitting a 429, and is only turned
+away (False) when that would take longer than quota.max_wait_seconds.
+Within a process, waiters on the same buckets are served highest priority
+first (FIFO among equals), so stations at raised risk levels are fetched
+before the others when the budget is tight. Across processes the first
+caller to find tokens gets them.
+
+Buckets (quota.buckets in config.yaml) are sized so that burst + one minute
+of refill stays inside the provider's per-minute limit.
+"""
+import os
+import sys
+import time
+import heapq
+import itertools
+import threading
+from collections import defaultdict
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from config import settings
+from utils.db import connect, transaction
+from utils.file_cache import cache_path
+from utils.logger import setup_logger
+
+logger = setup_logger("Quota")
+
+DB_FILE = cache_path("quota.db")
+
+DEFAULT_MAX_WAIT_SECONDS = 30
+
+# Defaults when the `quota` section is missing from config.yaml
+DEFAULT_BUCKETS = {
+    "owm":           {"per_minute": 50, "burst": 10},          # OWM free tier: 60 calls/min
+    "gemini":        {"per_minute": 8, "burst": 2},            # Gemini free tier: 10 requests/min
+    "gemini_tokens": {"per_minute": 200000, "burst": 50000},   # 250k tokens/min
+    "gemini_daily":  {"per_day": 240, "burst": 10},            # 250 requests/day
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name    TEXT PRIMARY KEY,
+    tokens  REAL NOT NULL,
+    updated REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+
+class QuotaExhaustedError(Exception):
+    """Raised by callers that cannot wait for their quota (see acquire())."""
+
+
+# Waiting tickets per set of buckets: (-priority, arrival) min-heaps
+_queues = defaultdict(list)
+_queues_changed = threading.Condition()
+_arrivals = itertools.count()
+
+
+def _connect():
+    return connect(DB_FILE, SCHEMA)
+
+
+def _limits(name):
+    """(tokens per second, burst) of a bucket, or None if it is not limited."""
+    buckets = settings.quota_config.get("buckets") or DEFAULT_BUCKETS
+    limit = buckets.get(name)
+    if not limit:
+        return None
+    if "per_day" in limit:
+        rate = limit["per_day"] / 86400
+    else:
+        rate = limit["per_minute"] / 60
+    return rate, limit.get("burst", 1)
+
+
+def _take(costs, now):
+    """
+    Take every cost at once if all buckets hold enough.
+
+    Returns:
+        float: 0 if taken, else seconds until the scarcest bucket has enough.
+    """
+    limited = {}
+    for name, amount in costs.items():
+        limits = _limits(name)
+        if limits:
+            # A cost above the burst size could never be met in one go
+            limited[name] = (min(amount, limits[1]), *limits)
+    if not limited:
+        return 0.0
+
+    conn = _connect()
+    try:
+        with transaction(conn):
+            placeholders = ", ".join("?" * len(limited))
+            stored = {row["name"]: row for row in conn.execute(
+                f"SELECT name, tokens, updated FROM buckets WHERE name IN ({placeholders})",
+                list(limited))}
+
+            wait, levels = 0.0, {}
+            for name, (amount, rate, burst) in limited.items():
+                row = stored.get(name)
+                tokens = burst if row is None else \
+                    min(burst, row["tokens"] + max(0.0, now - row["updated"]) * rate)
+                levels[name] = tokens - amount
+                if tokens < amount:
+                    wait = max(wait, (amount - tokens) / rate)
+
+            if wait == 0:
+                conn.executemany("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)",
+                                 [(name, tokens, now) for name, tokens in levels.items()])
+    finally:
+        conn.close()
+    return wait
+
+
+def acquire(costs, priority: int = 0, max_wait: float = None) -> bool:
+    """
+    Take quota for one request, waiting for it if necessary.
+
+    Args:
+        costs: Tokens per bucket, e.g. {"owm": 1} or
+            {"gemini": 1, "gemini_daily": 1, "gemini_tokens": 3000}.
+        priority: Higher is served first among this process's waiters.
+        max_wait: Seconds to wait at most (default quota.max_wait_seconds).
+
+    Returns:
+        bool: True once taken, False if it could not be had within max_wait.
+    """
+    if not settings.quota_config.get("enabled", True):
+        return True
+    if max_wait is None:
+        max_wait = settings.quota_config.get("max_wait_seconds", DEFAULT_MAX_WAIT_SECONDS)
+    deadline = time.monotonic() + max_wait
+
+    queue = _queues[tuple(sorted(costs))]
+    ticket = (-priority, next(_arrivals))
+    with _queues_changed:
+        heapq.heappush(queue, ticket)
+    try:
+        while True:
+            # Wait for our turn among this process's callers
+            with _queues_changed:
+                while queue[0] != ticket:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    _queues_changed.wait(remaining)
+
+            wait = _take(costs, time.time())
+            if wait == 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                logger.warning("Quota for %s not available within %.0fs (next in %.1fs)",
+                               ", ".join(costs), max_wait, wait)
+                return False
+            logger.debug("Quota for %s exhausted — waiting %.2fs", ", ".join(costs), wait)
+            time.sleep(wait)
+    finally:
+        with _queues_changed:
+            queue.remove(ticket)
+            heapq.heapify(queue)
+            _queues_changed.notify_all()
+
+
+def levels(now: float = None) -> dict:
+    """Tokens currently available per configured bucket."""
+    now = time.time() if now is None else now
+    buckets = settings.quota_config.get("buckets") or DEFAULT_BUCKETS
+    conn = _connect()
+    try:
+        stored = {row["name"]: row for row in conn.execute("SELECT * FROM buckets")}
+    finally:
+        conn.close()
+
+    result = {}
+    for name in buckets:
+        rate, burst = _limits(name)
+        row = stored.get(name)
+        result[name] = burst if row is None else \
+            min(burst, row["tokens"] + max(0.0, now - row["updated"]) * rate)
+    return result
+
+
+# ── Quick test ───────────────────────────────────────────────────────
+if __name__ == "__main__":
+    start = time.monotonic()
+    for i in range(15):
+        acquire({"owm": 1})
+        print(f"OWM call {i + 1:2d} allowed at {time.monotonic() - start:5.2f}s")
+    print({name: round(tokens, 1) for name, tokens in levels().items()})
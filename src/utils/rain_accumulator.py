@@ -0,0 +1,159 @@
+"""
+Rain Accumulator — rolling 6h / 24h / 72h rainfall totals per landslide zone.
+
+Each zone owns one row of a memory-mapped array (data/rain_accumulators.npy):
+
+    [ 72 hourly buckets (ring) | 6h sum | 24h sum | 72h sum | last hour ]
+
+A reading lands in the bucket of its hour; each window keeps a running sum,
+so when the ring moves on by an hour only the bucket leaving each window is
+subtracted. Updating and reading a zone therefore costs the same whatever the
+window length. Bucket order: hour h lives at index h % 72.
+
+A bucket holds the largest OWM rain_1h seen in its hour (rain over the hour
+before the observation), so several cycles in one hour are not counted twice.
+Zone names map to rows through data/rain_accumulators.json.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from utils.file_cache import cache_path, load_json, save_json
+from utils.logger import setup_logger
+
+logger = setup_logger("RainAccumulator")
+
+ACCUMULATOR_FILE = cache_path("rain_accumulators.npy")
+
+WINDOW_HOURS = (6, 24, 72)
+RING_HOURS = max(WINDOW_HOURS)
+
+# Row layout
+SUMS = slice(RING_HOURS, RING_HOURS + len(WINDOW_HOURS))
+LAST_HOUR = RING_HOURS + len(WINDOW_HOURS)
+ROW_WIDTH = LAST_HOUR + 1
+INITIAL_ROWS = 16
+
+
+class RainAccumulator:
+    def __init__(self, path=ACCUMULATOR_FILE):
+        self.path = path
+        self.index_path = os.path.splitext(path)[0] + ".json"
+        index = load_json(self.index_path) or {}
+        self.zones = {name: row for row, name in enumerate(index.get("zones", []))}
+
+        if os.path.exists(path) and self.zones:
+            self.rows = np.load(path, mmap_mode="r+")
+            if self.rows.shape[1] != ROW_WIDTH or self.rows.shape[0] < len(self.zones):
+                logger.warning("Rain accumulator layout changed — starting over")
+                self.zones = {}
+                self.rows = None
+                self._resize(INITIAL_ROWS)
+        else:
+            self.zones = {}
+            self._resize(INITIAL_ROWS)
+
+    def _resize(self, n_rows):
+        """Recreate the memory-mapped file with n_rows, keeping existing rows."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        old = getattr(self, "rows", None)
+        tmp_path = self.path + ".tmp"
+        rows = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float64,
+                                         shape=(n_rows, ROW_WIDTH))
+        rows[:, LAST_HOUR] = -1
+        if old is not None:
+            rows[:min(len(old), n_rows)] = old[:n_rows]
+        rows.flush()
+        del rows, old
+        self.rows = None
+        os.replace(tmp_path, self.path)
+        self.rows = np.load(self.path, mmap_mode="r+")
+
+    def _row(self, zone):
+        """Row of a zone, adding it (and growing the file) on first sight."""
+        if zone not in self.zones:
+            self.zones[zone] = len(self.zones)
+            if len(self.zones) > len(self.rows):
+                self._resize(max(len(self.zones), 2 * len(self.rows)))
+            save_json(self.index_path, {"zones": list(self.zones)})
+        return self.rows[self.zones[zone]]
+
+    @staticmethod
+    def _advance(row, hour):
+        """Move a zone's ring forward to `hour`, dropping rain that left each window."""
+        last = int(row[LAST_HOUR])
+        if last >= hour:
+            return
+        if last < 0 or hour - last >= RING_HOURS:
+            row[:] = 0
+            row[LAST_HOUR] = hour
+            return
+
+        sums = row[SUMS]
+        for h in range(last + 1, hour + 1):
+            for i, window in enumerate(WINDOW_HOURS):
+                sums[i] -= row[(h - window) % RING_HOURS]
+            row[h % RING_HOURS] = 0
+        np.maximum(sums, 0, out=sums)     # float rounding never goes negative
+        row[LAST_HOUR] = hour
+
+    @staticmethod
+    def _add(row, hour, rain_mm):
+        """Record a reading for `hour` (not newer than the ring's last hour)."""
+        age = int(row[LAST_HOUR]) - hour
+        if age >= RING_HOURS or not rain_mm > 0:
+            return
+        slot = hour % RING_HOURS
+        added = rain_mm - row[slot]
+        if added <= 0:
+            return
+        row[slot] = rain_mm
+        for i, window in enumerate(WINDOW_HOURS):
+            if age < window:
+                row[RING_HOURS + i] += added
+
+    def update(self, zones, rain_1h, observed_at=None, now=None):
+        """
+        Record one rain_1h reading per zone and return the current totals.
+
+        Args:
+            zones: Zone names.
+            rain_1h: Rain over the last hour (mm) per zone.
+            observed_at: Observation epoch time per zone (None -> now).
+
+        Returns:
+            float array (zones x 3): 6h / 24h / 72h totals in mm.
+        """
+        now = time.time() if now is None else now
+        current_hour = int(now // 3600)
+        observed_at = observed_at or [None] * len(zones)
+        totals = np.zeros((len(zones), len(WINDOW_HOURS)))
+
+        for i, (zone, rain, observed) in enumerate(zip(zones, rain_1h, observed_at)):
+            row = self._row(zone)
+            hour = int((observed or now) // 3600)
+            self._advance(row, max(hour, current_hour))
+            self._add(row, hour, rain or 0)
+            totals[i] = row[SUMS]
+
+        self.rows.flush()
+        return totals
+
+    def totals(self, zones, now=None):
+        """6h / 24h / 72h totals per zone without recording anything."""
+        now = time.time() if now is None else now
+        return self.update(zones, [0] * len(zones), now=now)
+
+
+# ── Quick test ───────────────────────────────────────────────────────
+if __name__ == "__main__":
+    accumulator = RainAccumulator()
+    for zone, (r6, r24, r72) in zip(accumulator.zones, accumulator.totals(list(accumulator.zones))):
+        print(f"{zone}: 6h={r6:.1f}mm 24h={r24:.1f}mm 72h={r72:.1f}mm")
@@ -0,0 +1,210 @@
+"""
+Time-Series Store — every water-level and weather reading the collectors see.
+
+Database: data/timeseries.db (WAL mode)
+- readings: raw (station, metric, ts, value) rows. The primary key clusters
+  each station's metric in time order, so per-station range scans and
+  "newest N readings" are index walks; a ts index serves time-range queries
+  across stations. Re-ingesting a reading is a no-op.
+- readings_hourly: hourly count / mean / min / max. Raw readings older than
+  timeseries.raw_retention_days are rolled up into it, and hourly rows older
+  than timeseries.hourly_retention_days are dropped.
+
+Timestamps are epoch seconds (UTC). Maintenance (downsampling + retention)
+runs from append() at most every timeseries.maintenance_interval_hours.
+"""
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from config import settings
+from utils.db import connect, transaction
+from utils.file_cache import cache_path
+from utils.logger import setup_logger
+
+logger = setup_logger("TimeSeries")
+
+DB_FILE = cache_path("timeseries.db")
+
+DEFAULT_RAW_RETENTION_DAYS = 30
+DEFAULT_HOURLY_RETENTION_DAYS = 730
+DEFAULT_MAINTENANCE_INTERVAL_HOURS = 6
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings (
+    station TEXT    NOT NULL,
+    metric  TEXT    NOT NULL,
+    ts      INTEGER NOT NULL,
+    value   REAL    NOT NULL,
+    PRIMARY KEY (station, metric, ts)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_readings_ts ON readings (ts);
+
+CREATE TABLE IF NOT EXISTS readings_hourly (
+    station TEXT    NOT NULL,
+    metric  TEXT    NOT NULL,
+    hour    INTEGER NOT NULL,
+    count   INTEGER NOT NULL,
+    mean    REAL    NOT NULL,
+    min     REAL    NOT NULL,
+    max     REAL    NOT NULL,
+    PRIMARY KEY (station, metric, hour)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_readings_hourly_hour ON readings_hourly (hour);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value REAL
+) WITHOUT ROWID
+"""
+
+
+def _connect():
+    return connect(DB_FILE, SCHEMA)
+
+
+def _config(key, default):
+    return settings.timeseries_config.get(key, default)
+
+
+def append(readings) -> int:
+    """
+    Store readings, skipping ones already stored and missing values.
+
+    Args:
+        readings: Iterable of (station, metric, ts, value) tuples.
+
+    Returns:
+        int: Number of new readings stored.
+    """
+    rows = [(station, metric, int(ts), float(value))
+            for station, metric, ts, value in readings if value is not None]
+    if not rows:
+        return 0
+
+    conn = _connect()
+    try:
+        with transaction(conn):
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO readings VALUES (?, ?, ?, ?)", rows)
+            added = conn.total_changes - before
+        _maybe_maintain(conn)
+    finally:
+        conn.close()
+
+    logger.debug("Stored %d new readings (%d already known)", added, len(rows) - added)
+    return added
+
+
+def query(station: str, metric: str, start=None, end=None) -> list:
+    """Raw readings of one station's metric as (ts, value) pairs, oldest first."""
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT ts, value FROM readings WHERE station = ? AND metric = ? "
+            "AND ts >= ? AND ts <= ? ORDER BY ts",
+            (station, metric, start if start is not None else 0,
+             end if end is not None else 2 ** 62),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [(row["ts"], row["value"]) for row in rows]
+
+
+def latest(station: str, metric: str, n: int) -> list:
+    """Newest n raw readings of one station's metric as (ts, value) pairs, oldest first."""
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT ts, value FROM readings WHERE station = ? AND metric = ? "
+            "ORDER BY ts DESC LIMIT ?", (station, metric, n),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [(row["ts"], row["value"]) for row in reversed(rows)]
+
+
+def latest_times(metric: str) -> dict:
+    """Timestamp of the newest stored reading of a metric, per station."""
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT station, MAX(ts) AS ts FROM readings WHERE metric = ? GROUP BY station",
+            (metric,),
+        ).fetchall()
+    finally:
+        conn.close()
+    return {row["station"]: row["ts"] for row in rows}
+
+
+def query_hourly(station: str, metric: str, start=None, end=None) -> list:
+    """Downsampled hourly rows (hour, count, mean, min, max) of one station's metric."""
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT hour, count, mean, min, max FROM readings_hourly "
+            "WHERE station = ? AND metric = ? AND hour >= ? AND hour <= ? ORDER BY hour",
+            (station, metric, start if start is not None else 0,
+             end if end is not None else 2 ** 62),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+
+def maintain(now=None, conn=None):
+    """
+    Roll raw readings past the raw retention into hourly rows, then drop
+    hourly rows past the hourly retention. Only whole hours are rolled up.
+    """
+    now = time.time() if now is None else now
+    raw_cutoff = int(now - _config("raw_retention_days", DEFAULT_RAW_RETENTION_DAYS) * 86400)
+    raw_cutoff -= raw_cutoff % 3600
+    hourly_cutoff = int(now - _config("hourly_retention_days", DEFAULT_HOURLY_RETENTION_DAYS) * 86400)
+
+    own_conn = conn is None
+    conn = _connect() if own_conn else conn
+    try:
+        with transaction(conn):
+            # "WHERE true" lets SQLite parse the upsert after a SELECT
+            conn.execute(
+                "INSERT INTO readings_hourly (station, metric, hour, count, mean, min, max) "
+                "SELECT station, metric, ts - ts % 3600, COUNT(*), AVG(value), MIN(value), MAX(value) "
+                "FROM readings WHERE ts < ? AND true GROUP BY station, metric, ts - ts % 3600 "
+                "ON CONFLICT (station, metric, hour) DO UPDATE SET "
+                "mean = (mean * count + excluded.mean * excluded.count) / (count + excluded.count), "
+                "count = count + excluded.count, "
+                "min = MIN(min, excluded.min), max = MAX(max, excluded.max)",
+                (raw_cutoff,),
+            )
+            rolled = conn.execute("DELETE FROM readings WHERE ts < ?", (raw_cutoff,)).rowcount
+            dropped = conn.execute("DELETE FROM readings_hourly WHERE hour < ?",
+                                   (hourly_cutoff,)).rowcount
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('maintained_at', ?)", (now,))
+    finally:
+        if own_conn:
+            conn.close()
+
+    if rolled or dropped:
+        logger.info("Time-series maintenance: %d raw readings downsampled, %d hourly rows expired",
+                    rolled, dropped)
+
+
+def _maybe_maintain(conn):
+    """Run maintain() if it has not run within the maintenance interval."""
+    row = conn.execute("SELECT value FROM meta WHERE key = 'maintained_at'").fetchone()
+    interval = _config("maintenance_interval_hours", DEFAULT_MAINTENANCE_INTERVAL_HOURS) * 3600
+    if row is None or time.time() - row["value"] >= interval:
+        maintain(conn=conn)
+
+
+# ── Quick test ───────────────────────────────────────────────────────
+if __name__ == "__main__":
+    # Print the newest water level readings of every stored station
+    for station in sorted(latest_times("level_m")):
+        print(station, latest(station, "level_m", 5))
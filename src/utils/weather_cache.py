@@ -0,0 +1,107 @@
+"""
+Weather Cache — last OpenWeatherMap response per grid cell, with
+stale-while-revalidate semantics (as in HTTP Cache-Control).
+
+OWM current weather only changes about every 10 minutes, so polling faster
+than that re-downloads the same observation. By age of the cached response:
+
+- fresh (< fresh_minutes): served, no request.
+- stale, within stale_while_revalidate_minutes after that: served at once,
+  and the cell is refreshed in the background for the next cycle.
+- older: requested now; if the request fails, an entry up to
+  stale_if_error_minutes old is served instead of dropping the stations.
+
+Cache file: data/weather_cache.json — {"lat,lon": {"fetched_at", "data"}}.
+Entries older than the stale_if_error window are dropped on write.
+"""
+import os
+import sys
+import time
+import threading
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from config import settings
+from utils.file_cache import cache_path, load_json, save_json
+from utils.logger import setup_logger
+
+logger = setup_logger("WeatherCache")
+
+CACHE_FILE = cache_path("weather_cache.json")
+
+DEFAULT_FRESH_MINUTES = 10
+DEFAULT_STALE_WHILE_REVALIDATE_MINUTES = 20
+DEFAULT_STALE_IF_ERROR_MINUTES = 180
+
+FRESH, STALE, EXPIRED = "fresh", "stale", "expired"
+
+# Cycle and background refreshes write the same file
+_lock = threading.Lock()
+
+
+def is_enabled() -> bool:
+    return settings.weather_cache_config.get("enabled", True)
+
+
+def _minutes(key, default):
+    return settings.weather_cache_config.get(key, default) * 60
+
+
+def cell_key(lat, lon) -> str:
+    return f"{lat:.4f},{lon:.4f}"
+
+
+def load() -> dict:
+    """All cached entries, {} when the cache is disabled or empty."""
+    if not is_enabled():
+        return {}
+    with _lock:
+        return load_json(CACHE_FILE) or {}
+
+
+def classify(entry, now: float = None):
+    """FRESH, STALE (serve and refresh in the background) or EXPIRED (fetch now)."""
+    if entry is None:
+        return EXPIRED
+    age = (time.time() if now is None else now) - entry["fetched_at"]
+    fresh = _minutes("fresh_minutes", DEFAULT_FRESH_MINUTES)
+    if age < fresh:
+        return FRESH
+    if age < fresh + _minutes("stale_while_revalidate_minutes",
+                              DEFAULT_STALE_WHILE_REVALIDATE_MINUTES):
+        return STALE
+    return EXPIRED
+
+
+def usable_on_error(entry, now: float = None) -> bool:
+    """True if an entry is recent enough to stand in for a failed request."""
+    if entry is None:
+        return False
+    age = (time.time() if now is None else now) - entry["fetched_at"]
+    return age < _minutes("stale_if_error_minutes", DEFAULT_STALE_IF_ERROR_MINUTES)
+
+
+def store(responses: dict):
+    """Merge {cell_key: raw OWM response} into the cache, fetched now."""
+    if not is_enabled() or not responses:
+        return
+    now = time.time()
+    keep = max(_minutes("stale_if_error_minutes", DEFAULT_STALE_IF_ERROR_MINUTES),
+               _minutes("fresh_minutes", DEFAULT_FRESH_MINUTES)
+               + _minutes("stale_while_revalidate_minutes", DEFAULT_STALE_WHILE_REVALIDATE_MINUTES))
+    with _lock:
+        entries = load_json(CACHE_FILE) or {}
+        entries.update({key: {"fetched_at": now, "data": raw} for key, raw in responses.items()})
+        entries = {key: e for key, e in entries.items() if now - e["fetched_at"] < keep}
+        save_json(CACHE_FILE, entries)
+    logger.debug("Cached %d weather responses (%d entries)", len(responses), len(entries))
+
+
+# ── Quick test ───────────────────────────────────────────────────────
+if __name__ == "__main__":
+    now = time.time()
+    for key, entry in sorted(load().items()):
+        print(f"{key}: {classify(entry, now)}, fetched {(now - entry['fetched_at']) / 60:.0f} min ago")
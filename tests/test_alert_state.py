@@ -0,0 +1,157 @@
+"""
+Offline tests for the SQLite alert state store (temporary database).
+Run:  python tests/test_alert_state.py
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+from datetime import date
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import utils.alert_state as alert_state
+
+
+FLOODS = [{"station": "Hanwella", "river_basin": "Kelani Ganga", "risk_level": "WARNING"}]
+LANDSLIDES = [{"station": "Aranayake", "district": "Kegalle", "risk_level": "WATCH"}]
+
+
+def _use_temp_db():
+    directory = tempfile.mkdtemp()
+    alert_state.DB_FILE = os.path.join(directory, "alerts.db")
+    alert_state.LEGACY_STATE_FILE = os.path.join(directory, "alert_state.json")
+    return directory
+
+
+def test_has_changed_and_transitions():
+    print("=" * 60)
+    print("TEST: has_changed() against the SQLite state")
+    print("=" * 60)
+
+    _use_temp_db()
+    assert alert_state.has_changed(FLOODS, LANDSLIDES), "Empty state: everything is new"
+
+    alert_state.save_state(alert_state.snapshot(FLOODS, LANDSLIDES))
+    assert not alert_state.has_changed(FLOODS, LANDSLIDES)
+
+    escalated = [dict(LANDSLIDES[0], risk_level="CRITICAL")]
+    assert alert_state.has_changed(FLOODS, escalated)
+    assert alert_state.has_changed([], LANDSLIDES), "Cleared flood zone not detected"
+
+    alert_state.save_state(alert_state.snapshot([], escalated))
+    state = alert_state._load_state()
+    assert state["flood"] == []
+    assert state["landslide"] == [{"station": "Aranayake", "risk_level": "CRITICAL",
+                                   "district": "Kegalle"}]
+
+    history = [(t["station"], t["from_level"], t["to_level"])
+               for t in alert_state.get_transitions()]
+    assert history == [("Aranayake", "WATCH", "CRITICAL"), ("Hanwella", "WARNING", "NORMAL"),
+                       ("Aranayake", None, "WATCH"), ("Hanwella", None, "WARNING")], history
+
+    print(f"  PASSED - indexed diff, {len(history)} transitions recorded")
+    print()
+
+
+def test_legacy_json_migrated():
+    print("=" * 60)
+    print("TEST: alert_state.json migration")
+    print("=" * 60)
+
+    def write_legacy(day, flood):
+        with open(alert_state.LEGACY_STATE_FILE, "w", encoding="utf-8") as f:
+            json.dump({"date": day, "flood": flood, "landslide": []}, f)
+
+    _use_temp_db()
+    write_legacy(str(date.today()), [{"station": "Hanwella", "risk_level": "WARNING"}])
+    assert not alert_state.has_changed([dict(FLOODS[0])], [])
+
+    # Imported once: clearing the zone is not undone by the file still being there
+    alert_state.save_state(alert_state.snapshot([], []))
+    assert not alert_state.has_changed([], [])
+
+    # A file from an earlier day had already expired: nothing to clear
+    _use_temp_db()
+    write_legacy("2026-02-19", [{"station": "Hanwella", "risk_level": "WARNING"}])
+    assert not alert_state.has_changed([], []), "Expired JSON state must not cause a cleared alert"
+    assert alert_state.zone_levels("flood") == {}
+
+    print("  PASSED - today's JSON state imported once, older state skipped")
+    print()
+
+
+def test_concurrent_writers():
+    print("=" * 60)
+    print("TEST: concurrent save_state() calls")
+    print("=" * 60)
+
+    _use_temp_db()
+    errors = []
+
+    def writer(level):
+        try:
+            for _ in range(20):
+                alert_state.save_state(alert_state.snapshot([dict(FLOODS[0], risk_level=level)], []))
+        except Exception as e:      # "database is locked" would land here
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(level,))
+               for level in ("WATCH", "WARNING", "CRITICAL", "WARNING")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors, errors
+    state = alert_state._load_state()
+    assert len(state["flood"]) == 1, "Upserts must keep one row per zone"
+
+    print("  PASSED - 80 overlapping writes, no lock errors, one row per zone")
+    print()
+
+
+def test_zone_ttl():
+    print("=" * 60)
+    print("TEST: per-zone TTL instead of a midnight wipe")
+    print("=" * 60)
+
+    _use_temp_db()
+    alert_state.save_state(alert_state.snapshot(FLOODS, LANDSLIDES))
+    since = alert_state.zone_levels("flood")["Hanwella"]["since"]
+
+    # Saved "yesterday" (before midnight) but still within the TTL
+    conn = alert_state._connect()
+    conn.execute("UPDATE zone_state SET since = since - 3600, last_seen = last_seen - 3600")
+    conn.close()
+    assert not alert_state.has_changed(FLOODS, LANDSLIDES), "Midnight must not re-alert"
+
+    # Same level again: "since" is kept, the TTL slides
+    alert_state.touch_zones(FLOODS, LANDSLIDES)
+    alert_state.save_state(alert_state.snapshot(FLOODS, LANDSLIDES))
+    assert alert_state.zone_levels("flood")["Hanwella"]["since"] == since - 3600
+
+    # New level: "since" restarts
+    alert_state.save_state(alert_state.snapshot([dict(FLOODS[0], risk_level="CRITICAL")], LANDSLIDES))
+    assert alert_state.zone_levels("flood")["Hanwella"]["since"] > since - 3600
+
+    # Expired zones are forgotten
+    conn = alert_state._connect()
+    conn.execute("UPDATE zone_state SET expires_at = ? WHERE kind = 'landslide'", (time.time() - 1,))
+    conn.close()
+    assert alert_state.zone_levels("landslide") == {}
+    assert alert_state.has_changed([dict(FLOODS[0], risk_level="CRITICAL")], LANDSLIDES)
+
+    print("  PASSED - state survives midnight, since kept per level, expired zones dropped")
+    print()
+
+
+if __name__ == "__main__":
+    test_has_changed_and_transitions()
+    test_legacy_json_migrated()
+    test_concurrent_writers()
+    test_zone_ttl()
+    print("ALL ALERT STATE TESTS PASSED!")
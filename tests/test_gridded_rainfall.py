@@ -0,0 +1,110 @@
+"""
+Offline tests for the memory-mapped gridded rainfall provider (temporary files).
+Run:  python tests/test_gridded_rainfall.py
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import numpy as np
+
+import utils.timeseries as timeseries
+from collectors.gridded_rainfall import GriddedRainfallProvider, open_grid, sidecar_path, write_grid
+from collectors.weather_provider import create_weather_provider
+
+# 0.1° grid, 10 x 10 cells, north-up: lat 8.0 -> 7.0, lon 80.0 -> 81.0
+TRANSFORM = (80.0, 0.1, 0, 8.0, 0, -0.1)
+
+
+def _grid_file(bands, fields=None, observed_at=None, nodata=None):
+    path = os.path.join(tempfile.mkdtemp(), "rainfall_grid.npy")
+    write_grid(path, bands, TRANSFORM, fields, observed_at, nodata)
+    return path
+
+
+def test_vectorized_sampling():
+    print("=" * 60)
+    print("TEST: stations sampled from the cell under them in one lookup")
+    print("=" * 60)
+
+    rain = np.arange(100, dtype=np.float32).reshape(10, 10)      # value = row*10 + col
+    rain[0, 0] = -9999
+    humidity = np.full((10, 10), 85.0)
+    grid = open_grid(_grid_file(np.stack([rain, humidity]), ["rain_1h_mm", "humidity"], nodata=-9999))
+
+    assert isinstance(grid.data, np.memmap), "The grid should be memory-mapped"
+    values = grid.sample(lat=[7.95, 7.05, 7.55, 9.0, 7.95],
+                         lon=[80.15, 80.95, 80.55, 80.5, 80.05])
+
+    assert list(values[0]) == [1.0, 85.0]                         # row 0, col 1
+    assert list(values[1]) == [99.0, 85.0]                        # row 9, col 9
+    assert list(values[2]) == [45.0, 85.0]                        # row 4, col 5
+    assert np.isnan(values[3]).all(), "Outside the grid"
+    assert np.isnan(values[4, 0]), "Nodata cell"
+
+    print("  PASSED - cell lookup, bands, outside / nodata -> NaN")
+    print()
+
+
+def test_raw_file():
+    print("=" * 60)
+    print("TEST: raw binary grid with dtype / shape in the sidecar")
+    print("=" * 60)
+
+    path = os.path.join(tempfile.mkdtemp(), "nowcast.bin")
+    np.full((10, 10), 12.5, dtype="<f4").tofile(path)
+    with open(sidecar_path(path), "w") as f:
+        json.dump({"transform": TRANSFORM, "dtype": "<f4", "shape": [1, 10, 10]}, f)
+
+    grid = open_grid(path)
+    assert grid.sample([7.5], [80.5])[0, 0] == 12.5
+
+    print("  PASSED - raw file memory-mapped")
+    print()
+
+
+def test_provider():
+    print("=" * 60)
+    print("TEST: GriddedRainfallProvider results, reload and staleness")
+    print("=" * 60)
+
+    timeseries.DB_FILE = os.path.join(tempfile.mkdtemp(), "timeseries.db")
+    observed = time.time() - 600
+    path = _grid_file(np.full((10, 10), 20.0), observed_at=observed)
+    provider = GriddedRainfallProvider(path=path)
+    provider.flood_stations = {"Inside": {"lat": 7.5, "lon": 80.5, "district": "Colombo"}}
+    provider.landslide_zones = {"Outside": {"lat": 6.5, "lon": 80.5}}
+
+    data = provider.collect_all()
+    assert data["landslide"] == [], "Stations off the grid get no weather"
+    station = data["flood"][0]
+    assert station["rain_1h_mm"] == 20.0 and station["humidity"] == 0
+    assert station["observed_at"] == observed and station["district"] == "Colombo"
+    assert timeseries.latest("Inside", "rain_1h_mm", 1) == [(int(observed), 20.0)]
+
+    # A new nowcast dropped in is picked up on the next cycle
+    write_grid(path, np.full((10, 10), 35.0), TRANSFORM, observed_at=time.time())
+    os.utime(path, (time.time() + 5, time.time() + 5))
+    assert provider.collect_flood_data()[0]["rain_1h_mm"] == 35.0
+
+    # Too old: not used at all
+    write_grid(path, np.full((10, 10), 50.0), TRANSFORM, observed_at=time.time() - 4 * 3600)
+    os.utime(path, (time.time() + 10, time.time() + 10))
+    assert provider.collect_flood_data() == []
+
+    assert type(create_weather_provider()).__name__ == "RainfallCollector", "OWM stays the default"
+
+    print("  PASSED - sampled, reloaded on a new file, stale grid ignored")
+    print()
+
+
+if __name__ == "__main__":
+    test_vectorized_sampling()
+    test_raw_file()
+    test_provider()
+    print("ALL GRIDDED RAINFALL TESTS PASSED!")
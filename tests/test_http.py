@@ -0,0 +1,130 @@
+"""
+Offline tests for the shared HTTP transport (local test server, no internet).
+Run:  python tests/test_http.py
+"""
+import os
+import sys
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from utils import http
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Counts connections; /flaky answers 503 twice before succeeding, /limited always 429."""
+    protocol_version = "HTTP/1.1"      # keep-alive
+    connections = set()
+    flaky_calls = 0
+    limited_calls = 0
+
+    def setup(self):
+        super().setup()
+        _Handler.connections.add(self.client_address)
+
+    def do_GET(self):
+        if self.path == "/flaky":
+            _Handler.flaky_calls += 1
+            if _Handler.flaky_calls <= 2:
+                self._reply(503, b"busy")
+                return
+        if self.path == "/limited":
+            _Handler.limited_calls += 1
+            self._reply(429, b"slow down", {"Retry-After": "1"})
+            return
+
+        body = json.dumps({"path": self.path, "pad": "x" * 2000}).encode()
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            self._reply(200, gzip.compress(body), {"Content-Encoding": "gzip"})
+        else:
+            self._reply(200, body)
+
+    def _reply(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_pooled_gzip_and_stats():
+    print("=" * 60)
+    print("TEST: keep-alive reuse, gzip and counters")
+    print("=" * 60)
+
+    server, base = _start_server()
+    http.stats(reset=True)
+    try:
+        for i in range(10):
+            response = http.get(f"{base}/reading/{i}", "test")
+            assert response.json()["path"] == f"/reading/{i}"
+    finally:
+        server.shutdown()
+
+    assert len(_Handler.connections) == 1, f"{len(_Handler.connections)} connections for 10 requests"
+    counters = http.stats()["test"]
+    assert counters["requests"] == 10 and counters["errors"] == 0
+    assert counters["bytes"] < 10 * 2000, "Bodies should arrive gzip-compressed"
+
+    print(f"  PASSED - 10 requests over 1 connection, {counters['bytes']} bytes on the wire")
+    print()
+
+
+def test_retry_on_503():
+    print("=" * 60)
+    print("TEST: GET retried with backoff on 503")
+    print("=" * 60)
+
+    server, base = _start_server()
+    _Handler.flaky_calls = 0
+    try:
+        response = http.get(f"{base}/flaky", "test")
+    finally:
+        server.shutdown()
+
+    assert response.status_code == 200 and _Handler.flaky_calls == 3
+
+    print("  PASSED - 2 x 503 then 200")
+    print()
+
+
+def test_metered_endpoint_not_retried():
+    print("=" * 60)
+    print("TEST: quota-metered endpoint (owm) gets one attempt per request")
+    print("=" * 60)
+
+    server, base = _start_server()
+    _Handler.flaky_calls = _Handler.limited_calls = 0
+    try:
+        busy = http.get(f"{base}/flaky", "owm")
+        limited = http.get(f"{base}/limited", "owm")
+    finally:
+        server.shutdown()
+
+    assert busy.status_code == 503 and _Handler.flaky_calls == 1, "A 503 must not be retried"
+    assert limited.status_code == 429 and _Handler.limited_calls == 1, \
+        "A 429 must not be retried, even with Retry-After"
+
+    print("  PASSED - 503 and 429 returned after 1 request each")
+    print()
+
+
+if __name__ == "__main__":
+    test_pooled_gzip_and_stats()
+    test_retry_on_503()
+    test_metered_endpoint_not_retried()
+    print("ALL HTTP TESTS PASSED!")
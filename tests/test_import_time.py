@@ -0,0 +1,76 @@
+"""
+Import-time budget for the entry point (no network needed).
+Importing main must stay cheap: heavy dependencies (langchain, apscheduler)
+and config.yaml are only loaded when a cycle actually needs them.
+
+Measured with `python -X importtime` on `import main` — the same imports
+as `python -X importtime src/main.py`, without running a live cycle.
+Override the budget with IMPORT_TIME_BUDGET_MS (e.g. on slow CI runners).
+Run:  python tests/test_import_time.py
+"""
+import os
+import sys
+import subprocess
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1000"))
+
+# Modules that must not be loaded just by importing main
+LAZY_MODULES = ["langchain_core", "langchain_google_genai", "apscheduler", "yaml"]
+
+
+def _run_python(*args):
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=SRC_DIR, capture_output=True, text=True, check=True,
+    )
+
+
+def _import_time_ms():
+    """Cumulative import time of `main` in ms, parsed from -X importtime output."""
+    result = _run_python("-X", "importtime", "-c", "import main")
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == "main" and parts[2].startswith(" main"):
+            return int(parts[1]) / 1000.0
+    raise AssertionError("main not found in -X importtime output")
+
+
+def test_main_import_time_budget():
+    print("=" * 60)
+    print("TEST: python -X importtime (import main)")
+    print("=" * 60)
+
+    # Best of 3 — the first run also pays for .pyc compilation
+    elapsed_ms = min(_import_time_ms() for _ in range(3))
+
+    assert elapsed_ms <= IMPORT_TIME_BUDGET_MS, \
+        f"Importing main took {elapsed_ms:.0f}ms (budget {IMPORT_TIME_BUDGET_MS:.0f}ms)"
+
+    print(f"  PASSED - {elapsed_ms:.0f}ms (budget {IMPORT_TIME_BUDGET_MS:.0f}ms)")
+    print()
+
+
+def test_heavy_dependencies_are_lazy():
+    print("=" * 60)
+    print("TEST: heavy dependencies are not imported by main")
+    print("=" * 60)
+
+    result = _run_python("-c", (
+        "import sys, main; "
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    ))
+    loaded = [m for m in result.stdout.strip().split(",") if m]
+
+    assert not loaded, f"Imported eagerly by main: {loaded}"
+
+    print(f"  PASSED - none of {LAZY_MODULES} loaded at import")
+    print()
+
+
+if __name__ == "__main__":
+    test_main_import_time_budget()
+    test_heavy_dependencies_are_lazy()
+    print("ALL IMPORT TIME TESTS PASSED!")
@@ -0,0 +1,213 @@
+"""
+Offline tests for the irrigation feed ingest (GitHub feed faked, temp files).
+Run:  python tests/test_irrigation.py
+"""
+import io
+import os
+import sys
+import json
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+import requests
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import collectors.irrigation_api as irrigation_api
+import utils.timeseries as timeseries
+from collectors.irrigation_api import FEED_TIMEZONE, IrrigationCollector
+
+
+class _FakeFeedResponse:
+    """Stands in for a streamed requests.Response of the GitHub feed."""
+
+    def __init__(self, body=None, status_code=200, etag=None):
+        self.status_code = status_code
+        self.headers = {"ETag": etag} if etag else {}
+        self.raw = io.BytesIO(json.dumps(body or {}).encode("utf-8"))
+
+    def raise_for_status(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.raw.close()
+
+
+class _FakeGitHub:
+    """Serves the feed, answering 304 when If-None-Match matches its ETag."""
+
+    def __init__(self):
+        self.feed, self.etag = {}, None
+        self.requests = []
+
+    def get(self, url, endpoint=None, headers=None, stream=False, **kwargs):
+        self.requests.append(dict(headers or {}))
+        if self.etag and (headers or {}).get("If-None-Match") == self.etag:
+            return _FakeFeedResponse(status_code=304)
+        return _FakeFeedResponse({"event_data": self.feed}, etag=self.etag)
+
+
+class _FakeArcGIS:
+    """Serves gauge thresholds; raises like an unreachable server when `down`."""
+
+    def __init__(self):
+        self.alert_level = 4.0
+        self.down = False
+        self.calls = 0
+
+    def get(self, url, endpoint=None, params=None, **kwargs):
+        self.calls += 1
+        if self.down:
+            raise requests.ConnectionError("ArcGIS unreachable")
+        response = _FakeFeedResponse()
+        features = [{"attributes": {"basin": "Kelani Ganga", "gauge": "Hanwella",
+                                    "alertpull": self.alert_level, "minorpull": 5.0,
+                                    "majorpull": 6.0}}]
+        response.json = lambda: {"features": features}
+        return response
+
+
+def _reading_times(hours_ago):
+    """Feed (date, time) strings for readings some hours before now, Sri Lanka time."""
+    now = datetime.now(FEED_TIMEZONE).replace(minute=0, second=0, microsecond=0)
+    return [((now - timedelta(hours=h)).strftime("%Y%m%d"),
+             (now - timedelta(hours=h)).strftime("%H%M%S")) for h in hours_ago]
+
+
+def _feed(levels_by_hours_ago):
+    """{date: {time: level}} for one station."""
+    dates = {}
+    for (date_str, time_str), level in zip(_reading_times(levels_by_hours_ago),
+                                           levels_by_hours_ago.values()):
+        dates.setdefault(date_str, {})[time_str] = level
+    return dates
+
+
+def _collector(monkeypatch, github):
+    directory = tempfile.mkdtemp()
+    monkeypatch.setattr(irrigation_api, "FEED_STATE_FILE", os.path.join(directory, "feed.json"))
+    monkeypatch.setattr(timeseries, "DB_FILE", os.path.join(directory, "timeseries.db"))
+    monkeypatch.setattr(irrigation_api.http, "get", github.get)
+    monkeypatch.setitem(irrigation_api.settings.irrigation_config, "history_readings", 3)
+    return IrrigationCollector()
+
+
+def test_newest_readings_watermark_and_unpadded_times():
+    print("=" * 60)
+    print("TEST: _newest_readings() watermark, history size, unpadded times")
+    print("=" * 60)
+
+    collector = IrrigationCollector()
+    collector.history_readings = 3
+    kept = [("20260219060000", 1.0), ("20260219080000", 1.2)]
+    dates = {"20260219": {
+        "070000": 9.9,          # older than the watermark: already seen
+        "93000": 1.5,           # unpadded 09:30:00
+        "103000.000": 1.7,
+        "113000": "n/a",        # unreadable level
+        "250000": 2.0,          # impossible time
+    }}
+
+    newest, unstored = collector._newest_readings(dates, kept, stored_key="20260219093000")
+    assert newest == [("20260219080000", 1.2), ("20260219093000", 1.5), ("20260219103000", 1.7)], newest
+    assert unstored == [("20260219103000", 1.7)], "Only readings past the store's newest are unstored"
+
+    print(f"  PASSED - {len(newest)} newest readings kept, unpadded time normalised")
+    print()
+
+
+def test_feed_304_and_partial_feed(monkeypatch):
+    print("=" * 60)
+    print("TEST: _fetch_feed_readings() conditional request and partial feeds")
+    print("=" * 60)
+
+    github = _FakeGitHub()
+    collector = _collector(monkeypatch, github)
+    github.feed = {"Hanwella": _feed({4: 1.0, 3: 1.1, 2: 1.2, 1: 1.3}),
+                   "Glencourse": _feed({2: 5.0, 1: 5.1})}
+    github.etag = '"v1"'
+
+    first = collector._fetch_feed_readings()
+    assert [level for _, level in first["Hanwella"]] == [1.1, 1.2, 1.3], "Newest 3 readings expected"
+    assert len(timeseries.query("Hanwella", "level_m")) == 4, "Full history goes to the store"
+
+    # Unchanged feed: 304, nothing parsed, the last ingest is reused
+    assert collector._fetch_feed_readings() == first
+    assert github.requests[-1].get("If-None-Match") == '"v1"'
+
+    # A partial feed (only the latest reading) merges
+    # with the readings kept from the previous ingest
+    github.feed = {"Hanwella": _feed({0: 1.4})}
+    github.etag = '"v2"'
+    partial = collector._fetch_feed_readings()
+    assert [level for _, level in partial["Hanwella"]] == [1.2, 1.3, 1.4]
+    assert len(timeseries.query("Hanwella", "level_m")) == 5
+
+    print(f"  PASSED - 304 reused {len(first)} stations, partial feed merged")
+    print()
+
+
+def test_arcgis_metadata_ttl_cache(monkeypatch):
+    print("=" * 60)
+    print("TEST: get_arcgis_metadata() TTL cache, refresh and stale fallback")
+    print("=" * 60)
+
+    arcgis = _FakeArcGIS()
+    cache_file = os.path.join(tempfile.mkdtemp(), "arcgis_metadata.json")
+    monkeypatch.setattr(irrigation_api, "METADATA_CACHE_FILE", cache_file)
+    monkeypatch.setattr(irrigation_api.http, "get", arcgis.get)
+    collector = IrrigationCollector()
+
+    def age_cache(hours):
+        with open(cache_file) as f:
+            cached = json.load(f)
+        cached["fetched_at"] -= hours * 3600
+        with open(cache_file, "w") as f:
+            json.dump(cached, f)
+
+    def refresh_finished():
+        if collector._refresh_thread is not None:
+            collector._refresh_thread.join(timeout=5)
+
+    # No cache: fetched synchronously
+    assert collector.get_arcgis_metadata()["Hanwella"]["alert_level"] == 4.0
+    assert arcgis.calls == 1
+
+    # Fresh cache: served without a request
+    arcgis.alert_level = 4.5
+    assert collector.get_arcgis_metadata()["Hanwella"]["alert_level"] == 4.0
+    assert arcgis.calls == 1, "Fresh cache must not call ArcGIS"
+
+    # Expired: the old thresholds are served now, the refresh lands for the next run
+    age_cache(collector.metadata_ttl / 3600 + 1)
+    assert collector.get_arcgis_metadata()["Hanwella"]["alert_level"] == 4.0
+    refresh_finished()
+    assert arcgis.calls == 2
+    assert collector.get_arcgis_metadata()["Hanwella"]["alert_level"] == 4.5
+
+    # Expired and ArcGIS down: the last known thresholds keep being served
+    age_cache(collector.metadata_ttl / 3600 + 1)
+    arcgis.down = True
+    assert collector.get_arcgis_metadata()["Hanwella"]["alert_level"] == 4.5
+    refresh_finished()
+    assert arcgis.calls == 3
+    assert collector.get_arcgis_metadata()["Hanwella"]["alert_level"] == 4.5, \
+        "A failed refresh must keep the stale thresholds"
+    refresh_finished()      # that lookup started another refresh
+
+    print("  PASSED - fresh hit, background refresh, stale thresholds while ArcGIS is down")
+    print()
+
+
+if __name__ == "__main__":
+    test_newest_readings_watermark_and_unpadded_times()
+    with pytest.MonkeyPatch.context() as mp:
+        test_feed_304_and_partial_feed(mp)
+    with pytest.MonkeyPatch.context() as mp:
+        test_arcgis_metadata_ttl_cache(mp)
+    print("ALL IRRIGATION TESTS PASSED!")
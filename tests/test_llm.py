@@ -0,0 +1,519 @@
+"""
+Offline tests for the alert generation layer (no Gemini calls).
+Run:  python tests/test_llm.py
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import utils.llm_cache as llm_cache
+import utils.quota as quota
+import agents.llm as llm
+from agents.llm_client import CircuitBreaker, CircuitOpenError, ResilientLLMClient
+from utils.alert_state import _diff_zones
+
+SAMPLE_FLOODS = [
+    {
+        "station": "Hanwella",
+        "river_basin": "Kelani Ganga",
+        "level_m": 4.51,
+        "rate_of_rise": 0.35,
+        "rain_1h_mm": 18.0,
+        "risk_level": "WARNING",
+        "risk_score": 55,
+    }
+]
+SAMPLE_LANDSLIDES = [
+    {
+        "station": "Aranayake",
+        "rain_1h_mm": 32.0,
+        "humidity": 96,
+        "wind_speed_ms": 8.5,
+        "risk_level": "CRITICAL",
+        "risk_score": 78,
+    }
+]
+
+
+class _FakeLLM:
+    """Stands in for the Gemini client and counts calls."""
+
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+        self.last_prompt = None
+
+    def invoke(self, messages):
+        self.calls += 1
+        self.last_prompt = messages[-1].content
+        time.sleep(self.delay)
+        return type("Response", (), {"content": f"alert #{self.calls}"})()
+
+
+def _use_temp_cache():
+    llm_cache.CACHE_FILE = os.path.join(tempfile.mkdtemp(), "llm_cache.json")
+
+
+def test_llm_cache_reuses_identical_inputs():
+    print("=" * 60)
+    print("TEST: generate_llm_response() cache")
+    print("=" * 60)
+
+    _use_temp_cache()
+    fake = _FakeLLM()
+    llm._get_llm = lambda *args: fake
+
+    first = llm.generate_llm_response(SAMPLE_FLOODS, SAMPLE_LANDSLIDES)
+    # Same warnings, sensor noise below the rounding precision
+    noisy = [dict(SAMPLE_FLOODS[0], level_m=4.53)]
+    second = llm.generate_llm_response(noisy, SAMPLE_LANDSLIDES)
+    # A real change in readings
+    risen = [dict(SAMPLE_FLOODS[0], level_m=4.9)]
+    third = llm.generate_llm_response(risen, SAMPLE_LANDSLIDES)
+
+    assert first == second == "alert #1", "Identical inputs should hit the cache"
+    assert third == "alert #2", "Changed readings should miss the cache"
+    assert fake.calls == 2, f"Expected 2 Gemini calls, got {fake.calls}"
+
+    print(f"  PASSED - 3 requests, {fake.calls} Gemini calls")
+    print()
+
+
+def test_llm_cache_misses_changed_projection():
+    print("=" * 60)
+    print("TEST: LLM cache key follows projections and risk score")
+    print("=" * 60)
+
+    _use_temp_cache()
+    fake = _FakeLLM()
+    llm._get_llm = lambda *args: fake
+
+    projected = [dict(SAMPLE_FLOODS[0], hours_to_major=2.1)]
+    assert llm.generate_llm_response(projected, []) == "alert #1"
+    # Within the 0.5h rounding: same bulletin
+    assert llm.generate_llm_response([dict(projected[0], hours_to_major=2.2)], []) == "alert #1"
+    # The projection moved or went away, or the score changed: new bulletin
+    assert llm.generate_llm_response([dict(projected[0], hours_to_major=5.0)], []) == "alert #2"
+    assert llm.generate_llm_response(SAMPLE_FLOODS, []) == "alert #3"
+    assert llm.generate_llm_response([dict(SAMPLE_FLOODS[0], risk_score=60)], []) == "alert #4"
+
+    print(f"  PASSED - {fake.calls} Gemini calls for 5 requests")
+    print()
+
+
+def test_landslide_antecedent_rain_in_prompt_and_key():
+    print("=" * 60)
+    print("TEST: antecedent rainfall in the landslide prompt and cache key")
+    print("=" * 60)
+
+    unknown = dict(SAMPLE_LANDSLIDES[0], rain_24h_mm=None, rain_72h_mm=None)
+    line = llm._landslide_line(unknown)
+    assert "Rain 24h: N/A | Rain 72h: N/A" in line, line
+    assert "None" not in line
+
+    known = dict(SAMPLE_LANDSLIDES[0], rain_24h_mm=80.0, rain_72h_mm=150.0)
+    assert "Rain 24h: 80.0mm | Rain 72h: 150.0mm" in llm._landslide_line(known)
+    wetter = dict(known, rain_72h_mm=240.0)
+    assert llm._alert_cache_key([], [known]) != llm._alert_cache_key([], [wetter]), \
+        "A different 72h total must not reuse the cached bulletin"
+
+    print("  PASSED - N/A for missing totals, 72h total in the cache key")
+    print()
+
+
+def test_llm_cache_lru_eviction(monkeypatch):
+    print("=" * 60)
+    print("TEST: LLM cache LRU eviction")
+    print("=" * 60)
+
+    _use_temp_cache()
+    monkeypatch.setitem(llm_cache.settings.llm_cache_config, "max_entries", 2)
+    llm_cache.store_alert("a", "A")
+    llm_cache.store_alert("b", "B")
+    llm_cache.get_cached_alert("a")          # "a" is now most recently used
+    llm_cache.store_alert("c", "C")          # evicts "b"
+
+    assert llm_cache.get_cached_alert("a") == "A"
+    assert llm_cache.get_cached_alert("b") is None
+    assert llm_cache.get_cached_alert("c") == "C"
+
+    print("  PASSED - least recently used entry evicted")
+    print()
+
+
+def test_llm_cache_concurrent_writers():
+    print("=" * 60)
+    print("TEST: LLM cache concurrent store / lookup")
+    print("=" * 60)
+
+    _use_temp_cache()
+
+    def worker(i):
+        llm_cache.store_alert(f"key{i}", f"text {i}")
+        llm_cache.get_cached_alert(f"key{i}")
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    missing = [i for i in range(20) if llm_cache.get_cached_alert(f"key{i}") != f"text {i}"]
+    assert not missing, f"Entries lost to concurrent writes: {missing}"
+
+    print("  PASSED - 20 threads, no entries lost")
+    print()
+
+
+def test_template_alert_format():
+    print("=" * 60)
+    print("TEST: render_template_alert()")
+    print("=" * 60)
+
+    alert = llm.render_template_alert(SAMPLE_FLOODS, SAMPLE_LANDSLIDES)
+
+    # Two blocks, each closed by its own disclaimer, English first
+    english_at = alert.index(llm.ENGLISH_DISCLAIMER)
+    sinhala_at = alert.index(llm.SINHALA_DISCLAIMER)
+    assert english_at < sinhala_at, "English block must come first"
+    assert alert.endswith(llm.SINHALA_DISCLAIMER)
+
+    english, sinhala = alert[:english_at], alert[english_at:sinhala_at]
+    assert "A WARNING level flood alert HAS BEEN ISSUED for Hanwella" in english
+    assert "A CRITICAL level landslide alert HAS BEEN ISSUED for Aranayake" in english
+    assert "4.51m" in english and "4.51m" in sinhala
+    assert "ජීවිත ආරක්ෂාව" in sinhala, "CRITICAL must use the life-threatening Sinhala tone"
+
+    # WATCH stays advisory in Sinhala
+    watch = llm.render_template_alert([dict(SAMPLE_FLOODS[0], risk_level="WATCH")], [])
+    assert "අවධානයෙන් සිටින්න" in watch and "නිකුත් කර ඇත" not in watch
+
+    print("  PASSED - two-block bilingual template with disclaimers")
+    print()
+
+
+def test_fast_path_for_critical_and_slow_gemini(monkeypatch):
+    print("=" * 60)
+    print("TEST: generate_alert() template fast path")
+    print("=" * 60)
+
+    _use_temp_cache()
+    monkeypatch.setitem(llm.settings.gemini_config, "latency_budget_seconds", 0.2)
+    # CRITICAL: template immediately, Gemini text follows
+    llm._get_llm = lambda *args: _FakeLLM(delay=0.5)
+    start = time.perf_counter()
+    alert, follow_up = llm.generate_alert(SAMPLE_FLOODS, SAMPLE_LANDSLIDES)
+    assert time.perf_counter() - start < 0.2, "CRITICAL alert waited on Gemini"
+    assert alert == llm.render_template_alert(SAMPLE_FLOODS, SAMPLE_LANDSLIDES)
+    assert follow_up.label == llm.UPDATE_LABEL
+    assert follow_up.future.result(timeout=5) == "alert #1"
+
+    # Non-critical, Gemini slower than the budget: template, then update
+    _use_temp_cache()
+    alert, follow_up = llm.generate_alert(SAMPLE_FLOODS, [])
+    assert alert == llm.render_template_alert(SAMPLE_FLOODS, [])
+    assert follow_up.future.result(timeout=5) == "alert #1"
+
+    # Non-critical, Gemini within budget: LLM text, no follow-up
+    _use_temp_cache()
+    llm._get_llm = lambda *args: _FakeLLM()
+    alert, follow_up = llm.generate_alert(SAMPLE_FLOODS, [])
+    assert alert == "alert #1" and follow_up is None
+
+    print("  PASSED - template sent first for CRITICAL and slow Gemini")
+    print()
+
+
+def test_delta_prompt_only_sends_changes():
+    print("=" * 60)
+    print("TEST: delta prompt for changed zones only")
+    print("=" * 60)
+
+    _use_temp_cache()
+    fake = _FakeLLM()
+    llm._get_llm = lambda *args: fake
+
+    steady = dict(SAMPLE_FLOODS[0], station="Glencourse", risk_level="WATCH")
+    previous = [steady, dict(SAMPLE_FLOODS[0], risk_level="WATCH"),
+                dict(SAMPLE_FLOODS[0], station="Nagalagam Street")]
+    current = [steady, SAMPLE_FLOODS[0]]     # Hanwella WATCH -> WARNING, Nagalagam cleared
+    delta = {"flood": _diff_zones(current, previous),
+             "landslide": _diff_zones(SAMPLE_LANDSLIDES, SAMPLE_LANDSLIDES)}
+
+    llm.generate_llm_response(current, SAMPLE_LANDSLIDES, delta=delta)
+    prompt = fake.last_prompt
+
+    assert "SHORT UPDATE" in prompt
+    assert "ESCALATED (WATCH -> WARNING): Station: Hanwella" in prompt
+    assert "CLEARED: Nagalagam Street" in prompt
+    assert "Glencourse" not in prompt and "Aranayake" not in prompt, \
+        "Unchanged zones must not be sent"
+    assert "Other zones still active and unchanged: 2" in prompt
+
+    # No previous state -> full bulletin
+    _use_temp_cache()
+    llm.generate_llm_response(current, SAMPLE_LANDSLIDES, delta=None)
+    assert "Glencourse" in fake.last_prompt and "SHORT UPDATE" not in fake.last_prompt
+
+    print("  PASSED - only added / escalated / de-escalated / cleared zones sent")
+    print()
+
+
+class _LanguageLLM:
+    """Answers per-language prompts, with a separate delay for each language."""
+
+    def __init__(self, english_delay=0.0, sinhala_delay=0.0, failing=()):
+        self.delays = {"en": english_delay, "si": sinhala_delay}
+        self.failing = failing
+        self.languages = []
+
+    def invoke(self, messages):
+        prompt = messages[-1].content
+        language = "en" if llm.LANGUAGE_INSTRUCTION["en"] in prompt else "si"
+        assert llm.LANGUAGE_INSTRUCTION[language] in prompt, "Expected a single-language prompt"
+        self.languages.append(language)
+        time.sleep(self.delays[language])
+        if language in self.failing:
+            raise RuntimeError("503")
+        return type("Response", (), {"content": f"{language} block\n"})()
+
+
+def test_parallel_language_blocks(monkeypatch):
+    print("=" * 60)
+    print("TEST: parallel English / Sinhala generation")
+    print("=" * 60)
+
+    _use_temp_cache()
+    monkeypatch.setitem(llm.settings.gemini_config, "parallel_languages", True)
+    monkeypatch.setitem(llm.settings.gemini_config, "latency_budget_seconds", 2)
+    # Both blocks requested concurrently, joined in the two-block format
+    fake = _LanguageLLM(english_delay=0.3, sinhala_delay=0.3)
+    llm._get_llm = lambda *args: fake
+    start = time.perf_counter()
+    alert = llm.generate_llm_response(SAMPLE_FLOODS, [])
+    assert time.perf_counter() - start < 0.5, "Language blocks were not generated concurrently"
+    assert alert == "en block\n\nsi block"
+    assert sorted(fake.languages) == ["en", "si"]
+
+    # English goes out as soon as it is ready, Sinhala follows
+    _use_temp_cache()
+    fake = _LanguageLLM(english_delay=0, sinhala_delay=0.5)
+    llm._get_llm = lambda *args: fake
+    start = time.perf_counter()
+    alert, follow_up = llm.generate_alert(SAMPLE_FLOODS, [])
+    assert time.perf_counter() - start < 0.3, "English block waited on Sinhala"
+    assert alert == "en block\n" and follow_up.label == llm.SINHALA_LABEL
+    assert follow_up.future.result(timeout=5) == "si block\n"
+
+    # Sinhala failure falls back to the Sinhala template block
+    _use_temp_cache()
+    llm._get_llm = lambda *args: _LanguageLLM(failing=("si",))
+    alert, follow_up = llm.generate_alert(SAMPLE_FLOODS, [])
+    assert alert == "en block\n"
+    assert follow_up.future.result(timeout=5) == \
+        llm.render_template_block(SAMPLE_FLOODS, [], "si")
+
+    print("  PASSED - English sent first, Sinhala block follows")
+    print()
+
+
+class _StreamingLLM:
+    """Streams a fixed text in chunks, optionally failing after fail_after chunks."""
+
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def stream(self, messages):
+        self.calls += 1
+        for i, text in enumerate(self.chunks):
+            if i == self.fail_after:
+                raise RuntimeError("stream dropped")
+            yield type("Chunk", (), {"content": text})()
+
+
+def test_stream_alert():
+    print("=" * 60)
+    print("TEST: stream_alert() progressive output")
+    print("=" * 60)
+
+    _use_temp_cache()
+    fake = _StreamingLLM(["Flood ", "WARNING ", "at Hanwella"])
+    llm._get_llm = lambda *args: fake
+
+    # Chunks come through one by one, then the full text is cached
+    assert list(llm.stream_alert(SAMPLE_FLOODS, [])) == ["Flood ", "WARNING ", "at Hanwella"]
+    assert list(llm.stream_alert(SAMPLE_FLOODS, [])) == ["Flood WARNING at Hanwella"]
+    assert fake.calls == 1, "Second stream should be served from the cache"
+
+    # Failure part-way: the template is appended so no zone is lost
+    _use_temp_cache()
+    llm._get_llm = lambda *args: _StreamingLLM(["Flood ", "WARNING "], fail_after=1)
+    streamed = "".join(llm.stream_alert(SAMPLE_FLOODS, []))
+    assert streamed.startswith("Flood ")
+    assert streamed.endswith(llm.render_template_alert(SAMPLE_FLOODS, []))
+
+    # A stream that breaks before the first chunk is retried by the resilient client
+    broken = _StreamingLLM(["ok"], fail_after=0)
+    client = ResilientLLMClient(broken, retry_backoff_seconds=0.01, circuit_breaker=CircuitBreaker())
+    try:
+        list(client.stream([]))
+    except RuntimeError:
+        pass
+    assert broken.calls == 3, f"Expected 3 stream attempts, got {broken.calls}"
+
+    print("  PASSED - chunks streamed, cached, template on failure")
+    print()
+
+
+class _ScriptedLLM:
+    """Plays back a script of per-call delays / errors."""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = 0
+
+    def invoke(self, messages):
+        delay, error = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        time.sleep(delay)
+        if error:
+            raise error
+        return f"ok after {self.calls} calls"
+
+
+def test_resilient_client_deadline_retry_hedge():
+    print("=" * 60)
+    print("TEST: ResilientLLMClient deadline / retry / hedging")
+    print("=" * 60)
+
+    # Transient errors are retried
+    flaky = _ScriptedLLM([(0, RuntimeError("503")), (0, RuntimeError("503")), (0, None)])
+    client = ResilientLLMClient(flaky, timeout_seconds=5, max_retries=2,
+                                retry_backoff_seconds=0.01, circuit_breaker=CircuitBreaker())
+    assert client.invoke([]) == "ok after 3 calls"
+
+    # A hung API never holds the caller past the deadline
+    hung = _ScriptedLLM([(2, None)])
+    client = ResilientLLMClient(hung, timeout_seconds=0.3, max_retries=2,
+                                retry_backoff_seconds=0.01, circuit_breaker=CircuitBreaker())
+    start = time.perf_counter()
+    try:
+        client.invoke([])
+        raise AssertionError("Expected a timeout")
+    except TimeoutError:
+        pass
+    assert time.perf_counter() - start < 0.5, "Deadline not enforced"
+
+    # A slow first request is hedged by a fast second one
+    slow_then_fast = _ScriptedLLM([(1.0, None), (0, None)])
+    client = ResilientLLMClient(slow_then_fast, timeout_seconds=5, hedge_after_seconds=0.1,
+                                circuit_breaker=CircuitBreaker())
+    start = time.perf_counter()
+    assert client.invoke([]) == "ok after 2 calls"
+    assert time.perf_counter() - start < 0.5, "Hedged request did not win"
+
+    print("  PASSED - retries, deadline and hedging behave")
+    print()
+
+
+def test_resilient_client_takes_quota_per_attempt():
+    print("=" * 60)
+    print("TEST: ResilientLLMClient takes quota for every request sent")
+    print("=" * 60)
+
+    takes = []
+
+    def take_quota(messages, max_wait=None):
+        takes.append(max_wait)
+        return max_wait is None     # Waiting works, nothing left right now
+
+    # Each retry is a request of its own
+    flaky = _ScriptedLLM([(0, RuntimeError("503")), (0, RuntimeError("503")), (0, None)])
+    client = ResilientLLMClient(flaky, timeout_seconds=5, max_retries=2, retry_backoff_seconds=0.01,
+                                circuit_breaker=CircuitBreaker(), take_quota=take_quota)
+    assert client.invoke([]) == "ok after 3 calls"
+    assert takes == [None, None, None], f"Expected one take per attempt, got {takes}"
+
+    # No quota left for the hedge: the slow request is awaited instead
+    takes.clear()
+    slow_then_fast = _ScriptedLLM([(0.3, None), (0, None)])
+    client = ResilientLLMClient(slow_then_fast, timeout_seconds=5, hedge_after_seconds=0.1,
+                                circuit_breaker=CircuitBreaker(), take_quota=take_quota)
+    assert client.invoke([]) == "ok after 1 calls"
+    assert takes == [None, 0] and slow_then_fast.calls == 1, "Hedge must be skipped without quota"
+
+    # Exhausted quota fails without calling the API or tripping the breaker
+    breaker = CircuitBreaker()
+    client = ResilientLLMClient(flaky, circuit_breaker=breaker,
+                                take_quota=lambda messages, max_wait=None: False)
+    calls_before = flaky.calls
+    try:
+        client.invoke([])
+        raise AssertionError("Expected QuotaExhaustedError")
+    except quota.QuotaExhaustedError:
+        pass
+    assert flaky.calls == calls_before and breaker.failures == 0
+
+    print("  PASSED - quota per retry, hedge skipped when exhausted")
+    print()
+
+
+def test_circuit_breaker_fails_fast():
+    print("=" * 60)
+    print("TEST: circuit breaker opens and fails fast")
+    print("=" * 60)
+
+    down = _ScriptedLLM([(0, RuntimeError("500"))])
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    client = ResilientLLMClient(down, timeout_seconds=1, max_retries=0, circuit_breaker=breaker)
+
+    for _ in range(2):
+        try:
+            client.invoke([])
+        except RuntimeError:
+            pass
+    calls_before = down.calls
+    try:
+        client.invoke([])
+        raise AssertionError("Expected CircuitOpenError")
+    except CircuitOpenError:
+        pass
+    assert down.calls == calls_before, "Open circuit must not call the API"
+
+    # After reset_seconds one trial call goes through and closes the circuit
+    breaker.opened_at -= 60
+    down.script = [(0, None)]
+    assert client.invoke([]).startswith("ok")
+    assert breaker.opened_at is None and breaker.failures == 0
+
+    print("  PASSED - open circuit skips the API, closes after a good trial call")
+    print()
+
+
+if __name__ == "__main__":
+    test_llm_cache_reuses_identical_inputs()
+    test_llm_cache_misses_changed_projection()
+    test_landslide_antecedent_rain_in_prompt_and_key()
+    with pytest.MonkeyPatch.context() as mp:
+        test_llm_cache_lru_eviction(mp)
+    test_llm_cache_concurrent_writers()
+    test_template_alert_format()
+    with pytest.MonkeyPatch.context() as mp:
+        test_fast_path_for_critical_and_slow_gemini(mp)
+    test_delta_prompt_only_sends_changes()
+    with pytest.MonkeyPatch.context() as mp:
+        test_parallel_language_blocks(mp)
+    test_stream_alert()
+    test_resilient_client_deadline_retry_hedge()
+    test_resilient_client_takes_quota_per_attempt()
+    test_circuit_breaker_fails_fast()
+    print("ALL LLM TESTS PASSED!")
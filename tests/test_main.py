@@ -0,0 +1,161 @@
+"""
+Offline tests for the entry point's daemon mode (scheduler, agent and HTTP faked).
+Run:  python tests/test_main.py
+"""
+import os
+import sys
+import types
+import signal
+import tempfile
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import main
+import utils.outbox as outbox
+from utils import http
+
+
+class _FakeScheduler:
+    """Stands in for APScheduler's BlockingScheduler: start() runs `cycles` jobs."""
+
+    cycles = 3
+    instance = None
+
+    def __init__(self):
+        self.jobs = []
+        self.shut_down = None
+        _FakeScheduler.instance = self
+
+    def add_job(self, func, **options):
+        self.jobs.append((func, options))
+
+    def start(self):
+        for _ in range(self.cycles):
+            for func, _ in self.jobs:
+                func()
+
+    def shutdown(self, wait=True):
+        self.shut_down = wait
+
+
+class _FakeResponse:
+    status_code = 200
+    headers = {}
+    content = b"{}"
+
+
+class _FakeSession:
+    """Stands in for the pooled requests.Session in utils/http.py."""
+
+    def __init__(self):
+        self.requests = []
+
+    def request(self, method, url, **kwargs):
+        self.requests.append((method, url))
+        return _FakeResponse()
+
+
+class _FakeAgent:
+    """MonitorAgent stand-in: one OWM-style request per cycle, no alert."""
+
+    created = 0
+
+    def __init__(self):
+        _FakeAgent.created += 1
+
+    def generate_report(self):
+        http.get("https://api.openweathermap.org/data/2.5/weather", "owm")
+        return None
+
+
+class _QueueingAgent:
+    """Records the chats queue_alert() is told already have the message."""
+
+    def __init__(self):
+        self.queued = []
+
+    def queue_alert(self, message, label=None, delivered_chats=()):
+        self.queued.append((message, list(delivered_chats)))
+
+
+def test_partial_stream_not_resent_to_main_chat(monkeypatch):
+    print("=" * 60)
+    print("TEST: _stream_with_timestamp() after a partial post to the main chat")
+    print("=" * 60)
+
+    def partial_post(chunks, prefix="", message_ids=None):
+        for _ in chunks:
+            pass
+        message_ids.append(1)       # first part posted, closing edit failed
+        return False
+
+    def nothing_posted(chunks, prefix="", message_ids=None):
+        for _ in chunks:
+            pass
+        return False
+
+    monkeypatch.setattr(main, "deliver_outbox", lambda: None)
+    monkeypatch.setattr(main.settings, "TELEGRAM_CHAT_ID", "main-chat")
+
+    agent = _QueueingAgent()
+    monkeypatch.setattr(main, "send_alert_streaming", partial_post)
+    assert not main._stream_with_timestamp(agent, iter(["Flood ", "warning"]))
+    (message, delivered), = agent.queued
+    assert message.endswith("Flood warning"), "The outbox gets the full text for routed chats"
+    assert delivered == ["main-chat"], "The main chat already has the (partial) message"
+
+    agent = _QueueingAgent()
+    monkeypatch.setattr(main, "send_alert_streaming", nothing_posted)
+    main._stream_with_timestamp(agent, iter(["Flood ", "warning"]))
+    assert agent.queued[0][1] == [], "Nothing posted: the main chat gets it from the outbox"
+
+    print("  PASSED - main chat left out of the outbox once a part is posted")
+    print()
+
+
+def test_daemon_schedules_warm_cycles(monkeypatch):
+    print("=" * 60)
+    print("TEST: run_daemon() schedule, warm agent and session, signal shutdown")
+    print("=" * 60)
+
+    session = _FakeSession()
+    handlers = {}
+    monkeypatch.setitem(sys.modules, "apscheduler.schedulers.blocking",
+                        types.SimpleNamespace(BlockingScheduler=_FakeScheduler))
+    monkeypatch.setattr(signal, "signal", lambda signum, handler: handlers.update({signum: handler}))
+    monkeypatch.setattr(http, "_session", session)
+    monkeypatch.setattr(http, "_metered_session", session)
+    monkeypatch.setattr(outbox, "DB_FILE", os.path.join(tempfile.mkdtemp(), "alerts.db"))
+    monkeypatch.setattr(main, "MonitorAgent", _FakeAgent)
+    monkeypatch.setattr(main, "_agent", None)
+    monkeypatch.setitem(main.settings.gemini_config, "streaming", False)
+    monkeypatch.setitem(main.settings.scheduler_config, "interval_minutes", 5)
+
+    main.run_daemon()
+
+    scheduler = _FakeScheduler.instance
+    (job, options), = scheduler.jobs
+    assert job is main.run_cycle
+    assert options["trigger"] == "interval" and options["minutes"] == 5
+    assert options["max_instances"] == 1 and options["coalesce"], "Cycles must never overlap"
+    assert _FakeAgent.created == 1, "The agent must stay warm between cycles"
+    assert len(session.requests) == 3, "Every cycle should reuse the pooled session"
+
+    # SIGTERM / SIGINT let the running cycle finish, then stop the scheduler
+    assert set(handlers) == {signal.SIGTERM, signal.SIGINT}
+    handlers[signal.SIGTERM](signal.SIGTERM, None)
+    assert scheduler.shut_down is True
+
+    print(f"  PASSED - {_FakeScheduler.cycles} cycles, 1 agent, 1 session")
+    print()
+
+
+if __name__ == "__main__":
+    with pytest.MonkeyPatch.context() as mp:
+        test_partial_stream_not_resent_to_main_chat(mp)
+    with pytest.MonkeyPatch.context() as mp:
+        test_daemon_schedules_warm_cycles(mp)
+    print("ALL MAIN TESTS PASSED!")
@@ -0,0 +1,259 @@
+"""
+Offline tests for Telegram delivery (Bot API calls are faked).
+Run:  python tests/test_notifiers.py
+"""
+import os
+import sys
+import time
+
+import requests
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import notifiers.telegram_bot as telegram_bot
+from notifiers.dispatcher import TelegramDispatcher, affected_areas
+
+
+class _FakeTelegram:
+    """Records Bot API calls in place of utils.http.post."""
+
+    def __init__(self, failing_edits=0):
+        self.calls = []
+        self.messages = {}
+        self.failing_edits = failing_edits
+
+    def post(self, url, endpoint=None, json=None, timeout=None):
+        method = url.rsplit("/", 1)[-1]
+        self.calls.append((method, time.monotonic(), dict(json)))
+        if method == "editMessageText" and self.failing_edits:
+            self.failing_edits -= 1
+            raise requests.ConnectionError("Telegram unreachable")
+        if method == "sendMessage":
+            message_id = len(self.messages) + 1
+        else:
+            message_id = json["message_id"]
+        self.messages[message_id] = json["text"]
+        return _FakeResponse({"ok": True, "result": {"message_id": message_id}})
+
+
+class _FakeResponse:
+    def __init__(self, body, status_code=200):
+        self.body = body
+        self.status_code = status_code
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        pass
+
+
+def _install_fake(failing_edits=0):
+    fake = _FakeTelegram(failing_edits)
+    telegram_bot.http.post = fake.post
+    telegram_bot.settings.TELEGRAM_TOKEN = "test-token"
+    telegram_bot.settings.TELEGRAM_CHAT_ID = "test-chat"
+    return fake
+
+
+def _slow_chunks(chunks, delay):
+    for chunk in chunks:
+        time.sleep(delay)
+        yield chunk
+
+
+def test_streamed_message_edited_in_place():
+    print("=" * 60)
+    print("TEST: send_alert_streaming() progressive edits")
+    print("=" * 60)
+
+    fake = _install_fake()
+    telegram_bot.settings.telegram_config["stream_edit_interval_seconds"] = 0.1
+
+    start = time.monotonic()
+    words = [f"word{i} " for i in range(20)]
+    ok = telegram_bot.send_alert_streaming(_slow_chunks(words, 0.02), prefix="header\n\n")
+
+    assert ok
+    first_method, first_at, _ = fake.calls[0]
+    assert first_method == "sendMessage" and first_at - start < 0.1, \
+        "First chunk should be posted immediately"
+    assert [c[0] for c in fake.calls].count("sendMessage") == 1
+    edits = [c[1] for c in fake.calls if c[0] == "editMessageText"]
+    assert all(b - a >= 0.08 for a, b in zip(edits, edits[1:-1])), "Edits not throttled"
+    assert len(edits) < len(words), "Every chunk caused an edit"
+    assert fake.messages[1].strip() == ("header\n\n" + "".join(words)).strip()
+
+    print(f"  PASSED - 1 message, {len(edits)} edits for {len(words)} chunks")
+    print()
+
+
+def test_streamed_message_split_past_limit():
+    print("=" * 60)
+    print("TEST: send_alert_streaming() 4096 character split")
+    print("=" * 60)
+
+    fake = _install_fake()
+    telegram_bot.settings.telegram_config["stream_edit_interval_seconds"] = 0
+
+    line = "x" * 99 + "\n"
+    text = line * 60                                   # 6000 characters
+    ok = telegram_bot.send_alert_streaming(line for _ in range(60))
+
+    assert ok
+    assert len(fake.messages) == 2, "Text past 4096 characters must continue in a new message"
+    assert all(len(t) <= 4096 for t in fake.messages.values())
+    # Telegram trims whitespace, so compare the visible text
+    sent = [t.strip() for t in fake.messages.values()]
+    assert sent == [t.strip() for t in telegram_bot._split_message(text, limit=4096)]
+
+    print("  PASSED - second message started at the limit")
+    print()
+
+
+def test_streamed_message_finished_by_edit():
+    print("=" * 60)
+    print("TEST: send_alert_streaming() retries the closing edit, never re-posts")
+    print("=" * 60)
+
+    config = telegram_bot.settings.telegram_config
+    saved = dict(config)
+    config["stream_edit_interval_seconds"] = 60     # first post, then only the closing edit
+    config["stream_final_attempts"] = 2
+    words = [f"word{i} " for i in range(5)]
+    try:
+        fake = _install_fake(failing_edits=1)
+        message_ids = []
+        assert telegram_bot.send_alert_streaming(iter(words), prefix="header\n\n", message_ids=message_ids)
+        assert [c[0] for c in fake.calls] == ["sendMessage", "editMessageText", "editMessageText"]
+        assert message_ids == [1] and len(fake.messages) == 1
+        assert fake.messages[1].strip() == ("header\n\n" + "".join(words)).strip()
+
+        # Every closing edit fails: the partial post is reported, not re-sent
+        fake = _install_fake(failing_edits=2)
+        message_ids = []
+        assert not telegram_bot.send_alert_streaming(iter(words), prefix="header\n\n", message_ids=message_ids)
+        assert message_ids == [1], "The caller must see that part of the alert was posted"
+        assert [c[0] for c in fake.calls].count("sendMessage") == 1
+    finally:
+        config.clear()
+        config.update(saved)
+
+    print("  PASSED - 1 message, completed by a retried edit")
+    print()
+
+
+class _FakeSession:
+    """Records sends per chat; answers 429 to the first send of throttled chats."""
+
+    def __init__(self, throttled=(), latency=0.01):
+        self.sends = {}
+        self.throttled = set(throttled)
+        self.latency = latency
+
+    def post(self, url, endpoint=None, json=None, timeout=None):
+        sent_at = time.monotonic()
+        time.sleep(self.latency)
+        chat_id = json["chat_id"]
+        if chat_id in self.throttled:
+            self.throttled.discard(chat_id)
+            return _FakeResponse({"ok": False, "parameters": {"retry_after": 0.2}}, status_code=429)
+        self.sends.setdefault(chat_id, []).append((sent_at, json["text"]))
+        return _FakeResponse({"ok": True, "result": {"message_id": 1}})
+
+
+def test_streaming_without_credentials_consumes_chunks():
+    print("=" * 60)
+    print("TEST: send_alert_streaming() without a bot token")
+    print("=" * 60)
+
+    fake = _install_fake()
+    telegram_bot.settings.TELEGRAM_TOKEN = ""
+    words = [f"word{i} " for i in range(5)]
+    seen = []
+
+    def tee():
+        for word in words:
+            seen.append(word)
+            yield word
+
+    assert not telegram_bot.send_alert_streaming(tee(), prefix="header\n\n")
+    assert seen == words, "Chunks must be consumed so the caller can queue the full text"
+    assert fake.calls == []
+
+    print("  PASSED - not sent, full text still collected")
+    print()
+
+
+def test_dispatcher_routes_by_district_and_basin():
+    print("=" * 60)
+    print("TEST: TelegramDispatcher recipients")
+    print("=" * 60)
+
+    _install_fake()
+    telegram_bot.settings.telegram_config["routes"] = {
+        "districts": {"Kegalle": ["-100kegalle"], "Badulla": ["-100badulla"]},
+        "basins": {"Kelani Ganga": ["-100kelani"]},
+        "subscribers": [{"chat_id": "42", "districts": ["Badulla"], "basins": ["Kelani Ganga"]}],
+    }
+    dispatcher = TelegramDispatcher()
+
+    floods = [{"station": "Hanwella", "river_basin": "Kelani Ganga", "risk_level": "WARNING"}]
+    landslides = [{"station": "Aranayake", "district": "Kegalle", "risk_level": "CRITICAL"}]
+    areas = affected_areas(floods, landslides)
+    assert areas == {"districts": ["Kegalle"], "basins": ["Kelani Ganga"]}
+    assert dispatcher.recipients(areas) == ["test-chat", "-100kegalle", "-100kelani", "42"]
+
+    # A zone that just cleared still notifies its district
+    delta = {"flood": {"cleared": []},
+             "landslide": {"cleared": [{"station": "Passara", "district": "Badulla",
+                                        "previous_level": "WATCH"}]}}
+    areas = affected_areas([], [], delta)
+    assert dispatcher.recipients(areas, include_main=False) == ["-100badulla", "42"]
+
+    print("  PASSED - main chat + district / basin / subscriber routes")
+    print()
+
+
+def test_dispatcher_rate_limits_and_429():
+    print("=" * 60)
+    print("TEST: TelegramDispatcher concurrency, rate limits, 429")
+    print("=" * 60)
+
+    _install_fake()
+    config = telegram_bot.settings.telegram_config
+    config.update({"messages_per_second": 200, "chat_messages_per_second": 10, "max_concurrency": 50})
+    chats = [f"chat{i}" for i in range(100)]
+    config["routes"] = {"districts": {"Kegalle": chats}}
+    dispatcher = TelegramDispatcher()
+    session = _FakeSession(throttled={"chat7"})
+    telegram_bot.http.post = session.post
+
+    message = "\n".join("x" * 99 for _ in range(60))    # 2 parts per chat
+    start = time.monotonic()
+    results = dispatcher.send(message, {"districts": ["Kegalle"]}, include_main=False)
+    elapsed = time.monotonic() - start
+
+    assert all(results.values()) and len(results) == 100
+    # 200 messages at 200/s (burst 200): far faster than sending one at a time
+    assert elapsed < 1.5, f"Dispatch took {elapsed:.2f}s"
+    for chat_id, sends in session.sends.items():
+        assert len(sends) == 2
+        # 0.1s apart, less thread start-up jitter
+        assert sends[1][0] - sends[0][0] >= 0.09, f"{chat_id} exceeded its per-chat rate"
+    retried = session.sends["chat7"]
+    assert retried[0][0] - start >= 0.2, "429 retry_after not respected"
+
+    print(f"  PASSED - 200 messages to 100 chats in {elapsed:.2f}s")
+    print()
+
+
+if __name__ == "__main__":
+    test_streamed_message_edited_in_place()
+    test_streamed_message_split_past_limit()
+    test_streamed_message_finished_by_edit()
+    test_streaming_without_credentials_consumes_chunks()
+    test_dispatcher_routes_by_district_and_basin()
+    test_dispatcher_rate_limits_and_429()
+    print("ALL NOTIFIER TESTS PASSED!")
@@ -0,0 +1,136 @@
+"""
+Offline tests for the alert outbox (temporary SQLite database, fake sender).
+Run:  python tests/test_outbox.py
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import utils.outbox as outbox
+
+
+class _FakeSender:
+    """Stands in for TelegramDispatcher.send; chats in `down` fail."""
+
+    def __init__(self, chats, down=()):
+        self.chats = chats
+        self.down = set(down)
+        self.sent = []
+
+    def send(self, message, areas=None, exclude=()):
+        results = {}
+        for chat in self.chats:
+            if chat in exclude:
+                continue
+            ok = chat not in self.down
+            if ok:
+                self.sent.append((chat, message))
+            results[chat] = ok
+        return results
+
+
+def _use_temp_db():
+    outbox.DB_FILE = os.path.join(tempfile.mkdtemp(), "alerts.db")
+
+
+def test_state_saved_only_after_delivery(monkeypatch):
+    print("=" * 60)
+    print("TEST: outbox at-least-once delivery")
+    print("=" * 60)
+
+    _use_temp_db()
+    monkeypatch.setitem(outbox.settings.outbox_config, "retry_backoff_seconds", 0)
+    saved = []
+    state = {"flood": [{"station": "Hanwella", "risk_level": "WARNING"}], "landslide": []}
+
+    assert outbox.enqueue("k1", "alert 1", {"basins": ["Kelani Ganga"]}, state)
+    assert not outbox.enqueue("k1", "alert 1", {"basins": ["Kelani Ganga"]}, state), \
+        "Same idempotency key must not be queued twice"
+    assert outbox.pending_state() == state
+
+    # Telegram down for one chat: nothing saved, reached chat not re-sent
+    sender = _FakeSender(["main", "kelani"], down={"kelani"})
+    assert outbox.drain(sender.send, on_delivered=lambda state, conn: saved.append(state)) == 0
+    assert saved == [] and outbox.pending_state() == state
+
+    sender.down.clear()
+    assert outbox.drain(sender.send, on_delivered=lambda state, conn: saved.append(state)) == 1
+    assert sender.sent == [("main", "alert 1"), ("kelani", "alert 1")], \
+        "Retry must only go to chats that missed the message"
+    assert saved == [state] and outbox.pending_state() is None
+
+    print("  PASSED - state saved on delivery, retries skip reached chats")
+    print()
+
+
+def test_drain_keeps_order_and_gives_up(monkeypatch):
+    print("=" * 60)
+    print("TEST: outbox ordering and max attempts")
+    print("=" * 60)
+
+    _use_temp_db()
+    monkeypatch.setitem(outbox.settings.outbox_config, "retry_backoff_seconds", 0)
+    monkeypatch.setitem(outbox.settings.outbox_config, "max_attempts", 2)
+
+    outbox.enqueue("a", "first", state={"flood": [], "landslide": []})
+    outbox.enqueue("b", "second")
+    sender = _FakeSender(["main"], down={"main"})
+
+    # A failing head message blocks later ones (no out-of-order alerts)
+    outbox.drain(sender.send)
+    assert sender.sent == []
+
+    # Second failure reaches max_attempts: "first" is dropped, "second" goes out
+    outbox.drain(sender.send)
+    sender.down.clear()
+    assert outbox.drain(sender.send) == 1
+    assert sender.sent == [("main", "second")]
+    assert outbox.pending_state() is None, "Given-up alerts no longer hold the state"
+
+    print("  PASSED - in-order delivery, failed alert given up after max_attempts")
+    print()
+
+
+def test_given_up_alert_requeued(monkeypatch):
+    print("=" * 60)
+    print("TEST: re-detected alert is queued again after being given up")
+    print("=" * 60)
+
+    _use_temp_db()
+    monkeypatch.setitem(outbox.settings.outbox_config, "retry_backoff_seconds", 0)
+    monkeypatch.setitem(outbox.settings.outbox_config, "max_attempts", 1)
+    state = {"flood": [{"station": "Hanwella", "risk_level": "WARNING"}], "landslide": []}
+
+    outbox.enqueue("k1", "alert 1", state=state)
+    sender = _FakeSender(["main"], down={"main"})
+    outbox.drain(sender.send)
+    assert outbox.pending_state() is None, "Alert should have been given up"
+
+    # The next cycle detects the same change and builds the same key
+    outbox.enqueue("k2", "newer alert")
+    assert outbox.enqueue("k1", "alert 1", state=state), "Given-up alert must be queued again"
+    assert not outbox.enqueue("k1", "alert 1", state=state)
+    assert outbox.pending_state() == state
+
+    saved = []
+    sender.down.clear()
+    assert outbox.drain(sender.send, on_delivered=lambda state, conn: saved.append(state)) == 2
+    assert sender.sent == [("main", "newer alert"), ("main", "alert 1")], \
+        "A requeued alert goes behind messages queued while it was failing"
+    assert saved == [state]
+
+    print("  PASSED - given-up alert requeued and delivered")
+    print()
+
+
+if __name__ == "__main__":
+    for test in (test_state_saved_only_after_delivery, test_drain_keeps_order_and_gives_up,
+                 test_given_up_alert_requeued):
+        with pytest.MonkeyPatch.context() as mp:
+            test(mp)
+    print("ALL OUTBOX TESTS PASSED!")
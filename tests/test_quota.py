@@ -0,0 +1,108 @@
+"""
+Offline tests for the API quota token buckets (temporary SQLite database).
+Run:  python tests/test_quota.py
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import utils.quota as quota
+import utils.weather_cache as weather_cache
+from collectors.weather_api import RainfallCollector
+from config import settings
+
+
+def _use_buckets(buckets):
+    quota.DB_FILE = os.path.join(tempfile.mkdtemp(), "quota.db")
+    settings.quota_config["enabled"] = True
+    settings.quota_config["buckets"] = buckets
+
+
+def test_bucket_refill_and_wait():
+    print("=" * 60)
+    print("TEST: burst, refill wait, max_wait and shared state")
+    print("=" * 60)
+
+    original = settings.quota_config.get("buckets")
+    _use_buckets({"api": {"per_minute": 600, "burst": 3},          # 10 per second
+                  "slow": {"per_day": 86400 / 60, "burst": 1}})    # 1 per minute
+    try:
+        start = time.monotonic()
+        for _ in range(4):
+            assert quota.acquire({"api": 1})
+        elapsed = time.monotonic() - start
+        assert 0.07 < elapsed < 0.5, f"4th call should wait ~0.1s for a refill, took {elapsed:.2f}s"
+
+        assert quota.acquire({"slow": 1})
+        start = time.monotonic()
+        assert not quota.acquire({"slow": 1}, max_wait=0.2), "A minute away: turned down"
+        assert time.monotonic() - start < 0.1, "Turned down without waiting out max_wait"
+        assert quota.acquire({"unlimited": 5}), "Unknown buckets are not limited"
+
+        # Another process sees the same budget through the database
+        assert quota.levels()["slow"] < 0.1
+        assert not quota._take({"slow": 1}, time.time()) == 0
+        assert quota._take({"slow": 1}, time.time() + 61) == 0
+    finally:
+        settings.quota_config["buckets"] = original
+
+    print("  PASSED - burst of 3, 4th waited for refill, long waits refused")
+    print()
+
+
+def test_priority_order():
+    print("=" * 60)
+    print("TEST: waiters are served highest priority first")
+    print("=" * 60)
+
+    original = settings.quota_config.get("buckets")
+    enabled = settings.quota_config.get("enabled", True)
+    _use_buckets({"api": {"per_minute": 600, "burst": 1}})
+    granted = []
+    try:
+        assert quota.acquire({"api": 1})                      # bucket now empty
+
+        def worker(name, priority):
+            quota.acquire({"api": 1}, priority=priority, max_wait=5)
+            granted.append(name)
+
+        threads = []
+        for name, priority in [("first", 0), ("low", 0), ("mid", 5), ("high", 9)]:
+            threads.append(threading.Thread(target=worker, args=(name, priority)))
+            threads[-1].start()
+            time.sleep(0.02)
+        for t in threads:
+            t.join()
+
+        # Higher priorities overtake earlier waiters; equal ones stay FIFO
+        assert granted == ["high", "mid", "first", "low"], granted
+
+        # The collector requests raised-level stations' cells first
+        order = []
+        weather_cache.CACHE_FILE = os.path.join(tempfile.mkdtemp(), "weather_cache.json")
+        collector = RainfallCollector()
+        collector.max_concurrency = 1
+        collector.sampler.grid = 0.1
+        collector._fetch_weather = lambda lat, lon: order.append(lat) or None
+        settings.quota_config["enabled"] = False
+        collector.collect([({"A": {"lat": 6.05, "lon": 80.05}, "B": {"lat": 7.05, "lon": 80.05},
+                             "C": {"lat": 8.05, "lon": 80.05}}, "flood")],
+                          priorities={"C": 3, "B": 1})
+        assert order == [8.05, 7.05, 6.05], order
+    finally:
+        settings.quota_config["buckets"] = original
+        settings.quota_config["enabled"] = enabled
+
+    print(f"  PASSED - granted {granted}, cells fetched CRITICAL-first")
+    print()
+
+
+if __name__ == "__main__":
+    test_bucket_refill_and_wait()
+    test_priority_order()
+    print("ALL QUOTA TESTS PASSED!")
@@ -0,0 +1,280 @@
+"""
+Offline tests for the vectorized risk scoring (no network needed).
+Checks the batch scorers against the original per-station rules.
+Run:  python tests/test_scoring.py
+"""
+import os
+import sys
+import time
+import random
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import numpy as np
+
+from engine.scoring import score_flood_batch, score_landslide_batch, stabilize_levels
+from engine.trend import hours_to_level, pad_readings, theil_sen_rates
+
+
+# ── Reference: the original per-station if/elif rules ───────────────
+def _classify(risk_score):
+    if risk_score >= 70:
+        return "CRITICAL"
+    elif risk_score >= 45:
+        return "WARNING"
+    elif risk_score >= 20:
+        return "WATCH"
+    return "NORMAL"
+
+
+def _reference_flood(level, alert_level, minor_level, major_level, rate, rain_1h, rain_3h):
+    risk_score = 0
+    level_ratio = level / alert_level if alert_level else 0
+    if major_level and level >= major_level:
+        risk_score += 40
+    elif minor_level and level >= minor_level:
+        risk_score += 30
+    elif level >= alert_level:
+        risk_score += 20
+    elif level_ratio >= 0.8:
+        risk_score += 10
+
+    if rate is not None:
+        if rate >= 0.5:
+            risk_score += 30
+        elif rate >= 0.2:
+            risk_score += 20
+        elif rate >= 0.1:
+            risk_score += 10
+        elif rate < 0:
+            risk_score -= 5
+
+    if rain_1h >= 50:
+        risk_score += 30
+    elif rain_1h >= 20:
+        risk_score += 20
+    elif rain_1h >= 7:
+        risk_score += 10
+    elif rain_3h >= 15:
+        risk_score += 10
+
+    risk_score = max(0, min(100, risk_score))
+    return risk_score, _classify(risk_score)
+
+
+def _reference_landslide(rain_1h, rain_3h, humidity, wind_speed, wind_gust, cloud_cover):
+    risk_score = 0
+    if rain_1h >= 50:
+        risk_score += 40
+    elif rain_1h >= 30:
+        risk_score += 30
+    elif rain_1h >= 15:
+        risk_score += 20
+    elif rain_1h >= 5:
+        risk_score += 10
+
+    if rain_3h >= 40:
+        risk_score += 10
+    elif rain_3h >= 20:
+        risk_score += 5
+
+    if humidity >= 95:
+        risk_score += 25
+    elif humidity >= 85:
+        risk_score += 15
+    elif humidity >= 75:
+        risk_score += 10
+    elif humidity >= 60:
+        risk_score += 5
+
+    gust = max(wind_speed, wind_gust)
+    if gust >= 20:
+        risk_score += 15
+    elif gust >= 12:
+        risk_score += 10
+    elif gust >= 7:
+        risk_score += 5
+
+    if cloud_cover >= 90 and rain_1h >= 5:
+        risk_score += 10
+    elif cloud_cover >= 80:
+        risk_score += 5
+
+    risk_score = max(0, min(100, risk_score))
+    return risk_score, _classify(risk_score)
+
+
+def _random_flood_rows(n, rng):
+    rows = []
+    for _ in range(n):
+        alert = rng.choice([rng.uniform(-3, 8), 2.0, 5.0])
+        rows.append((
+            round(rng.uniform(-4, 12), 2),
+            alert,
+            rng.choice([None, 0, alert + rng.uniform(0, 2)]),
+            rng.choice([None, 0, alert + rng.uniform(1, 4)]),
+            rng.choice([None, 0.0, 0.1, 0.2, 0.5, round(rng.uniform(-1, 1), 3)]),
+            rng.choice([0, 7, 20, 50, round(rng.uniform(0, 80), 1)]),
+            rng.choice([0, 15, round(rng.uniform(0, 60), 1)]),
+        ))
+    return rows
+
+
+def _random_landslide_rows(n, rng):
+    return [(
+        rng.choice([0, 5, 15, 30, 50, round(rng.uniform(0, 80), 1)]),
+        rng.choice([0, 20, 40, round(rng.uniform(0, 80), 1)]),
+        rng.choice([60, 75, 85, 95, rng.randint(30, 100)]),
+        round(rng.uniform(0, 25), 1),
+        rng.choice([0, 7, 12, 20, round(rng.uniform(0, 30), 1)]),
+        rng.choice([80, 90, rng.randint(0, 100)]),
+    ) for _ in range(n)]
+
+
+def test_flood_batch_matches_rules():
+    print("=" * 60)
+    print("TEST: score_flood_batch() matches per-station rules")
+    print("=" * 60)
+
+    rows = _random_flood_rows(5000, random.Random(42))
+    scores, levels = score_flood_batch(*zip(*rows))
+
+    for row, score, level in zip(rows, scores, levels):
+        assert (int(score), str(level)) == _reference_flood(*row), f"Mismatch for {row}"
+
+    print(f"  PASSED - {len(rows)} stations identical")
+    print()
+
+
+def test_landslide_batch_matches_rules():
+    print("=" * 60)
+    print("TEST: score_landslide_batch() matches per-zone rules")
+    print("=" * 60)
+
+    rows = _random_landslide_rows(5000, random.Random(7))
+    scores, levels = score_landslide_batch(*zip(*rows))
+
+    for row, score, level in zip(rows, scores, levels):
+        assert (int(score), str(level)) == _reference_landslide(*row), f"Mismatch for {row}"
+
+    print(f"  PASSED - {len(rows)} zones identical")
+    print()
+
+
+def test_batch_scoring_speed():
+    print("=" * 60)
+    print("TEST: batch scoring speed (1000 stations)")
+    print("=" * 60)
+
+    rng = np.random.default_rng(0)
+    n = 1000
+    flood_cols = [rng.uniform(0, 10, n), np.full(n, 5.0), np.full(n, 6.0), np.full(n, 7.0),
+                  rng.uniform(-1, 1, n), rng.uniform(0, 60, n), rng.uniform(0, 60, n)]
+    landslide_cols = [rng.uniform(0, 60, n) for _ in range(6)]
+
+    for name, scorer, cols in [("flood", score_flood_batch, flood_cols),
+                               ("landslide", score_landslide_batch, landslide_cols)]:
+        best = float("inf")
+        for _ in range(20):
+            start = time.perf_counter()
+            scorer(*cols)
+            best = min(best, time.perf_counter() - start)
+
+        assert best < 0.001, f"{name} scoring too slow: {best * 1000:.3f}ms per 1000 stations"
+        print(f"  PASSED - {name}: {best * 1000:.3f}ms per 1000 stations")
+    print()
+
+
+def test_antecedent_rain_factor():
+    print("=" * 60)
+    print("TEST: antecedent 6h / 24h / 72h rainfall adds up to 20 points")
+    print("=" * 60)
+
+    calm = [0] * 4
+    base, _ = score_landslide_batch(calm, calm, [80] * 4, calm, calm, calm)
+    scores, _ = score_landslide_batch(calm, calm, [80] * 4, calm, calm, calm,
+                                      rain_6h=[0, 80, 0, None],
+                                      rain_24h=[0, 90, 160, None],
+                                      rain_72h=[0, 100, 160, None])
+
+    assert list(scores - base) == [0, 15, 20, 0], list(scores - base)
+
+    print("  PASSED - best window counts, missing totals score 0")
+    print()
+
+
+def test_theil_sen_rates():
+    print("=" * 60)
+    print("TEST: theil_sen_rates() is robust to spikes and repeated timestamps")
+    print("=" * 60)
+
+    series = [
+        [(-3, 1.0), (-2, 1.1), (-1, 1.2), (0, 1.3)],              # steady 0.1 m/hr
+        [(-3, 1.0), (-2, 1.1), (-1, 9.9), (0, 1.3), (0, 1.3)],    # spike + duplicate time
+        [(-1, 2.0), (-1, 2.5)],                                   # same timestamp only
+        [(0, 4.0)],                                               # single reading
+        [],
+    ]
+    rates = theil_sen_rates(*pad_readings(series, max_readings=6))
+
+    assert np.allclose(rates[:2], [0.1, 0.1]), rates
+    assert np.isnan(rates[2:]).all(), rates
+
+    print("  PASSED - 0.1 m/hr despite the spike, undefined rates are NaN")
+    print()
+
+
+def test_projected_crossing():
+    print("=" * 60)
+    print("TEST: hours_to_level() projection feeds the flood score")
+    print("=" * 60)
+
+    level = [4.0, 4.0, 4.0, 5.5]
+    rate = [0.5, 0.1, -0.2, 0.5]
+    hours = hours_to_level(level, rate, [5.0, 5.0, 5.0, 5.0])
+    assert hours[0] == 2 and hours[1] == 10 and np.isnan(hours[2]) and hours[3] == 0, hours
+
+    args = (level, [5.0] * 4, [6.0] * 4, [7.0] * 4, rate, [0] * 4, [0] * 4)
+    base, _ = score_flood_batch(*args)
+    scores, _ = score_flood_batch(*args, hours_to_alert=hours)
+    assert list(scores - base) == [10, 0, 0, 0], "Only a crossing within the horizon scores"
+
+    print("  PASSED - crossing in 2h scores, 10h / falling / already above do not")
+    print()
+
+
+def test_stabilize_levels():
+    print("=" * 60)
+    print("TEST: stabilize_levels() hysteresis band and minimum dwell")
+    print("=" * 60)
+
+    hour = 3600
+    #          score  previous    held       expected
+    cases = [(72,    "WARNING",  0,         "CRITICAL"),  # escalation is immediate
+             (30,    None,       None,      "WATCH"),     # no previous alert
+             (42,    "WARNING",  2 * hour,  "WARNING"),   # inside the 5-point band
+             (39,    "WARNING",  10,        "WARNING"),   # out of the band, dwell not done
+             (39,    "WARNING",  2 * hour,  "WATCH"),     # out of the band, dwell done
+             (10,    "CRITICAL", 2 * hour,  "NORMAL"),    # may drop several levels
+             (66,    "CRITICAL", 2 * hour,  "CRITICAL")]  # band keeps 66 at CRITICAL
+
+    scores, previous, held, expected = zip(*cases)
+    levels = stabilize_levels(scores, previous, held, hysteresis_points=5, min_dwell_seconds=hour)
+
+    for case, level in zip(cases, levels):
+        assert str(level) == case[3], f"{case} -> {level}"
+
+    print(f"  PASSED - {len(cases)} cases")
+    print()
+
+
+if __name__ == "__main__":
+    test_flood_batch_matches_rules()
+    test_landslide_batch_matches_rules()
+    test_batch_scoring_speed()
+    test_antecedent_rain_factor()
+    test_theil_sen_rates()
+    test_projected_crossing()
+    test_stabilize_levels()
+    print("ALL SCORING TESTS PASSED!")
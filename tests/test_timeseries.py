@@ -0,0 +1,96 @@
+"""
+Offline tests for the reading time-series store (temporary SQLite database).
+Run:  python tests/test_timeseries.py
+"""
+import os
+import sys
+import time
+import tempfile
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import utils.timeseries as timeseries
+from collectors.irrigation_api import IrrigationCollector
+
+
+def _use_temp_db():
+    timeseries.DB_FILE = os.path.join(tempfile.mkdtemp(), "timeseries.db")
+
+
+def test_append_and_query():
+    print("=" * 60)
+    print("TEST: append() de-duplicates, query() / latest() by station and range")
+    print("=" * 60)
+
+    _use_temp_db()
+    now = int(time.time())
+    rows = [("Hanwella", "level_m", now - 3600 * i, 5.0 + i) for i in range(10)]
+
+    assert timeseries.append(rows) == 10
+    assert timeseries.append(rows + [("Hanwella", "level_m", now + 60, None)]) == 0, \
+        "Known readings and missing values must not be stored"
+    timeseries.append([("Glencourse", "level_m", now, 1.0)])
+
+    window = timeseries.query("Hanwella", "level_m", start=now - 3 * 3600)
+    assert [v for _, v in window] == [8.0, 7.0, 6.0, 5.0], window
+    assert timeseries.latest("Hanwella", "level_m", 2) == [(now - 3600, 6.0), (now, 5.0)]
+    assert timeseries.latest_times("level_m") == {"Hanwella": now, "Glencourse": now}
+
+    print("  PASSED - 10 readings stored once, range and newest-N queries in time order")
+    print()
+
+
+def test_downsampling_and_retention():
+    print("=" * 60)
+    print("TEST: maintain() rolls old readings into hourly rows")
+    print("=" * 60)
+
+    _use_temp_db()
+    now = time.time()
+    day = 86400
+    old_hour = int(now - 40 * day) // 3600 * 3600
+    timeseries.append([("Hanwella", "rain_1h_mm", old_hour + 600 * i, float(i)) for i in range(6)])
+    timeseries.append([("Hanwella", "rain_1h_mm", int(now - 800 * day), 1.0),
+                       ("Hanwella", "rain_1h_mm", int(now), 9.0)])
+
+    timeseries.maintain(now)
+
+    assert timeseries.query("Hanwella", "rain_1h_mm") == [(int(now), 9.0)], "Only recent raw readings stay"
+    hourly = timeseries.query_hourly("Hanwella", "rain_1h_mm")
+    assert hourly == [{"hour": old_hour, "count": 6, "mean": 2.5, "min": 0.0, "max": 5.0}], hourly
+
+    print("  PASSED - 6 readings -> 1 hourly row, expired hour dropped")
+    print()
+
+
+def test_feed_backfill():
+    print("=" * 60)
+    print("TEST: irrigation ingest returns every reading not yet stored")
+    print("=" * 60)
+
+    collector = IrrigationCollector()
+    collector.history_readings = 2
+    dates = {"20250101": {"000000": 1.0, "010000": 1.5, "020000": 2.0, "030000": 2.5}}
+
+    newest, unstored = collector._newest_readings(dates, kept=[], stored_key="")
+    assert newest == [("20250101020000", 2.0), ("20250101030000", 2.5)]
+    assert len(unstored) == 4, "First ingest stores the whole feed history"
+
+    _, unstored = collector._newest_readings(dates, kept=newest, stored_key="20250101020000")
+    assert unstored == [("20250101030000", 2.5)]
+
+    _, unstored = collector._newest_readings(dates, kept=newest)
+    assert unstored == [], "No store, nothing to record"
+
+    assert collector._key_to_epoch("20250101053000") == 1735689600, "Feed keys are UTC+05:30"
+
+    print("  PASSED - history backfilled once, then only new readings")
+    print()
+
+
+if __name__ == "__main__":
+    test_append_and_query()
+    test_downsampling_and_retention()
+    test_feed_backfill()
+    print("ALL TIME-SERIES TESTS PASSED!")
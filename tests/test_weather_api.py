@@ -0,0 +1,225 @@
+"""
+Offline tests for the OpenWeatherMap collector (OWM faked, temp files).
+Run:  python tests/test_weather_api.py
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import collectors.weather_api as weather_api
+import utils.alert_state as alert_state
+import utils.quota as quota
+import utils.timeseries as timeseries
+import utils.weather_cache as weather_cache
+from agents.monitor_agent import MonitorAgent
+from collectors.weather_api import RainfallCollector
+from collectors.weather_provider import WeatherProvider
+from config import settings
+from utils.rain_accumulator import RainAccumulator
+
+
+class _SlowOWM:
+    """Stands in for RainfallCollector._fetch_weather; tracks requests in flight."""
+
+    def __init__(self, delay, hung=()):
+        self.delay = delay
+        self.hung = set(hung)
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, lat, lon):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            time.sleep(2 if (lat, lon) in self.hung else self.delay)
+            return {"rain": {"1h": 12.0}, "main": {"humidity": 90, "temp": 25},
+                    "wind": {"speed": 3}, "clouds": {"all": 80},
+                    "weather": [{"description": "moderate rain"}]}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class _RateLimitedOWM(BaseHTTPRequestHandler):
+    """Local OWM stand-in that answers every request with 429 and counts them."""
+    protocol_version = "HTTP/1.1"
+    requests = 0
+
+    def do_GET(self):
+        _RateLimitedOWM.requests += 1
+        body = b'{"cod": 429}'
+        self.send_response(429)
+        self.send_header("Retry-After", "1")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _SnapshotProvider(WeatherProvider):
+    """Weather provider that counts batches; heavy rain at every station."""
+
+    def __init__(self):
+        super().__init__()
+        self.flood_stations = {"Hanwella": {"lat": 6.91, "lon": 80.08}}
+        self.landslide_zones = {"Aranayake": {"lat": 7.15, "lon": 80.42, "district": "Kegalle"}}
+        self.batches = []
+
+    def collect(self, groups, priorities=None):
+        self.batches.append([station_type for _, station_type in groups])
+        weather = {"rain_1h_mm": 45.0, "rain_3h_mm": 90.0, "humidity": 97, "wind_speed_ms": 6,
+                   "wind_gust_ms": 14, "temp_celsius": 24, "cloud_cover": 100,
+                   "description": "heavy rain"}
+        return {station_type: [self._build_result(name, coords, weather, station_type)
+                               for name, coords in stations.items()]
+                for stations, station_type in groups}
+
+
+class _NoWeather(WeatherProvider):
+    def collect(self, groups, priorities=None):
+        raise AssertionError("Engines must use the agent's snapshot, not fetch their own")
+
+
+class _FakeIrrigation:
+    def fetch_irrigation_data(self):
+        return [{"station": "Hanwella", "river_basin": "Kelani Ganga", "level_m": 6.2,
+                 "rate_of_rise": 0.3, "alert_level": 5.0, "minor_level": 6.0, "major_level": 7.0,
+                 "measured_at": "2026-10-17 08:00:00"}]
+
+
+class _NoCollect(WeatherProvider):
+    def _fetch_weather(self, lat, lon):
+        return {}
+
+
+def _use_temp_files(monkeypatch):
+    directory = tempfile.mkdtemp()
+    monkeypatch.setattr(weather_cache, "CACHE_FILE", os.path.join(directory, "weather_cache.json"))
+    monkeypatch.setattr(timeseries, "DB_FILE", os.path.join(directory, "timeseries.db"))
+    monkeypatch.setitem(settings.quota_config, "enabled", False)
+    return directory
+
+
+def test_concurrent_collection(monkeypatch):
+    print("=" * 60)
+    print("TEST: RainfallCollector concurrent requests and per-request deadline")
+    print("=" * 60)
+
+    _use_temp_files(monkeypatch)
+    monkeypatch.setitem(settings.weather_config, "max_concurrency", 4)
+    monkeypatch.setitem(settings.weather_config, "request_timeout", 0.5)
+    collector = RainfallCollector()
+    collector.sampler.grid = 0           # one request per station
+    stations = {f"Station {i}": {"lat": round(6.0 + i * 0.2, 1), "lon": 80.5} for i in range(12)}
+    owm = _SlowOWM(delay=0.1, hung={(8.2, 80.5)})
+    collector._fetch_weather = owm
+
+    start = time.perf_counter()
+    data = collector._collect_stations(stations, "flood")
+    elapsed = time.perf_counter() - start
+
+    assert owm.calls == 12
+    assert 1 < owm.peak <= 4, f"Expected up to 4 requests in flight, saw {owm.peak}"
+    # 12 x 0.1s one at a time would take 1.2s plus the hung request's 2s
+    assert elapsed < 1.0, f"Collection took {elapsed:.2f}s"
+    assert [z["station"] for z in data] == [f"Station {i}" for i in range(11)], \
+        "The hung station is left out after its deadline, config order kept"
+
+    print(f"  PASSED - 12 requests in {elapsed:.2f}s, {owm.peak} in flight at most")
+    print()
+
+
+def test_one_quota_token_per_owm_request(monkeypatch):
+    print("=" * 60)
+    print("TEST: one OWM quota token per HTTP request (no transport retries)")
+    print("=" * 60)
+
+    _use_temp_files(monkeypatch)
+    tokens = []
+    monkeypatch.setattr(quota, "acquire", lambda costs, **kwargs: tokens.append(costs["owm"]) or True)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _RateLimitedOWM)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(weather_api, "OWM_URL", f"http://127.0.0.1:{server.server_address[1]}/weather")
+    _RateLimitedOWM.requests = 0
+
+    collector = RainfallCollector()
+    collector.sampler.grid = 0
+    stations = {f"Station {i}": {"lat": 6.0 + i, "lon": 80.5} for i in range(3)}
+    try:
+        data = collector._collect_stations(stations, "flood")
+    finally:
+        server.shutdown()
+
+    assert data == [], "Rate-limited stations have no reading and no cache to fall back on"
+    assert sum(tokens) == 3
+    assert _RateLimitedOWM.requests == 3, \
+        f"{_RateLimitedOWM.requests} OWM requests for 3 quota tokens"
+
+    print("  PASSED - 3 tokens, 3 requests, 429s not retried")
+    print()
+
+
+def test_shared_snapshot(monkeypatch):
+    print("=" * 60)
+    print("TEST: one weather snapshot per cycle for both engines")
+    print("=" * 60)
+
+    directory = _use_temp_files(monkeypatch)
+    monkeypatch.setattr(alert_state, "DB_FILE", os.path.join(directory, "alerts.db"))
+    agent = MonitorAgent()
+    provider = _SnapshotProvider()
+    agent.rainfall_collector = provider
+    agent.flood_engine.rainfall_collector = _NoWeather()
+    agent.flood_engine.irrigation_collector = _FakeIrrigation()
+    agent.landslide_engine.rainfall_collector = _NoWeather()
+    agent.landslide_engine.rain_accumulator = RainAccumulator(os.path.join(directory, "rain.npy"))
+
+    flood_warnings, landslide_warnings = agent.monitor_disasters()
+
+    assert provider.batches == [["flood", "landslide"]], \
+        f"Expected a single batch for both groups, got {provider.batches}"
+    assert [z["station"] for z in flood_warnings] == ["Hanwella"]
+    assert flood_warnings[0]["rain_1h_mm"] == 45.0, "Flood engine did not get the snapshot"
+    assert [z["station"] for z in landslide_warnings] == ["Aranayake"]
+
+    print("  PASSED - 1 weather batch, both engines scored from it")
+    print()
+
+
+def test_provider_must_implement_collect():
+    print("=" * 60)
+    print("TEST: WeatherProvider subclasses must implement collect()")
+    print("=" * 60)
+
+    with pytest.raises(TypeError, match="collect"):
+        _NoCollect()
+    with pytest.raises(TypeError):
+        WeatherProvider()
+
+    print("  PASSED - a provider without collect() fails when created")
+    print()
+
+
+if __name__ == "__main__":
+    with pytest.MonkeyPatch.context() as mp:
+        test_concurrent_collection(mp)
+    with pytest.MonkeyPatch.context() as mp:
+        test_one_quota_token_per_owm_request(mp)
+    with pytest.MonkeyPatch.context() as mp:
+        test_shared_snapshot(mp)
+    test_provider_must_implement_collect()
+    print("ALL WEATHER API TESTS PASSED!")
@@ -0,0 +1,155 @@
+"""
+Offline tests for the stale-while-revalidate weather cache (OWM faked, temp files).
+Run:  python tests/test_weather_cache.py
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import utils.quota as quota
+import utils.timeseries as timeseries
+import utils.weather_cache as weather_cache
+from collectors.weather_api import RainfallCollector
+from engine.landslide_engine import LandslideEngine
+from utils.rain_accumulator import RainAccumulator
+
+STATIONS = {"Kelani": {"lat": 7.05, "lon": 80.05}, "Ratnapura": {"lat": 6.65, "lon": 80.35}}
+
+
+def _use_temp_files():
+    directory = tempfile.mkdtemp()
+    weather_cache.CACHE_FILE = os.path.join(directory, "weather_cache.json")
+    quota.DB_FILE = os.path.join(directory, "quota.db")
+    timeseries.DB_FILE = os.path.join(directory, "timeseries.db")
+    return directory
+
+
+def _age_cache(minutes):
+    """Pretend every cached response was fetched `minutes` earlier."""
+    with open(weather_cache.CACHE_FILE) as f:
+        entries = json.load(f)
+    for entry in entries.values():
+        entry["fetched_at"] -= minutes * 60
+    with open(weather_cache.CACHE_FILE, "w") as f:
+        json.dump(entries, f)
+
+
+class _FakeOWM:
+    """Stands in for RainfallCollector._fetch_weather and counts calls."""
+
+    def __init__(self, rain=30.0, observed_at=None):
+        self.calls = 0
+        self.rain = rain
+        self.failing = False
+        self.observed_at = observed_at or int(time.time())
+
+    def __call__(self, lat, lon):
+        self.calls += 1
+        if self.failing:
+            return None
+        return {"dt": self.observed_at, "rain": {"1h": self.rain},
+                "main": {"humidity": 95, "temp": 24}, "wind": {"speed": 4},
+                "clouds": {"all": 90}, "weather": [{"description": "heavy rain"}]}
+
+
+def _collector(owm):
+    collector = RainfallCollector()
+    collector.sampler.grid = 0.1
+    collector._fetch_weather = owm
+    return collector
+
+
+def test_classify():
+    print("=" * 60)
+    print("TEST: fresh / stale / expired windows")
+    print("=" * 60)
+
+    now = time.time()
+    entry = lambda minutes: {"fetched_at": now - minutes * 60, "data": {}}
+
+    assert weather_cache.classify(entry(5), now) == weather_cache.FRESH
+    assert weather_cache.classify(entry(15), now) == weather_cache.STALE
+    assert weather_cache.classify(entry(45), now) == weather_cache.EXPIRED
+    assert weather_cache.classify(None, now) == weather_cache.EXPIRED
+    assert weather_cache.usable_on_error(entry(120), now)
+    assert not weather_cache.usable_on_error(entry(200), now)
+
+    print("  PASSED - 10 min fresh, 20 min stale-while-revalidate, 180 min on error")
+    print()
+
+
+def test_collector_cycles():
+    print("=" * 60)
+    print("TEST: cycles reuse, revalidate and fall back to cached weather")
+    print("=" * 60)
+
+    _use_temp_files()
+    owm = _FakeOWM(observed_at=int(time.time()) - 300)
+    collector = _collector(owm)
+
+    data = collector._collect_stations(STATIONS, "landslide")
+    assert owm.calls == 2 and len(data) == 2
+    assert data[0]["observed_at"] == owm.observed_at
+    assert 295 <= data[0]["age_seconds"] <= 310, "Age counts from the OWM observation time"
+
+    # Polling faster than OWM updates: no requests
+    collector._collect_stations(STATIONS, "landslide")
+    assert owm.calls == 2, "Fresh entries are served without a request"
+
+    # Stale: served at once, refreshed in the background
+    _age_cache(15)
+    owm.rain = 40.0
+    data = collector._collect_stations(STATIONS, "landslide")
+    assert data[0]["rain_1h_mm"] == 30.0, "The stale response is served this cycle"
+    deadline = time.time() + 5
+    while collector._refreshing and time.time() < deadline:
+        time.sleep(0.01)
+    assert owm.calls == 4, owm.calls
+    data = collector._collect_stations(STATIONS, "landslide")
+    assert owm.calls == 4 and data[0]["rain_1h_mm"] == 40.0, "Next cycle sees the refreshed value"
+
+    # Expired and the request fails: recent cached weather keeps the stations in
+    _age_cache(60)
+    owm.failing = True
+    data = collector._collect_stations(STATIONS, "landslide")
+    assert owm.calls == 6 and [z["rain_1h_mm"] for z in data] == [40.0, 40.0]
+
+    # Too old to stand in: stations left out as before
+    _age_cache(180)
+    assert collector._collect_stations(STATIONS, "landslide") == []
+
+    print(f"  PASSED - {owm.calls} requests over 6 cycles")
+    print()
+
+
+def test_engine_sees_age():
+    print("=" * 60)
+    print("TEST: warning zones carry the weather's observation time and age")
+    print("=" * 60)
+
+    directory = _use_temp_files()
+    owm = _FakeOWM(rain=45.0, observed_at=int(time.time()) - 1800)
+    collector = _collector(owm)
+    collector.landslide_zones = {"Aranayake": {"lat": 7.15, "lon": 80.42, "district": "Kegalle"}}
+    engine = LandslideEngine(rainfall_collector=collector,
+                             rain_accumulator=RainAccumulator(os.path.join(directory, "rain.npy")))
+
+    zones = engine.custom_logic_for_landslide()
+    assert zones, "Heavy rain and saturated soil should raise a warning"
+    assert zones[0]["weather_observed_at"] == owm.observed_at
+    assert zones[0]["weather_age_minutes"] == 30
+
+    print(f"  PASSED - {zones[0]['station']}: weather {zones[0]['weather_age_minutes']} min old")
+    print()
+
+
+if __name__ == "__main__":
+    test_classify()
+    test_collector_cycles()
+    test_engine_sees_age()
+    print("ALL WEATHER CACHE TESTS PASSED!")
@@ -0,0 +1,96 @@
+"""
+Offline tests for grid sampling and IDW interpolation of weather (OWM faked).
+Run:  python tests/test_weather_sampler.py
+"""
+import os
+import sys
+import tempfile
+import threading
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import numpy as np
+
+import utils.quota as quota
+import utils.timeseries as timeseries
+import utils.weather_cache as weather_cache
+from collectors.weather_api import RainfallCollector
+from collectors.weather_sampler import WeatherSampler, haversine_km
+
+
+def _sampler(grid=0.1, neighbors=4, radius_km=15):
+    sampler = WeatherSampler()
+    sampler.grid, sampler.power, sampler.neighbors, sampler.radius_km = grid, 2, neighbors, radius_km
+    return sampler
+
+
+def test_interpolation():
+    print("=" * 60)
+    print("TEST: IDW interpolation between grid cells")
+    print("=" * 60)
+
+    sampler = _sampler()
+    cells = [(7.05, 80.05), (7.05, 80.15), (9.05, 80.05)]
+    values = [[10.0, 80], [20.0, 90], [np.nan, np.nan]]          # third cell failed
+    stations = [{"lat": 7.05, "lon": 80.05},                     # on a cell centre
+                {"lat": 7.05, "lon": 80.10},                     # halfway between two
+                {"lat": 9.05, "lon": 80.05}]                     # only the failed cell nearby
+
+    result, nearest = sampler.interpolate(stations, cells, values)
+
+    assert list(result[0]) == [10.0, 80.0], "A station on a cell takes its values exactly"
+    assert np.allclose(result[1], [15.0, 85.0]), "Equidistant cells weigh the same"
+    assert np.isnan(result[2]).all() and nearest[2] == -1, "No good cell within reach"
+    assert list(nearest[:2]) in ([0, 0], [0, 1])
+
+    print("  PASSED - exact hit, equal-weight midpoint, failed cell ignored")
+    print()
+
+
+def test_one_request_per_cell():
+    print("=" * 60)
+    print("TEST: RainfallCollector fetches each occupied cell once")
+    print("=" * 60)
+
+    timeseries.DB_FILE = os.path.join(tempfile.mkdtemp(), "timeseries.db")
+    quota.DB_FILE = os.path.join(tempfile.mkdtemp(), "quota.db")
+    weather_cache.CACHE_FILE = os.path.join(tempfile.mkdtemp(), "weather_cache.json")
+    collector = RainfallCollector()
+    collector.sampler = _sampler(grid=0.1)
+    calls = []
+    lock = threading.Lock()
+
+    def fake_fetch(lat, lon):
+        with lock:
+            calls.append((lat, lon))
+        return {"dt": 1700000000, "rain": {"1h": 2.0 if lon < 80.2 else 6.0},
+                "main": {"humidity": 80, "temp": 25}, "wind": {"speed": 3},
+                "clouds": {"all": 50}, "weather": [{"description": "light rain"}]}
+
+    collector._fetch_weather = fake_fetch
+
+    # 200 stations in two cells, plus one far away
+    rng = np.random.default_rng(0)
+    stations = {f"S{i}": {"lat": 7.0 + rng.uniform(0.01, 0.09), "lon": 80.1 + (i % 2) * 0.1 + 0.05}
+                for i in range(200)}
+    stations["Far"] = {"lat": 9.5, "lon": 80.55}
+    data = collector._collect_stations(stations, "landslide")
+
+    assert len(calls) == 3, f"{len(calls)} requests for 3 occupied cells"
+    assert len(data) == 201
+    rain = np.array([d["rain_1h_mm"] for d in data])
+    assert ((rain >= 2.0) & (rain <= 6.0)).all(), "Interpolated values stay within the cells' range"
+    assert data[0]["description"] == "light rain" and isinstance(data[0]["humidity"], int)
+
+    d = haversine_km(7.0, 80.0, 7.0, 80.1)
+    assert 10.5 < d < 11.5, d
+
+    print(f"  PASSED - 201 stations from {len(calls)} requests")
+    print()
+
+
+if __name__ == "__main__":
+    test_interpolation()
+    test_one_request_per_cell()
+    print("ALL WEATHER SAMPLER TESTS PASSED!")